@@ -0,0 +1,65 @@
+"""Benchmark: big factorials, binomials and powers, old path vs calc_bigint.
+
+The old path is what the engine called before: math.factorial, math.comb,
+math.perm and the ** operator. calc_bigint is timed in-process (one core)
+and with a pool of CALC_BIGINT_WORKERS processes (default: all cores).
+Every result is checked against the old path. Run from the repository root:
+
+    python benchmarks/bench_bigint.py [--large]
+
+--large adds the 10**6 cases, which take tens of seconds on one core.
+"""
+import math
+import operator
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import calc_bigint
+
+CASES = [
+    ("factorial(100000)", math.factorial, calc_bigint.factorial, (100000,)),
+    ("factorial(300000)", math.factorial, calc_bigint.factorial, (300000,)),
+    ("nCr(300000, 150000)", math.comb, calc_bigint.comb, (300000, 150000)),
+    ("nCr(10**6, 10**4)", math.comb, calc_bigint.comb, (10**6, 10**4)),
+    ("nPr(300000, 150000)", math.perm, calc_bigint.perm, (300000, 150000)),
+    ("3 ** 5000000", operator.pow, calc_bigint.power, (3, 5000000)),
+]
+LARGE_CASES = [
+    ("factorial(10**6)", math.factorial, calc_bigint.factorial, (10**6,)),
+    ("nCr(10**6, 5*10**5)", math.comb, calc_bigint.comb, (10**6, 5 * 10**5)),
+    ("nPr(10**6, 5*10**5)", math.perm, calc_bigint.perm, (10**6, 5 * 10**5)),
+    ("7 ** 10**7", operator.pow, calc_bigint.power, (7, 10**7)),
+]
+
+
+def timed(fn, args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+
+def main():
+    cases = CASES + (LARGE_CASES if "--large" in sys.argv[1:] else [])
+    workers = calc_bigint.WORKERS
+    print(f"{os.cpu_count()} cores, pool of {workers}")
+    print(f"{'case':<22} {'bits':>11} {'old':>9} {'1 process':>10} {'pool':>9} {'speedup':>8}")
+    for name, old, new, args in cases:
+        expected, old_time = timed(old, args)
+        calc_bigint.set_workers(1)
+        result, serial_time = timed(new, args)
+        assert result == expected, name
+        calc_bigint.set_workers(workers)
+        if workers > 1:
+            # The first use starts the pool; do not time that
+            calc_bigint._pool().submit(int).result()
+        result, pool_time = timed(new, args)
+        assert result == expected, name
+        print(f"{name:<22} {expected.bit_length():>11,} {old_time:>8.2f}s {serial_time:>9.2f}s "
+              f"{pool_time:>8.2f}s {old_time / pool_time:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
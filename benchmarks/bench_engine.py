@@ -0,0 +1,133 @@
+"""Benchmark: evaluations/sec of the old replace()+eval path vs calc_engine.
+
+Run from the repository root:
+
+    python benchmarks/bench_engine.py
+"""
+import math
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import calc_engine
+
+EXPRESSIONS = [
+    "15 + 25",
+    "(5 + 3) * 2",
+    "100 / 4 - 7 % 3",
+    "sqrt(16) + 2 ** 10",
+    "sin(0.5) * cos(0.25) + tan(0.1)",
+    "log10(1000) + log(2.718281828)",
+    "factorial(20) / 3",
+    "cbrt(27) + (1.5 + 2.25) ** 2",
+]
+
+
+def legacy_evaluate(expression):
+    """The original EnhancedCalculator.calculate() evaluation path"""
+    calc_expr = (expression
+                 .replace("×", "*")
+                 .replace("÷", "/")
+                 .replace("sqrt(", "math.sqrt(")
+                 .replace("sin(", "math.sin(")
+                 .replace("cos(", "math.cos(")
+                 .replace("tan(", "math.tan(")
+                 .replace("log10(", "math.log10(")
+                 .replace("log(", "math.log(")
+                 .replace("factorial(", "math.factorial(")
+                 .replace("cbrt(", "cbrt("))
+
+    def cbrt(x):
+        return x ** (1/3)
+
+    return eval(calc_expr, {"__builtins__": {}}, {"math": math, "cbrt": cbrt})
+
+
+def run(label, fn, rounds):
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for expr in EXPRESSIONS:
+            fn(expr)
+    elapsed = time.perf_counter() - start
+    rate = rounds * len(EXPRESSIONS) / elapsed
+    print(f"{label:<28} {rate:>12,.0f} evals/sec")
+    return rate
+
+
+def main(rounds=2000):
+    for expr in EXPRESSIONS:
+        assert calc_engine.format_result(calc_engine.evaluate(expr)) == \
+            calc_engine.format_result(legacy_evaluate(expr)), expr
+
+    before = run("replace()+eval (before)", legacy_evaluate, rounds)
+
+    def uncached(expr):
+        calc_engine.clear_cache()
+        return calc_engine.evaluate(expr)
+    run("engine, cold cache", uncached, rounds)
+
+    calc_engine.clear_cache()
+    after = run("engine, warm cache (after)", calc_engine.evaluate, rounds)
+    print(f"speedup (warm): {after / before:.1f}x")
+
+    # Edited expressions sharing an expensive subterm
+    edits = [f"factorial(20000) % {n} + sqrt(2) ** 50" for n in range(3, 23)]
+    start = time.perf_counter()
+    for expr in edits:
+        legacy_evaluate(expr)
+    legacy_time = time.perf_counter() - start
+    calc_engine.clear_cache()
+    start = time.perf_counter()
+    for expr in edits:
+        calc_engine.evaluate(expr)
+    memo_time = time.perf_counter() - start
+    print(f"shared subterm, {len(edits)} edits: replace()+eval {legacy_time * 1000:.1f} ms, "
+          f"memoized {memo_time * 1000:.1f} ms")
+    print(f"memo: {calc_engine.memo_info()}")
+
+    # Typing a long expression one character at a time (live preview)
+    text = " + ".join(f"sqrt({n}) * {n}.5" for n in range(60))
+    start = time.perf_counter()
+    for i in range(1, len(text) + 1):
+        try:
+            calc_engine.tokenize(text[:i])
+        except calc_engine.ExpressionError:
+            pass
+    full_time = time.perf_counter() - start
+    tokenizer = calc_engine.IncrementalTokenizer()
+    start = time.perf_counter()
+    for i in range(1, len(text) + 1):
+        try:
+            tokenizer.update(text[:i])
+        except calc_engine.ExpressionError:
+            pass
+    incremental_time = time.perf_counter() - start
+    print(f"typing {len(text)} chars: full re-tokenize {full_time * 1000:.1f} ms, "
+          f"incremental {incremental_time * 1000:.1f} ms")
+
+    # One expression over many x values (table mode)
+    expression = "3 * x ** 2 - sin(x) / (1 + sqrt(2)) + log10(1000) * x"
+    xs = [i * 0.01 for i in range(20000)]
+    calc_engine.clear_cache()
+    fn = calc_engine.compile_function(expression)
+    for x in xs[:100]:
+        assert abs(fn(x) - calc_engine.evaluate(expression, {"x": x})) <= 1e-9 * max(1, abs(fn(x)))
+    rows = {}
+    for label, step in (
+            ("replace()+eval per row", lambda x: legacy_evaluate(expression.replace("x", f"({x!r})"))),
+            ("closure tree per row", lambda x: calc_engine.evaluate(expression, {"x": x})),
+            ("compiled function per row", fn)):
+        start = time.perf_counter()
+        for x in xs:
+            step(x)
+        rows[label] = len(xs) / (time.perf_counter() - start)
+        print(f"{label:<28} {rows[label]:>12,.0f} rows/sec")
+    print(f"table speedup: {rows['compiled function per row'] / rows['replace()+eval per row']:.1f}x "
+          f"over replace()+eval, "
+          f"{rows['compiled function per row'] / rows['closure tree per row']:.1f}x over the closure tree")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""Benchmark: plot sampling, level-of-detail reduction and pan/zoom frame time.
+
+Runs headless under the offscreen Qt platform. Run from the repository root
+(requires PyQt5):
+
+    python benchmarks/bench_plot.py
+"""
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from PyQt5.QtCore import QEventLoop, QPoint, QPointF, Qt, QTimer
+from PyQt5.QtGui import QWheelEvent
+from PyQt5.QtWidgets import QApplication
+
+import calc_plot
+import calculator
+from calc_engine import compile_function
+
+FUNCTIONS = [
+    ("sin(x)", -10, 10),
+    ("tan(x)", -10, 10),
+    ("log(x) * sqrt(x)", -5, 5),
+    ("sin(1 / x)", -1, 1),
+    ("sin(x)", -1e6, 1e6),
+]
+WIDTH = 600
+
+
+def bench_sampling():
+    print(f"{'function':<24} {'range':>14} {'samples':>9} {'sample':>10} {'points':>7} {'reduce':>9}")
+    for expression, x0, x1 in FUNCTIONS:
+        fn = compile_function(expression)
+        start = time.perf_counter()
+        xs, ys = calc_plot.sample(fn, x0, x1)
+        sample_time = time.perf_counter() - start
+        start = time.perf_counter()
+        points, _ = calc_plot.reduce(xs, ys, x0, x1, WIDTH)
+        reduce_time = time.perf_counter() - start
+        print(f"{expression:<24} {f'{x0:g}..{x1:g}':>14} {len(xs):>9,} "
+              f"{sample_time * 1000:>8.1f}ms {len(points):>7,} {reduce_time * 1000:>7.1f}ms")
+
+
+def bench_frames(frames=240):
+    """Repaint time while zooming the plot panel with the wheel"""
+    window = calculator.EnhancedCalculator()
+    window.show()
+    loop = QEventLoop()
+    window.startup_finished.connect(loop.quit)
+    if not window.startup_done:
+        loop.exec_()
+    window.side_tabs.setCurrentIndex(1)
+    plot = window.plot_widget
+    for expression, x0, x1 in FUNCTIONS:
+        plot.expression = expression
+        plot.view[:2] = [x0, x1]
+        plot.fit()
+        loop = QEventLoop()
+        plot.statusChanged.connect(loop.quit)
+        QTimer.singleShot(10000, loop.quit)
+        loop.exec_()
+        plot.statusChanged.disconnect(loop.quit)
+        samples = []
+        center = QPointF(plot.width() / 2, plot.height() / 2)
+        for i in range(frames):
+            step = -120 if (i // 60) % 2 == 0 else 120
+            event = QWheelEvent(center, center, QPoint(), QPoint(0, step), Qt.NoButton,
+                                Qt.NoModifier, Qt.NoScrollPhase, False)
+            start = time.perf_counter()
+            QApplication.sendEvent(plot, event)
+            plot.repaint()
+            samples.append(time.perf_counter() - start)
+        samples.sort()
+        print(f"zoom frames, {expression:<18} p50 {statistics.median(samples) * 1000:.2f} ms, "
+              f"p95 {samples[int(0.95 * len(samples))] * 1000:.2f} ms")
+    window.close()
+
+
+def main():
+    app = QApplication.instance() or QApplication([])
+    bench_sampling()
+    bench_frames()
+    app.quit()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+"""Benchmark: solver cost per problem, compiled f(x) vs a replace()+eval f(x).
+
+Each problem is solved twice: with the expression compiled once by
+calc_engine.compile_function (what the Solver tab uses) and with a function
+that substitutes x into the string and evals it on every call, the way the
+calculator used to evaluate expressions. Run from the repository root:
+
+    python benchmarks/bench_solver.py
+"""
+import math
+import os
+import re
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import calc_solver
+from calc_engine import compile_function
+
+PROBLEMS = [
+    ("root", "x**3 - 2*x - 5", (0, 3)),
+    ("root", "cos(x) - x", (0.5,)),
+    ("root", "(x - 1)**2", (0, 3)),
+    ("derivative", "sin(x) * cos(x)**2", (1.0,)),
+    ("derivative", "log(x)", (1e-5,)),
+    ("integral", "sin(x)**2", (0, 100)),
+    ("integral", "1 / (1 + x**2)", (-math.inf, math.inf)),
+    ("integral", "sqrt(x) * log(x)", (0, 1)),
+    ("integral", "1 / (1 + x**2)", (0, 1000)),
+]
+
+NAMES = {name: getattr(math, name) for name in ("sin", "cos", "tan", "log", "sqrt")}
+
+
+def eval_function(expression):
+    """f(x) by substituting x into the expression text and evaluating it"""
+    def fn(x):
+        return eval(re.sub(r"\bx\b", f"({x!r})", expression), {"__builtins__": {}}, NAMES)
+    return fn
+
+
+def main():
+    print(f"{'problem':<34} {'value':>20} {'evals':>7} {'compiled':>10} {'µs/eval':>8} "
+          f"{'eval()':>10} {'µs/eval':>8}")
+    for kind, expression, bounds in PROBLEMS:
+        solver = calc_solver.SOLVERS[kind]
+        compiled = solver(compile_function(expression), *bounds)
+        baseline = solver(eval_function(expression), *bounds)
+        label = f"{kind} {expression}"
+        print(f"{label:<34} {compiled['value']:>20.14g} {compiled['evaluations']:>7,} "
+              f"{compiled['seconds'] * 1000:>8.2f}ms "
+              f"{compiled['seconds'] / compiled['evaluations'] * 1e6:>8.2f} "
+              f"{baseline['seconds'] * 1000:>8.2f}ms "
+              f"{baseline['seconds'] / baseline['evaluations'] * 1e6:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""Benchmark: import time, time-to-first-paint and theme toggle time.
+
+Each measurement runs in a fresh interpreter so module caches do not leak
+between runs; the GUI runs under the offscreen Qt platform, so no display is
+needed. Medians over several runs are printed and written as JSON.
+
+Run from the repository root (the GUI part requires PyQt5):
+
+    python benchmarks/bench_startup.py [--runs 5] [--output startup.json]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+IMPORT_CORE = """
+import time
+start = time.perf_counter()
+import calc_core
+print(time.perf_counter() - start)
+"""
+
+GUI_STARTUP = """
+import json, time
+start = time.perf_counter()
+from PyQt5.QtCore import QEvent, QObject, QTimer
+from PyQt5.QtWidgets import QApplication
+import calculator
+imported = time.perf_counter()
+
+times = {"import": imported - start}
+
+class FirstPaint(QObject):
+    def eventFilter(self, obj, event):
+        if event.type() == QEvent.Paint and "first_paint" not in times:
+            times["first_paint"] = time.perf_counter() - start
+        return False
+
+app = QApplication([])
+watcher = FirstPaint()
+app.installEventFilter(watcher)
+window = calculator.EnhancedCalculator()
+times["constructed"] = time.perf_counter() - start
+
+def finished():
+    times["startup_finished"] = time.perf_counter() - start
+    toggles = []
+    for _ in range(10):
+        toggle_start = time.perf_counter()
+        window.toggle_theme()
+        app.processEvents()
+        toggles.append(time.perf_counter() - toggle_start)
+    times["theme_toggle"] = sorted(toggles)[len(toggles) // 2]
+    QTimer.singleShot(0, app.quit)
+
+window.startup_finished.connect(finished)
+window.show()
+app.exec_()
+window.close()
+print(json.dumps(times))
+"""
+
+
+def run_python(code, cwd):
+    env = dict(os.environ, QT_QPA_PLATFORM="offscreen",
+               PYTHONPATH=ROOT + os.pathsep + os.environ.get("PYTHONPATH", ""))
+    result = subprocess.run([sys.executable, "-c", code], cwd=cwd, env=env,
+                            capture_output=True, text=True, check=True)
+    return result.stdout.strip().splitlines()[-1]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--output", help="write results as JSON to this file")
+    args = parser.parse_args(argv)
+
+    results = {}
+    # Run in an empty directory so no history is loaded
+    with tempfile.TemporaryDirectory() as cwd:
+        core = [float(run_python(IMPORT_CORE, cwd)) for _ in range(args.runs)]
+        results["import_core_ms"] = statistics.median(core) * 1000
+        try:
+            gui = [json.loads(run_python(GUI_STARTUP, cwd)) for _ in range(args.runs)]
+        except subprocess.CalledProcessError as e:
+            print(f"GUI startup skipped: {e.stderr.strip().splitlines()[-1]}")
+        else:
+            for key in gui[0]:
+                results[f"gui_{key}_ms"] = statistics.median(run[key] for run in gui) * 1000
+
+    for key, value in results.items():
+        print(f"{key:<32} {value:>10.1f}")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
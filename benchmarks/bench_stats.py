@@ -0,0 +1,69 @@
+"""Benchmark: streaming column statistics (throughput, memory, accuracy).
+
+Writes a CSV of ROWS rows to a temporary file, then times calc_stats over
+it and compares with exact references computed from the generated values.
+Run from the repository root:
+
+    python benchmarks/bench_stats.py [rows]
+"""
+import bisect
+import math
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import calc_stats
+
+ROWS = 5_000_000
+OFFSET = 1e9       # a large common offset breaks naive sum-of-squares variance
+
+
+def write_data(path, rows):
+    rng = random.Random(1)
+    values = []
+    with open(path, "w") as f:
+        f.write("id,value,flag\n")
+        for start in range(0, rows, 100_000):
+            block = [OFFSET + rng.gauss(0, 1) for _ in range(min(100_000, rows - start))]
+            values.extend(block)
+            f.write("".join(f"{start + i},{v!r},{i & 1}\n" for i, v in enumerate(block)))
+    return values
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else ROWS
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "data.csv")
+        values = write_data(path, rows)
+        size = os.path.getsize(path)
+        start = time.perf_counter()
+        result = calc_stats.file_stats(path, "value")
+        elapsed = time.perf_counter() - start
+        print(f"{rows:,} rows, {size / 1e6:.0f} MB: {elapsed:.2f} s, "
+              f"{size / 1e6 / elapsed:.1f} MB/s, {rows / elapsed / 1e6:.2f} M values/s")
+        # Mapped file pages are not allocations; this is what the pass keeps
+        tracemalloc.start()
+        calc_stats.file_stats(path, "value")
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        print(f"peak allocated during the pass: {peak / 1e6:.1f} MB")
+
+        mean = math.fsum(values) / len(values)
+        variance = math.fsum((v - mean) ** 2 for v in values) / (len(values) - 1)
+        naive = (sum(v * v for v in values) - sum(values) ** 2 / len(values)) / (len(values) - 1)
+        print(f"mean error     {abs(result['mean'] - mean):.3g}")
+        print(f"variance error {abs(result['variance'] - variance):.3g} "
+              f"(naive sum of squares: {abs(naive - variance):.3g})")
+        values.sort()
+        for name, q in calc_stats.QUANTILES:
+            rank = bisect.bisect_left(values, result[name]) / len(values)
+            print(f"{name:<7} rank error {abs(rank - q):.4%}")
+
+
+if __name__ == "__main__":
+    main()
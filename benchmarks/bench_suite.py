@@ -0,0 +1,264 @@
+"""Benchmark suite: evaluation, history persistence, window and UI hot paths.
+
+Runs headless under the offscreen Qt platform and writes one flat JSON object
+of metrics, so runs on the same machine can be compared between commits.
+Metric names end in _ms / _s (lower is better) or _per_sec (higher is
+better). Cold-start timings are measured separately by bench_startup.py.
+
+Run from the repository root (requires PyQt5):
+
+    python benchmarks/bench_suite.py --output before.json
+    python benchmarks/bench_suite.py --output after.json --compare before.json
+
+Use --max-history to skip the larger history sizes (default: up to 10^6).
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from PyQt5.QtCore import QEvent, QEventLoop, QModelIndex, Qt, QTimer
+from PyQt5.QtGui import QKeyEvent
+from PyQt5.QtWidgets import QApplication
+
+import calculator
+from calc_core import CalculatorCore
+from calc_history import HistoryStore
+from calc_search import HistoryIndex
+
+EXPRESSION_MIXES = {
+    "basic": ["15 + 25", "(5 + 3) * 2", "100 / 4 - 7 % 3", "2 ** 10 - 1"],
+    "scientific": ["sqrt(16) + sin(0.5)", "log10(1000) * cos(0.25)",
+                   "cbrt(27) + tan(0.1)", "log(2.718281828) ** 2"],
+    "bignum": ["factorial(500) // 3", "2 ** 4000 + 1", "factorial(300) % 1000007"],
+}
+HISTORY_SIZES = [10 ** 3, 10 ** 4, 10 ** 5, 10 ** 6]
+REGRESSION_THRESHOLD = 0.10
+
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def wait(ms):
+    """Run the Qt event loop for ms milliseconds"""
+    loop = QEventLoop()
+    QTimer.singleShot(ms, loop.quit)
+    loop.exec_()
+
+
+def make_window():
+    """A window with its deferred startup done"""
+    window = calculator.EnhancedCalculator()
+    window.show()
+    if not window.startup_done:
+        loop = QEventLoop()
+        window.startup_finished.connect(loop.quit)
+        loop.exec_()
+    return window
+
+
+# --------------------------------------------------------------------------
+# Benchmarks; each returns a dict of metrics
+# --------------------------------------------------------------------------
+
+def bench_calculate(rounds):
+    """Synchronous CalculatorCore.calculate() and the GUI round trip"""
+    results = {}
+    with tempfile.TemporaryDirectory() as directory:
+        core = CalculatorCore(HistoryStore(os.path.join(directory, "history.jsonl"), None))
+        for name, expressions in EXPRESSION_MIXES.items():
+            start = time.perf_counter()
+            for _ in range(rounds):
+                for expression in expressions:
+                    core.expression = expression
+                    core.calculate()
+            elapsed = time.perf_counter() - start
+            results[f"calculate_{name}_per_sec"] = rounds * len(expressions) / elapsed
+        core.close()
+
+    # calculate() in the window: child process round trip until displayed
+    window = make_window()
+    samples = []
+    for expression in EXPRESSION_MIXES["basic"] * 25:
+        loop = QEventLoop()
+        window.evaluator.finished.connect(loop.quit)
+        window.core.expression = expression
+        start = time.perf_counter()
+        window.calculate()
+        loop.exec_()
+        samples.append(time.perf_counter() - start)
+        window.evaluator.finished.disconnect(loop.quit)
+    window.close()
+    results["gui_calculate_p50_ms"] = statistics.median(samples) * 1000
+    results["gui_calculate_p95_ms"] = percentile(samples, 0.95) * 1000
+    return results
+
+
+def bench_history(sizes):
+    """save_history (append + flush) and load_history at several sizes"""
+    results = {}
+    for size in sizes:
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "history.jsonl")
+            store = HistoryStore(path, None)
+            start = time.perf_counter()
+            for i in range(size):
+                store.append(f"{i} * 3 + sqrt({i}) = {i * 3 + i ** 0.5:.6g}")
+            store.flush()
+            results[f"save_history_{size}_s"] = time.perf_counter() - start
+            store.close()
+
+            # What load_history() does: attach and fetch the first page
+            model = calculator.HistoryModel(HistoryStore(path, None))
+            start = time.perf_counter()
+            model.open()
+            if model.canFetchMore(QModelIndex()):
+                model.fetchMore(QModelIndex())
+            model.data(model.index(0))
+            results[f"load_history_{size}_ms"] = (time.perf_counter() - start) * 1000
+
+            start = time.perf_counter()
+            HistoryStore(path, None).load()
+            results[f"load_all_{size}_s"] = time.perf_counter() - start
+
+            index = HistoryIndex()
+            start = time.perf_counter()
+            index.build(HistoryStore(path, None).iter_records()).join()
+            results[f"index_build_{size}_s"] = time.perf_counter() - start
+    return results
+
+
+def bench_window(repeat):
+    """Window construction (without the deferred startup)"""
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        window = calculator.EnhancedCalculator()
+        samples.append(time.perf_counter() - start)
+        window.close()
+        window.deleteLater()
+    QApplication.processEvents()
+    return {"window_construct_ms": statistics.median(samples) * 1000}
+
+
+def bench_theme(repeat):
+    """apply_theme() and toggle_theme() on a fully built window"""
+    window = make_window()
+    results = {}
+    for name, fn in (("apply_theme", window.apply_theme), ("toggle_theme", window.toggle_theme)):
+        samples = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            fn()
+            # Include the restyle and repaint the change triggers
+            QApplication.processEvents()
+            samples.append(time.perf_counter() - start)
+        results[f"{name}_ms"] = statistics.median(samples) * 1000
+    window.close()
+    return results
+
+
+def bench_keypress(repeat):
+    """Keypress to repainted display through keyPressEvent"""
+    window = make_window()
+    keys = [(Qt.Key_1, "1"), (Qt.Key_Plus, "+"), (Qt.Key_2, "2"),
+            (Qt.Key_Asterisk, "*"), (Qt.Key_3, "3"), (Qt.Key_Backspace, "")]
+    samples = []
+    for i in range(repeat):
+        if i % 60 == 0:
+            window.clear_display()
+        key, text = keys[i % len(keys)]
+        event = QKeyEvent(QEvent.KeyPress, key, Qt.NoModifier, text)
+        start = time.perf_counter()
+        QApplication.sendEvent(window, event)
+        window.display.repaint()
+        samples.append(time.perf_counter() - start)
+    window.close()
+    return {
+        "keypress_p50_ms": statistics.median(samples) * 1000,
+        "keypress_p95_ms": percentile(samples, 0.95) * 1000,
+        "keypress_p99_ms": percentile(samples, 0.99) * 1000,
+    }
+
+
+# --------------------------------------------------------------------------
+# Reporting
+# --------------------------------------------------------------------------
+
+def metadata():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                                capture_output=True, text=True).stdout.strip()
+    except OSError:
+        commit = ""
+    return {
+        "commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    }
+
+
+def compare(results, baseline):
+    """Print each metric against a baseline run, flagging regressions"""
+    print(f"\n{'metric':<36} {'baseline':>12} {'current':>12} {'change':>8}")
+    for key, value in results.items():
+        old = baseline.get(key)
+        if not isinstance(old, (int, float)) or not old:
+            continue
+        change = (value - old) / old
+        worse = -change if key.endswith("_per_sec") else change
+        flag = "  REGRESSION" if worse > REGRESSION_THRESHOLD else ""
+        print(f"{key:<36} {old:>12.3f} {value:>12.3f} {change:>+7.0%}{flag}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--output", help="write results as JSON to this file")
+    parser.add_argument("--compare", help="JSON file of a previous run to compare against")
+    parser.add_argument("--max-history", type=int, default=HISTORY_SIZES[-1],
+                        help="largest history size to measure")
+    parser.add_argument("--rounds", type=int, default=200,
+                        help="rounds over each expression mix")
+    args = parser.parse_args(argv)
+
+    app = QApplication.instance() or QApplication([])
+    results = {}
+    # Run in an empty directory so the windows start with no history
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as directory:
+        os.chdir(directory)
+        try:
+            results.update(bench_calculate(args.rounds))
+            results.update(bench_history([size for size in HISTORY_SIZES
+                                          if size <= args.max_history]))
+            results.update(bench_window(10))
+            results.update(bench_theme(30))
+            results.update(bench_keypress(600))
+        finally:
+            os.chdir(cwd)
+
+    for key, value in results.items():
+        print(f"{key:<36} {value:>12.3f}")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"meta": metadata(), "results": results}, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            compare(results, json.load(f)["results"])
+    app.quit()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+"""Benchmark: vectorized evaluation over 10M points vs a Python loop.
+
+Run from the repository root (requires NumPy):
+
+    python benchmarks/bench_vector.py
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+import calc_engine
+import calc_vector
+
+EXPRESSIONS = [
+    "sin(x) * x ** 2 + cos(x)",
+    "sqrt(x) + log(x)",
+    "factorial(x) / 2",
+]
+POINTS = 10_000_000
+LOOP_POINTS = 100_000
+
+
+def main():
+    values = np.linspace(0, 20, POINTS)
+    loop_values = values[:LOOP_POINTS].tolist()
+    for expr in EXPRESSIONS:
+        calc_vector.evaluate_array(expr, values[:10])  # warm the caches
+        start = time.perf_counter()
+        calc_vector.evaluate_array(expr, values)
+        vector_rate = POINTS / (time.perf_counter() - start)
+
+        compiled = calc_engine.compile_expression(expr)
+        start = time.perf_counter()
+        for x in loop_values:
+            try:
+                compiled.evaluate({"x": x})
+            except (ValueError, TypeError, OverflowError):
+                pass
+        loop_rate = LOOP_POINTS / (time.perf_counter() - start)
+        print(f"{expr:<28} vectorized {vector_rate:>14,.0f} pts/sec   "
+              f"loop {loop_rate:>12,.0f} pts/sec")
+
+
+if __name__ == "__main__":
+    main()
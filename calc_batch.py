@@ -0,0 +1,115 @@
+"""Headless batch evaluation.
+
+Streams expressions line by line from a file or stdin and writes one result
+line per input line, using the same functions and result formatting as
+EnhancedCalculator.calculate(). Work is fanned out across a multiprocessing
+pool in chunks; results are written in input order as soon as each chunk is
+done.
+
+    python calculator.py --batch expressions.txt
+    python calc_batch.py - --jobs 4 < expressions.txt
+"""
+import argparse
+import itertools
+import multiprocessing
+import os
+import sys
+
+from calc_bignum import result_text
+from calc_cost import TooExpensive, evaluate_guarded
+from calc_engine import format_result
+
+CHUNK_SIZE = 2000
+
+DIVISION_BY_ZERO = "Error: Division by zero"
+INVALID_EXPRESSION = "Error: Invalid expression"
+
+
+def evaluate_line(line):
+    """Evaluate one input line and return its output text"""
+    expression = line.strip()
+    if not expression:
+        return ""
+    try:
+        return result_text(format_result(evaluate_guarded(expression)))
+    except TooExpensive as e:
+        return f"Error: {e}"
+    except ZeroDivisionError:
+        return DIVISION_BY_ZERO
+    except Exception:
+        return INVALID_EXPRESSION
+
+
+def evaluate_chunk(lines):
+    """Evaluate a list of lines (runs inside pool workers)"""
+    return [evaluate_line(line) for line in lines]
+
+
+def chunked(iterable, size):
+    """Yield lists of up to size items"""
+    iterator = iter(iterable)
+    while True:
+        chunk = list(itertools.islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def run_batch(lines, output, jobs=None, chunk_size=CHUNK_SIZE):
+    """Evaluate lines and write results to output, preserving order
+
+    Returns the number of lines processed.
+    """
+    if jobs is None:
+        jobs = os.cpu_count() or 1
+    chunks = chunked(lines, chunk_size)
+    count = 0
+    if jobs <= 1:
+        results = map(evaluate_chunk, chunks)
+        for chunk in results:
+            output.write("\n".join(chunk) + "\n")
+            count += len(chunk)
+        return count
+    with multiprocessing.Pool(jobs) as pool:
+        # imap keeps input order and only runs a bounded distance ahead
+        for chunk in pool.imap(evaluate_chunk, chunks):
+            output.write("\n".join(chunk) + "\n")
+            count += len(chunk)
+    return count
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="calculator.py --batch",
+        description="Evaluate expressions line by line without a GUI")
+    parser.add_argument("input", help="file with one expression per line, or - for stdin")
+    parser.add_argument("-o", "--output", default="-",
+                        help="output file (default: stdout)")
+    parser.add_argument("-j", "--jobs", type=int, default=None,
+                        help="worker processes (default: CPU count, 1 = no pool)")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE,
+                        help="lines sent to a worker at a time")
+    args = parser.parse_args(argv)
+
+    if args.input == "-":
+        source = sys.stdin
+    else:
+        source = open(args.input, "r", encoding="utf-8")
+    if args.output == "-":
+        output = sys.stdout
+    else:
+        output = open(args.output, "w", encoding="utf-8")
+    try:
+        run_batch(source, output, args.jobs, max(1, args.chunk_size))
+    finally:
+        if source is not sys.stdin:
+            source.close()
+        if output is not sys.stdout:
+            output.close()
+        else:
+            output.flush()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,216 @@
+"""Cheap display and on-demand exact conversion of huge integers.
+
+str(int) is quadratic in CPython and refuses ints above the int->str digit
+limit, so huge results are shown in scientific form computed from the bit
+length and the leading bits only. The exact digits are produced on demand
+by a divide-and-conquer conversion through the decimal module, whose
+multiplication is subquadratic, and can be streamed to a file.
+
+Exact values are kept by reference in a small binary value store so history
+entries only need the compact text plus the reference.
+"""
+import decimal
+import os
+
+MAX_EXACT_DIGITS = 30      # ints with more digits are shown compactly
+SIGNIFICANT_DIGITS = 12    # mantissa digits in the compact form
+VALUES_DIR = "calculator_values"
+CHUNK_SIZE = 1 << 20       # characters written per chunk when streaming
+
+_EXACT_LIMIT = 10 ** MAX_EXACT_DIGITS
+_LEADING_BITS = 128
+_DECIMAL_BITLIM = 128
+_LOG_TOLERANCE = decimal.Decimal("1e-30")
+
+
+def is_huge(value):
+    """True if value is an int too large to show in full"""
+    return isinstance(value, int) and not -_EXACT_LIMIT < value < _EXACT_LIMIT
+
+
+def digit_count(value):
+    """Exact number of decimal digits of an int, without converting it"""
+    value = abs(value)
+    if value < _EXACT_LIMIT:
+        return len(str(value))
+    exponent, fraction = _split_log10(value)
+    # Within rounding error of a power of ten: settle it exactly
+    if fraction > 1 - _LOG_TOLERANCE and value >= 10 ** (exponent + 1):
+        exponent += 1
+    elif fraction < _LOG_TOLERANCE and value < 10 ** exponent:
+        exponent -= 1
+    return exponent + 1
+
+
+def _split_log10(value):
+    """(integer part, fractional part) of log10 of a positive int
+
+    Only the leading bits are used: value >> shift is exact to 2**-127
+    relative, far beyond the digits shown.
+    """
+    shift = max(0, value.bit_length() - _LEADING_BITS)
+    with decimal.localcontext() as ctx:
+        ctx.prec = 40
+        log = (decimal.Decimal(value >> shift).log10()
+               + decimal.Decimal(shift) * decimal.Decimal(2).log10())
+        exponent = int(log)
+        return exponent, log - exponent
+
+
+def compact(value, significant=SIGNIFICANT_DIGITS):
+    """Scientific form of a huge int, e.g. '2.82422940796e+456573'
+
+    Only the bit length and the leading bits are used, so this is cheap for
+    any size of integer.
+    """
+    sign = "-" if value < 0 else ""
+    exponent, fraction = _split_log10(abs(value))
+    with decimal.localcontext() as ctx:
+        ctx.prec = 40
+        mantissa = decimal.Decimal(10) ** fraction
+    text = f"{mantissa:.{significant - 1}f}"
+    if text.startswith("10"):
+        # Mantissa rounded up to the next power of ten
+        text = f"{1:.{significant - 1}f}"
+        exponent += 1
+    digits = text.rstrip("0").rstrip(".")
+    return f"{sign}{digits}e+{exponent}"
+
+
+def result_text(value):
+    """Display text for a calculation result"""
+    if is_huge(value):
+        return compact(value)
+    return str(value)
+
+
+def int_to_decimal(value):
+    """Convert an int to an exact Decimal in subquadratic time
+
+    The int is split by bits (linear time), the halves are converted
+    recursively and recombined with decimal multiplication by a memoized
+    power of two.
+    """
+    D = decimal.Decimal
+    powers = {}
+
+    def pow2(width):
+        result = powers.get(width)
+        if result is None:
+            if width <= _DECIMAL_BITLIM:
+                result = D(2) ** width
+            elif width - 1 in powers:
+                half = powers[width - 1]
+                result = half + half
+            else:
+                low = width >> 1
+                result = pow2(low) * pow2(width - low)
+            powers[width] = result
+        return result
+
+    def inner(n, width):
+        if width <= _DECIMAL_BITLIM:
+            return D(n)
+        low = width >> 1
+        high = n >> low
+        rest = n - (high << low)
+        return inner(rest, low) + inner(high, width - low) * pow2(low)
+
+    with decimal.localcontext() as ctx:
+        ctx.prec = decimal.MAX_PREC
+        ctx.Emax = decimal.MAX_EMAX
+        ctx.Emin = decimal.MIN_EMIN
+        ctx.traps[decimal.Inexact] = True
+        result = inner(abs(value), value.bit_length())
+        if value < 0:
+            result = -result
+    return result
+
+
+def full_digits(value):
+    """All decimal digits of an int, without the int->str digit limit"""
+    if not is_huge(value):
+        return str(value)
+    return str(int_to_decimal(value))
+
+
+def iter_digits(value, chunk_size=CHUNK_SIZE):
+    """Yield the decimal digits of an int in chunks of at most chunk_size
+
+    The whole string is never built: the Decimal form is split in halves
+    by powers of ten (subquadratic in libmpdec) until the parts are small.
+    """
+    if not is_huge(value):
+        yield str(value)
+        return
+    if value < 0:
+        yield "-"
+    number = int_to_decimal(abs(value))
+    with decimal.localcontext() as ctx:
+        ctx.prec = decimal.MAX_PREC
+        ctx.Emax = decimal.MAX_EMAX
+        ctx.Emin = decimal.MIN_EMIN
+        ctx.traps[decimal.Inexact] = True
+        yield from _digit_chunks(number, number.adjusted() + 1, chunk_size, False)
+
+
+def _digit_chunks(number, count, chunk_size, pad):
+    """Chunks of the count digits of a non-negative integral Decimal"""
+    if count <= chunk_size:
+        text = str(number)
+        yield text.zfill(count) if pad else text
+        return
+    low_count = count // 2
+    high, low = divmod(number, decimal.Decimal(10) ** low_count)
+    yield from _digit_chunks(high, count - low_count, chunk_size, pad)
+    yield from _digit_chunks(low, low_count, chunk_size, True)
+
+
+def write_digits(value, f, chunk_size=CHUNK_SIZE):
+    """Stream the exact digits of an int to a text file object"""
+    written = 0
+    for chunk in iter_digits(value, chunk_size):
+        f.write(chunk)
+        written += len(chunk)
+    return written
+
+
+class ValueStore:
+    """Exact values kept on disk by reference, in binary form
+
+    to_bytes/from_bytes are linear time, so saving and loading never goes
+    through a decimal conversion.
+    """
+
+    def __init__(self, directory=VALUES_DIR):
+        self.directory = directory
+
+    def _path(self, ref):
+        return os.path.join(self.directory, f"{ref}.bin")
+
+    def save(self, value):
+        """Store an int and return its reference"""
+        os.makedirs(self.directory, exist_ok=True)
+        ref = os.urandom(16).hex()
+        length = (value.bit_length() + 8) // 8
+        with open(self._path(ref), "wb") as f:
+            f.write(value.to_bytes(length, "little", signed=True))
+        return ref
+
+    def load(self, ref):
+        """Load an int previously stored with save()"""
+        with open(self._path(ref), "rb") as f:
+            return int.from_bytes(f.read(), "little", signed=True)
+
+    def clear(self):
+        """Delete all stored values"""
+        try:
+            names = os.listdir(self.directory)
+        except FileNotFoundError:
+            return
+        for name in names:
+            if name.endswith(".bin"):
+                try:
+                    os.remove(os.path.join(self.directory, name))
+                except OSError:
+                    pass
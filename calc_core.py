@@ -0,0 +1,459 @@
+"""Calculator state and logic, independent of any GUI toolkit.
+
+CalculatorCore owns the expression being edited, undo/redo, memory and
+variables, base conversion and history bookkeeping. It never imports Qt, so it can be used
+headless (batch mode, scripts, benchmarks) and importing it is cheap; the
+GUI in calculator.py only forwards user actions to it and renders state.
+"""
+import os
+
+from calc_bignum import VALUES_DIR, ValueStore, is_huge, result_text
+from calc_cost import APPROXIMATE, EXACT, analyze, evaluate_guarded, plan_expression
+from calc_engine import (FUNCTIONS, NAME, BinOp, Call, ExpressionError, IncrementalTokenizer,
+                         Name, Num, Parser, UnaryOp, compile_expression, format_result,
+                         tokenize)
+from calc_history import HistoryStore
+from calc_programmer import integer, literal, wrap
+from calc_profile import profiler
+from calc_search import HistoryIndex
+from calc_undo import UndoHistory
+from calc_variables import MEMORY, VARIABLES_FILE, VariableTable, parse_assignment
+from calc_worker import evaluate_definitions
+
+OPERATOR_SUFFIXES = (" + ", " - ", " * ", " / ", " ** ", " & ", " | ", " ^ ", " << ", " >> ")
+
+# Function buttons and the text they insert
+FUNCTION_TEXT = {
+    "sqrt": "sqrt(",
+    "sin": "sin(",
+    "cos": "cos(",
+    "tan": "tan(",
+    "log": "log10(",
+    "ln": "log(",
+    "fact": "factorial(",
+    "ncr": "nCr(",
+    "npr": "nPr(",
+    "cbrt": "cbrt(",
+}
+
+
+def default_stores():
+    """History and value stores for the configured backend
+
+    CALC_HISTORY_BACKEND=sqlite keeps both in the user data directory,
+    shared by all windows; the default is the JSON-lines log in the
+    working directory.
+    """
+    if os.environ.get("CALC_HISTORY_BACKEND", "").strip().lower() == "sqlite":
+        from calc_history_db import DB_FILE, SQLiteHistoryStore, data_dir
+        directory = data_dir()
+        values = os.path.join(directory, "values")
+        store = SQLiteHistoryStore(os.path.join(directory, DB_FILE),
+                                   value_dirs=(VALUES_DIR, values))
+        return store, ValueStore(values)
+    return HistoryStore(), ValueStore()
+
+
+def default_variables_path():
+    """Where variables are saved: next to the history of the configured backend"""
+    if os.environ.get("CALC_HISTORY_BACKEND", "").strip().lower() == "sqlite":
+        from calc_history_db import data_dir
+        return os.path.join(data_dir(), VARIABLES_FILE)
+    return VARIABLES_FILE
+
+
+def previewable(node, known=()):
+    """True if a parsed expression can be evaluated with the known variables"""
+    if isinstance(node, Num):
+        return True
+    if isinstance(node, Name):
+        return node.id in known
+    if isinstance(node, UnaryOp):
+        return previewable(node.operand, known)
+    if isinstance(node, BinOp):
+        return previewable(node.left, known) and previewable(node.right, known)
+    if isinstance(node, Call):
+        return node.func in FUNCTIONS and all(previewable(arg, known) for arg in node.args)
+    return False
+
+
+class CalculatorCore:
+    """Expression editing, evaluation, memory and history"""
+
+    def __init__(self, history_store=None, value_store=None, history_index=None,
+                 variables_path=None):
+        self.expression = ""
+        self.undo_history = UndoHistory()
+        self.last_value = None
+        self.tokenizer = IncrementalTokenizer()
+
+        # Programmer mode: integer results wrap to word_width bits (None: unbounded)
+        self.word_width = None
+        self.signed = True
+
+        # Nothing here touches the disk until history is used
+        if history_store is None or value_store is None:
+            default_history, default_values = default_stores()
+            history_store = history_store or default_history
+            value_store = value_store or default_values
+        self.history_store = history_store
+        self.value_store = value_store
+        self.history_index = history_index or HistoryIndex()
+
+        # Variables and registers (memory is the register M), loaded on first use
+        self.variables_path = variables_path or default_variables_path()
+        self._variables = None
+
+    # ----------------------------------------------------------------------
+    # Editing
+    # ----------------------------------------------------------------------
+
+    def display_text(self):
+        """Text for the main display"""
+        return self.expression if self.expression else "0"
+
+    def set_expression(self, expression, merge=False):
+        """Replace the expression, as one undoable step"""
+        before = self.expression
+        self.expression = expression
+        self.undo_history.record(before, expression, merge)
+
+    def append_value(self, value):
+        """Append a value to expression"""
+        value = str(value)
+        # Consecutive digits are undone together, as one number
+        number = value.isdigit() or value == "."
+        if self.expression == "0":
+            self.set_expression(value, number)
+        else:
+            self.set_expression(self.expression + value, number)
+
+    def append_operator(self, operator):
+        """Append an operator"""
+        if self.expression and not self.expression.endswith(OPERATOR_SUFFIXES):
+            if operator == "**":
+                self.set_expression(self.expression + " ** ")
+            else:
+                self.set_expression(self.expression + f" {operator} ")
+
+    def append_function(self, func):
+        """Append a mathematical function"""
+        before = self.expression
+        self._append_function(func)
+        self.undo_history.record(before, self.expression)
+
+    def _append_function(self, func):
+        if func in FUNCTION_TEXT:
+            self.expression += FUNCTION_TEXT[func]
+        elif func == "pow2":
+            if self.expression:
+                self.expression = f"({self.expression})**2"
+        elif func == "pow3":
+            if self.expression:
+                self.expression = f"({self.expression})**3"
+        elif func == "inv":
+            if self.expression:
+                self.expression = f"1/({self.expression})"
+
+    def insert_value(self, value):
+        """Put a number in the expression: after an operator or "(", else in its place"""
+        text = result_text(value)
+        if self.expression.endswith(OPERATOR_SUFFIXES + ("(",)):
+            self.set_expression(self.expression + text)
+        else:
+            self.set_expression(text)
+
+    def insert_name(self, name):
+        """Put a variable name in the expression, like insert_value()"""
+        if self.expression.endswith(OPERATOR_SUFFIXES + ("(", ", ")):
+            self.set_expression(self.expression + name)
+        else:
+            self.set_expression(name)
+
+    def delete_last(self):
+        """Delete last character"""
+        self.set_expression(self.expression[:-1])
+
+    def clear(self):
+        """Clear the expression"""
+        self.set_expression("")
+
+    def undo(self):
+        """Undo last operation; returns True if anything changed"""
+        expression = self.undo_history.undo(self.expression)
+        if expression is None:
+            return False
+        self.expression = expression
+        return True
+
+    def redo(self):
+        """Redo operation; returns True if anything changed"""
+        expression = self.undo_history.redo(self.expression)
+        if expression is None:
+            return False
+        self.expression = expression
+        return True
+
+    # ----------------------------------------------------------------------
+    # Evaluation and history
+    # ----------------------------------------------------------------------
+
+    def current_value(self):
+        """Evaluate the current expression (raises on invalid input)"""
+        if self.variables.stale():
+            self.recompute_variables()
+        return format_result(evaluate_guarded(self.expression,
+                                              self.variables_for(self.expression)))
+
+    def cost(self, expression):
+        """(plan, Estimate) of an expression under calc_cost's limits
+
+        The plan is EXACT, HEAVY or APPROXIMATE, or None with the error
+        message instead of an Estimate if the expression is invalid or
+        refused.
+        """
+        try:
+            compiled = compile_expression(expression)
+            variables = self.variables_for(expression)
+            action = plan_expression(compiled, variables)
+            if action == EXACT:
+                return action, None
+            return action, analyze(compiled.tree, variables)
+        except ExpressionError as e:
+            return None, str(e)
+
+    def preview_expression(self):
+        """The expression if it is worth previewing, else None
+
+        Only the edited tail is re-tokenized. Incomplete or malformed
+        expressions, bare numbers, expressions with unknown or stale
+        variables and heavy ones (see calc_cost) have no preview.
+        """
+        if not self.expression:
+            return None
+        try:
+            tree = Parser(self.tokenizer.update(self.expression)).parse()
+        except ExpressionError:
+            return None
+        if isinstance(tree, UnaryOp) and isinstance(tree.operand, Num):
+            tree = tree.operand
+        known = self.variables.values() if self._variables is not None else ()
+        if isinstance(tree, Num) or not previewable(tree, known):
+            return None
+        if self.cost(self.expression)[0] not in (EXACT, APPROXIMATE):
+            return None
+        return self.expression
+
+    def record_result(self, expression, result):
+        """Store a finished calculation and make its result the expression
+
+        Huge ints are shown compactly; the exact value is kept by reference.
+        With a word width, integer results wrap to it. Returns the history
+        record.
+        """
+        if self.word_width is not None and isinstance(result, int):
+            result = wrap(result, self.word_width, self.signed)
+        with profiler.stage("calculate.format"):
+            text = result_text(result)
+        ref = None
+        if is_huge(result):
+            with profiler.stage("calculate.value_store"):
+                ref = self.value_store.save(result)
+        self.last_value = result
+
+        # Queued for the background history writer
+        with profiler.stage("calculate.history_append"):
+            record = self.history_store.append(f"{expression} = {text}", ref=ref)
+        with profiler.stage("calculate.search_index"):
+            self.history_index.add(record)
+
+        self.set_expression(text)
+        return record
+
+    def calculate(self):
+        """Evaluate synchronously and record the result
+
+        Returns the history record, or None for an empty expression.
+        Evaluation errors propagate to the caller.
+        """
+        if not self.expression:
+            return None
+        expression = self.expression
+        return self.record_result(expression, self.current_value())
+
+    def clear_history(self):
+        """Delete all history and stored exact values"""
+        self.history_store.clear()
+        self.history_index.clear()
+        self.value_store.clear()
+
+    def close(self):
+        """Flush history to disk"""
+        self.history_store.close()
+
+    # ----------------------------------------------------------------------
+    # Memory
+    # ----------------------------------------------------------------------
+
+    @property
+    def memory(self):
+        """The value of register M (0 if it is not set)"""
+        return self.variables.value(MEMORY, 0)
+
+    def memory_add(self, value=None):
+        """Add a value (default: the current value) to memory"""
+        if value is None and self.expression:
+            value = self.exact_value()
+        if value is not None:
+            self.memory_store(self.memory + value)
+
+    def memory_sub(self, value=None):
+        """Subtract a value (default: the current value) from memory"""
+        if value is None and self.expression:
+            value = self.exact_value()
+        if value is not None:
+            self.memory_store(self.memory - value)
+
+    def memory_recall(self):
+        """Recall memory value"""
+        self.last_value = self.memory
+        self.set_expression(result_text(self.memory))
+
+    def memory_clear(self):
+        """Clear memory"""
+        self.memory_store(0)
+
+    def memory_store(self, value):
+        """Store a value in memory"""
+        self.set_variable(MEMORY, value)
+
+    # ----------------------------------------------------------------------
+    # Variables
+    # ----------------------------------------------------------------------
+
+    @property
+    def variables(self):
+        """The VariableTable, loaded from variables_path on first use"""
+        if self._variables is None:
+            self._variables = VariableTable.load(self.variables_path)
+        return self._variables
+
+    def variables_for(self, expression):
+        """{name: value} of the fresh variables an expression mentions"""
+        try:
+            wanted = {value for kind, value, _ in tokenize(expression) if kind == NAME}
+        except ExpressionError:
+            return {}
+        return self.variables.values(wanted)
+
+    def define_variable(self, text):
+        """Define a variable from "name = formula" (a register if formula is a number)
+
+        Returns the name. The new formula and those reading it are stale
+        until recomputed.
+        """
+        assignment = parse_assignment(text)
+        if assignment is None or not assignment[1]:
+            raise ExpressionError("Expected name = formula")
+        name, formula = assignment
+        tree = Parser(tokenize(formula)).parse()
+        if isinstance(tree, UnaryOp) and isinstance(tree.operand, Num):
+            tree = tree.operand if tree.op == "+" else Num(-tree.operand.value)
+        if isinstance(tree, Num):
+            self.set_variable(name, tree.value)
+        else:
+            self.variables.define(name, formula)
+            self.save_variables()
+        return name
+
+    def set_variable(self, name, value):
+        """Make name a register holding value"""
+        self.variables.set_value(name, value)
+        self.save_variables()
+
+    def remove_variable(self, name):
+        """Delete a variable"""
+        self.variables.remove(name)
+        self.save_variables()
+
+    def apply_variables(self, steps, results, change):
+        """Store recomputed values (see VariableTable.apply); returns the names updated"""
+        updated = self.variables.apply(steps, results, change)
+        if updated:
+            self.save_variables()
+        return updated
+
+    def recompute_variables(self):
+        """Recompute the stale formulas in this process"""
+        steps, inputs, change = self.variables.plan()
+        if steps:
+            _, results = evaluate_definitions(steps, inputs)
+            self.apply_variables(steps, results, change)
+
+    def save_variables(self):
+        """Write the variables to variables_path"""
+        try:
+            self.variables.save(self.variables_path)
+        except OSError:
+            pass
+
+    # ----------------------------------------------------------------------
+    # Base conversion
+    # ----------------------------------------------------------------------
+
+    def known_value(self):
+        """The exact last result if the expression still shows it, else None"""
+        value = self.last_value
+        if isinstance(value, (int, float)) and self.expression == result_text(value):
+            return value
+        return None
+
+    def exact_value(self):
+        """The current value, exact when the expression shows the last result"""
+        value = self.known_value()
+        return self.current_value() if value is None else value
+
+    def exact_source(self):
+        """The last result if the expression still shows it, else the expression
+
+        A huge result is displayed compactly; this recovers the exact int.
+        """
+        value = self.last_value
+        if isinstance(value, int) and self.expression == result_text(value):
+            return value
+        return self.expression
+
+    def integer_value(self):
+        """The current value as an exact int, wrapped to the word width"""
+        source = self.exact_source()
+        value = source if isinstance(source, int) else self.current_value()
+        return wrap(integer(value), self.word_width, self.signed)
+
+    def show_in_base(self, value, base):
+        """Make an int the expression, written in base 2, 8, 10 or 16"""
+        if base == 10:
+            # Huge values are shown compactly and kept exact in last_value
+            self.last_value = value
+            self.set_expression(result_text(value))
+        else:
+            self.set_expression(literal(value, base, self.word_width))
+
+    def to_hex(self):
+        """Convert to hexadecimal"""
+        if self.expression:
+            self.show_in_base(self.integer_value(), 16)
+
+    def to_binary(self):
+        """Convert to binary"""
+        if self.expression:
+            self.show_in_base(self.integer_value(), 2)
+
+    def to_octal(self):
+        """Convert to octal"""
+        if self.expression:
+            self.show_in_base(self.integer_value(), 8)
+
+    def to_decimal(self):
+        """Convert to decimal"""
+        if self.expression:
+            self.show_in_base(self.integer_value(), 10)
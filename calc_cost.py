@@ -0,0 +1,520 @@
+"""Static cost estimation: catch runaway expressions before evaluating them.
+
+analyze() walks a parsed expression once and estimates, for every node, the
+size of its value in bits and the time to compute it, without computing
+anything big:
+
+- a ** b (ints): b * log2(a) bits, the cost of the last squarings
+- factorial(n), nCr, nPr: log2 of the result from lgamma, the cost of a
+  binary-splitting product of that size
+- a * b: bits add up, Karatsuba cost (words ** 1.585); + - & | ^ are linear
+- floats and float functions are constant time (overflow raises at once)
+
+Costs are in units of one 64-bit word Karatsuba step, calibrated at about
+OPS_PER_SECOND on CPython 3.11. Small operands are folded exactly while
+walking, so the exponent of 9**9**9 is known to be 387420489. The walk
+costs a few microseconds per node, and most expressions skip it: without
+**, <<, factorial, nCr or nPr in its text, a short expression cannot grow.
+Plans of variable-free expressions are cached.
+
+plan() turns the estimate into an action under the configured limits:
+
+    EXACT        evaluate normally
+    HEAVY        evaluate, but it will take a while: no preview, no timeout
+    APPROXIMATE  too big or too slow to compute exactly: approximate()
+                 evaluates in log space (sign and log2 of the magnitude) and
+                 returns a float, or an Approximation beyond float range
+
+When an approximation is disabled or meaningless (sin of a 10**9-bit
+number, the bits of 9**9**9 & 1) the expression is refused with
+TooExpensive, before any work is done. Limits come from the environment:
+
+    CALC_EXACT_BITS=134217728     largest exact result (bits)
+    CALC_HEAVY_SECONDS=0.5        estimated time from which a result is heavy
+    CALC_MAX_SECONDS=10           estimated time from which it is approximated
+    CALC_APPROXIMATE=1            0 refuses instead of approximating
+
+This module does not import Qt.
+"""
+import math
+import os
+
+from calc_engine import (BINARY_OPERATORS, CACHE_SIZE, UNARY_OPERATORS, BinOp, Call,
+                         CompiledExpression, ExpressionError, LRUCache, Name, Num,
+                         UnaryOp, compile_expression)
+
+EXACT = "exact"
+HEAVY = "heavy"
+APPROXIMATE = "approximate"
+
+OPS_PER_SECOND = 4e7     # word Karatsuba steps per second (measured, CPython 3.11)
+FOLD_BITS = 64           # operands up to this size are folded while estimating
+_WORD = 64
+_KARATSUBA = math.log2(3)
+_LOG2_E = 1 / math.log(2)
+_LOG10_2 = math.log10(2)
+_FLOAT_BITS = 1024       # floats above 2**1024 overflow
+_UNKNOWN_BITS = 64       # assumed size of a result that cannot be sized
+
+# Without **, <<, factorial, nCr and nPr a result is at most as big as the
+# literals typed (a few bits per character): short expressions need no walk
+_SCREEN_LENGTH = 4096
+
+
+class TooExpensive(ExpressionError):
+    """Raised for expressions refused by plan() or approximate()"""
+
+
+class Limits:
+    """Thresholds for plan()"""
+    __slots__ = ("exact_bits", "heavy_seconds", "max_seconds", "approximate")
+
+    def __init__(self, exact_bits=1 << 27, heavy_seconds=0.5, max_seconds=10.0,
+                 approximate=True):
+        self.exact_bits = exact_bits
+        self.heavy_seconds = heavy_seconds
+        self.max_seconds = max_seconds
+        self.approximate = approximate
+
+    @classmethod
+    def from_environment(cls):
+        defaults = cls()
+        return cls(
+            int(os.environ.get("CALC_EXACT_BITS", defaults.exact_bits)),
+            float(os.environ.get("CALC_HEAVY_SECONDS", defaults.heavy_seconds)),
+            float(os.environ.get("CALC_MAX_SECONDS", defaults.max_seconds)),
+            os.environ.get("CALC_APPROXIMATE", "1").strip() not in ("0", "false", "no"))
+
+
+LIMITS = Limits.from_environment()
+
+
+class Estimate:
+    """Estimated size (log2 of the magnitude) and cost of an expression"""
+    __slots__ = ("bits", "cost")
+
+    def __init__(self, bits, cost):
+        self.bits = bits
+        self.cost = cost
+
+    @property
+    def seconds(self):
+        return self.cost / OPS_PER_SECOND
+
+    @property
+    def digits(self):
+        return self.bits * _LOG10_2
+
+    def __repr__(self):
+        return f"Estimate(bits={self.bits:.4g}, seconds={self.seconds:.3g})"
+
+
+# --------------------------------------------------------------------------
+# Estimation
+# --------------------------------------------------------------------------
+
+class _Size:
+    """What the estimator knows about a value: log2 magnitude, exact value if small"""
+    __slots__ = ("bits", "value", "real")
+
+    def __init__(self, bits, value=None, real=False):
+        self.bits = bits        # log2 of the magnitude (0 for |x| <= 1), may be inf
+        self.value = value      # the value if folded, else None
+        self.real = real        # float (constant-time arithmetic)
+
+
+def _log2(value):
+    """log2 of the magnitude, 0 for magnitudes up to 1"""
+    try:
+        magnitude = abs(value)
+        return math.log2(magnitude) if magnitude > 1 else 0.0
+    except (TypeError, ValueError, OverflowError):
+        return 0.0
+
+
+def _size_of(value):
+    real = not isinstance(value, int)
+    if real or value.bit_length() <= FOLD_BITS:
+        return _Size(_log2(value), value, real)
+    return _Size(_log2(value), None)
+
+
+def _mul_cost(a_bits, b_bits):
+    """Cost of multiplying ints of the given sizes (lopsided: in balanced pieces)"""
+    small = max(1.0, min(a_bits, b_bits) / _WORD)
+    large = max(1.0, max(a_bits, b_bits) / _WORD)
+    return large / small * small ** _KARATSUBA
+
+
+def _product_cost(bits, factors=0):
+    """Cost of a binary-splitting product with a result of the given size"""
+    return 3 * _mul_cost(bits / 2, bits / 2) + factors
+
+
+def _int_value(size):
+    """A known int value, or an upper bound of the magnitude, or None"""
+    if size.value is not None:
+        return size.value if isinstance(size.value, int) else None
+    if size.real:
+        return None
+    return math.inf if size.bits >= _FLOAT_BITS else 2.0 ** size.bits
+
+
+def _log2_factorial(n):
+    return math.lgamma(n + 1) * _LOG2_E if n < math.inf else math.inf
+
+
+def _fold(compute, bits, real):
+    """Fold a small result exactly; errors are left for the real evaluation"""
+    if bits > FOLD_BITS and not real:
+        return None
+    try:
+        value = compute()
+    except Exception:
+        return None
+    return value if isinstance(value, (int, float)) else None
+
+
+def _unary(op, a):
+    bits = a.bits + 1 if op == "~" else a.bits
+    value = None
+    if a.value is not None:
+        value = _fold(lambda: UNARY_OPERATORS[op](a.value), bits, a.real)
+    return _Size(bits, value, a.real), 1 if a.real else a.bits / _WORD
+
+
+def _binary(op, a, b):
+    """(size of a op b, cost)"""
+    real = a.real or b.real
+    if op in ("+", "-", "&", "|", "^"):
+        bits = max(a.bits, b.bits) + 1
+        cost = 1 if real else bits / _WORD
+    elif op == "*":
+        bits = a.bits + b.bits
+        cost = 1 if real else _mul_cost(a.bits, b.bits)
+    elif op == "/":
+        bits, real = max(0.0, a.bits - b.bits), True
+        cost = 1 if a.real or b.real else _mul_cost(a.bits, b.bits)
+    elif op in ("//", "%"):
+        bits = b.bits if op == "%" else max(0.0, a.bits - b.bits)
+        cost = 1 if real else (a.bits / _WORD + 1) * (b.bits / _WORD + 1) / 3
+    elif op in ("<<", ">>"):
+        shift = _int_value(b)
+        if shift is None:
+            return _Size(_UNKNOWN_BITS), 1
+        shift = max(0, shift)
+        bits = a.bits + shift if op == "<<" else max(0.0, a.bits - shift)
+        cost = (a.bits + (shift if op == "<<" else 0)) / _WORD
+    elif op == "**":
+        return _power(a, b)
+    else:
+        return _Size(_UNKNOWN_BITS), 1
+    value = None
+    if a.value is not None and b.value is not None:
+        value = _fold(lambda: BINARY_OPERATORS[op](a.value, b.value), bits, real)
+    return _Size(bits, value, real), cost
+
+
+def _power(a, b):
+    exponent = _int_value(b)
+    if a.real or exponent is None or exponent < 0:
+        # Float powers overflow, or come out small, in constant time
+        value = None
+        if a.value is not None and b.value is not None:
+            value = _fold(lambda: a.value ** b.value, 0, True)
+        return _Size(a.bits, value, True), 1
+    if a.value is not None and abs(a.value) <= 1:
+        # 0, 1 and -1 to any power
+        bits, cost = 0.0, 1
+    else:
+        bits = a.bits * exponent
+        cost = 2 * _mul_cost(bits / 2, bits / 2) if bits > _WORD else 1
+    value = None
+    if a.value is not None and b.value is not None:
+        value = _fold(lambda: a.value ** b.value, bits, False)
+    return _Size(bits, value), cost
+
+
+def _call(func, args):
+    """(size of func(*args), cost)"""
+    if func in ("factorial", "nCr", "nPr"):
+        n = _int_value(args[0]) if args else None
+        r = _int_value(args[1]) if len(args) > 1 else None
+        if n is None or (func != "factorial" and r is None):
+            return _Size(_UNKNOWN_BITS), 1
+        if func == "factorial":
+            bits = _log2_factorial(n)
+        elif func == "nPr":
+            bits = _log2_factorial(n) - _log2_factorial(n - r) if 0 <= r <= n else 0.0
+        else:
+            r = min(r, n - r)
+            bits = _log2_factorial(n) - _log2_factorial(r) - _log2_factorial(n - r) \
+                if 0 <= r else 0.0
+        if bits != bits:
+            bits = math.inf
+        bits = max(0.0, bits)
+        return _Size(bits), _product_cost(bits, min(n, 1e300))
+    cost = sum(arg.bits for arg in args) / _WORD + 1
+    argument = args[0].bits if args else 0.0
+    if func == "sqrt":
+        bits = argument / 2
+    elif func == "cbrt":
+        bits = argument / 3
+    elif func in ("log", "log10"):
+        bits = _log2(argument) if argument else 0.0
+    else:
+        bits = 0.0 if func in ("sin", "cos") else argument
+    return _Size(bits, None, True), cost
+
+
+def _estimate(node, variables):
+    """(_Size, total cost) of a node"""
+    if isinstance(node, Num):
+        return _size_of(node.value), 0
+    if isinstance(node, Name):
+        if variables is not None and node.id in variables:
+            return _size_of(variables[node.id]), 0
+        # Evaluation will fail on it; nothing to estimate
+        return _Size(0.0, None, True), 0
+    if isinstance(node, UnaryOp):
+        operand, cost = _estimate(node.operand, variables)
+        size, own = _unary(node.op, operand)
+        return size, cost + own
+    if isinstance(node, BinOp):
+        left, left_cost = _estimate(node.left, variables)
+        right, right_cost = _estimate(node.right, variables)
+        size, own = _binary(node.op, left, right)
+        return size, left_cost + right_cost + own
+    if isinstance(node, Call):
+        estimated = [_estimate(arg, variables) for arg in node.args]
+        size, own = _call(node.func, [size for size, _ in estimated])
+        return size, sum(cost for _, cost in estimated) + own
+    raise ExpressionError(f"Cannot estimate {node!r}")
+
+
+def analyze(tree, variables=None):
+    """Estimate the result size and cost of a parsed expression"""
+    try:
+        size, cost = _estimate(tree, variables)
+    except RecursionError:
+        raise ExpressionError("Expression is nested too deeply") from None
+    if size.real:
+        # A float result: whatever its nominal size, it is at most a float
+        return Estimate(min(size.bits, _FLOAT_BITS), cost)
+    return Estimate(size.bits, cost)
+
+
+def plan(tree, variables=None, limits=None):
+    """EXACT, HEAVY or APPROXIMATE for a parsed expression (see the module doc)
+
+    Raises TooExpensive when the expression is out of bounds and
+    approximations are turned off.
+    """
+    limits = limits or LIMITS
+    estimate = analyze(tree, variables)
+    if estimate.bits > limits.exact_bits or estimate.seconds > limits.max_seconds:
+        if not limits.approximate:
+            raise TooExpensive(too_expensive_message(estimate))
+        return APPROXIMATE
+    if estimate.seconds > limits.heavy_seconds:
+        return HEAVY
+    return EXACT
+
+
+_plans = LRUCache(CACHE_SIZE)
+
+
+def plan_expression(compiled, variables=None, limits=None):
+    """plan() for a compiled expression, skipping the walk where it cannot matter"""
+    source = compiled.source
+    if not variables and len(source) <= _SCREEN_LENGTH and not (
+            "**" in source or "<<" in source or "factorial" in source
+            or "nCr" in source or "nPr" in source):
+        return EXACT
+    if variables or limits is not None:
+        return plan(compiled.tree, variables, limits)
+    action = _plans.get(source)
+    if action is None:
+        action = plan(compiled.tree)
+        _plans.put(source, action)
+    return action
+
+
+def too_expensive_message(estimate):
+    """Why an expression is refused, e.g. Result too large (about 3.7e+08 digits)"""
+    if _FLOAT_BITS < estimate.bits < math.inf:
+        return f"Result too large (about {estimate.digits:.3g} digits)"
+    if estimate.bits < math.inf and estimate.seconds < math.inf:
+        return f"Too slow to compute (about {estimate.seconds:.3g} s)"
+    return "Result too large"
+
+
+# --------------------------------------------------------------------------
+# Log-space approximation
+# --------------------------------------------------------------------------
+
+class Approximation:
+    """A value beyond float range, as sign and log2 of the magnitude"""
+    __slots__ = ("sign", "log2")
+
+    def __init__(self, sign, log2):
+        self.sign = sign
+        self.log2 = log2
+
+    def __str__(self):
+        log10 = self.log2 * _LOG10_2
+        exponent = math.floor(log10)
+        # A float log10 has ~16 significant digits; the exponent uses some
+        significant = max(1, 15 - len(str(exponent)))
+        mantissa = f"{10 ** (log10 - exponent):.{significant - 1}f}"
+        if mantissa.startswith("10"):
+            mantissa = f"{1:.{significant - 1}f}"
+            exponent += 1
+        if "." in mantissa:
+            mantissa = mantissa.rstrip("0").rstrip(".")
+        return f"≈{'-' if self.sign < 0 else ''}{mantissa}e+{exponent}"
+
+    def __repr__(self):
+        return f"Approximation({self.sign}, {self.log2!r})"
+
+
+class _Log:
+    """A number in log space during approximate(): sign and log2 of the magnitude"""
+    __slots__ = ("sign", "log2")
+
+    def __init__(self, sign, log2):
+        self.sign = sign
+        self.log2 = log2
+
+
+def _to_log(value):
+    if isinstance(value, _Log):
+        return value
+    if isinstance(value, complex) or value != value:
+        raise TooExpensive("Result too large")
+    if value == 0:
+        return _Log(0, -math.inf)
+    return _Log(1 if value > 0 else -1, math.log2(abs(value)))
+
+
+def _to_number(value):
+    """A plain number back from log space, if it fits a float"""
+    if not isinstance(value, _Log):
+        return value
+    if value.sign == 0:
+        return 0.0
+    if value.log2 < _FLOAT_BITS - 1:
+        return value.sign * 2.0 ** value.log2
+    return value
+
+
+def _log_add(a, b):
+    if a.sign == 0:
+        return b
+    if b.sign == 0:
+        return a
+    if a.log2 < b.log2:
+        a, b = b, a
+    ratio = 2.0 ** (b.log2 - a.log2)
+    if a.sign == b.sign:
+        return _Log(a.sign, a.log2 + math.log2(1 + ratio))
+    if ratio == 1:
+        return _Log(0, -math.inf)
+    return _Log(a.sign, a.log2 + math.log2(1 - ratio))
+
+
+def _exact(node, variables, limits):
+    """The value of a subterm if it is small and cheap to compute, else None"""
+    estimate = analyze(node, variables)
+    if estimate.bits < _FLOAT_BITS - 1 and estimate.seconds <= limits.heavy_seconds:
+        return CompiledExpression(None, node).evaluate(variables)
+    return None
+
+
+def _approximate(node, variables, limits):
+    """Value of a node: exact if small, else a _Log"""
+    value = _exact(node, variables, limits)
+    if value is not None:
+        return value
+    if isinstance(node, UnaryOp):
+        operand = _to_log(_approximate(node.operand, variables, limits))
+        if node.op == "-":
+            return _Log(-operand.sign, operand.log2)
+        if node.op == "+":
+            return operand
+    elif isinstance(node, BinOp):
+        left = _to_log(_approximate(node.left, variables, limits))
+        right = _approximate(node.right, variables, limits)
+        if node.op == "**":
+            exponent = _to_number(right)
+            if left.sign == 0 and not isinstance(exponent, _Log) and exponent > 0:
+                return 0
+            if isinstance(exponent, _Log) or left.sign == 0:
+                raise TooExpensive("Result too large")
+            if left.sign > 0:
+                return _Log(1, left.log2 * exponent)
+            if isinstance(exponent, int):
+                return _Log(-1 if exponent % 2 else 1, left.log2 * exponent)
+        right = _to_log(right)
+        if node.op == "*":
+            return _Log(left.sign * right.sign, left.log2 + right.log2)
+        if node.op == "/":
+            if right.sign == 0:
+                raise ZeroDivisionError("division by zero")
+            return _Log(left.sign * right.sign, left.log2 - right.log2)
+        if node.op in ("+", "-"):
+            if node.op == "-":
+                right = _Log(-right.sign, right.log2)
+            return _log_add(left, right)
+        if node.op in ("<<", ">>"):
+            shift = _to_number(right)
+            if not isinstance(shift, _Log):
+                return _Log(left.sign, left.log2 + (shift if node.op == "<<" else -shift))
+    elif isinstance(node, Call) and node.args:
+        args = [_approximate(arg, variables, limits) for arg in node.args]
+        if node.func in ("factorial", "nCr", "nPr"):
+            n = _to_number(args[0])
+            r = _to_number(args[1]) if len(args) > 1 else 0
+            if not isinstance(n, _Log) and not isinstance(r, _Log) and 0 <= r <= n:
+                bits = _log2_factorial(n)
+                if node.func == "nPr":
+                    bits -= _log2_factorial(n - r)
+                elif node.func == "nCr":
+                    bits -= _log2_factorial(r) + _log2_factorial(n - r)
+                return _Log(1, bits)
+        else:
+            x = _to_log(args[0])
+            if node.func in ("sqrt", "cbrt") and x.sign >= 0:
+                return _Log(x.sign, x.log2 / (2 if node.func == "sqrt" else 3))
+            if node.func in ("log", "log10") and x.sign > 0:
+                return x.log2 / _LOG2_E if node.func == "log" else x.log2 * _LOG10_2
+    raise TooExpensive("Result too large")
+
+
+def approximate(tree, variables=None, limits=None):
+    """Evaluate in log space: a float, or an Approximation beyond float range
+
+    Raises TooExpensive for operations with no meaningful approximation.
+    """
+    try:
+        value = _to_number(_approximate(tree, variables, limits or LIMITS))
+    except TooExpensive:
+        raise TooExpensive(too_expensive_message(analyze(tree, variables))) from None
+    except RecursionError:
+        raise ExpressionError("Expression is nested too deeply") from None
+    if isinstance(value, _Log):
+        if value.log2 == math.inf:
+            raise TooExpensive("Result too large")
+        return Approximation(value.sign, value.log2)
+    return value
+
+
+def evaluate_guarded(expression, variables=None, limits=None):
+    """Evaluate an expression string, approximating it if plan() says so
+
+    Raises TooExpensive (an ExpressionError) for refused expressions.
+    """
+    compiled = compile_expression(expression)
+    if plan_expression(compiled, variables, limits) == APPROXIMATE:
+        return approximate(compiled.tree, variables, limits)
+    return compiled.evaluate(variables)
@@ -0,0 +1,789 @@
+"""Expression engine for the calculator.
+
+Expressions are tokenized and parsed into a small AST, then compiled into a
+tree of closures. Compiled expressions are kept in a bounded LRU cache keyed
+by the normalized expression text, so re-evaluating an expression (e.g. after
+loading it from history) skips tokenizing and parsing entirely. Results of
+variable-free calls and powers are memoized by canonical form, so edited
+expressions that share an expensive subterm reuse it.
+"""
+import bisect
+import math
+import operator
+import re
+import sys
+from collections import OrderedDict
+
+import calc_bigint
+
+
+def cbrt(x):
+    """Cube root (same semantics as the original calculator)"""
+    return x ** (1/3)
+
+
+# Functions exposed by the UI, by the name used inside expressions
+FUNCTIONS = {
+    "sqrt": math.sqrt,
+    "sin": math.sin,
+    "cos": math.cos,
+    "tan": math.tan,
+    "log10": math.log10,
+    "log": math.log,
+    "factorial": calc_bigint.factorial,
+    "nCr": calc_bigint.comb,
+    "nPr": calc_bigint.perm,
+    "cbrt": cbrt,
+}
+
+BINARY_OPERATORS = {
+    "+": operator.add,
+    "-": operator.sub,
+    "*": operator.mul,
+    "/": operator.truediv,
+    "//": operator.floordiv,
+    "%": operator.mod,
+    "**": calc_bigint.power,
+    "<<": operator.lshift,
+    ">>": operator.rshift,
+    "&": operator.and_,
+    "^": operator.xor,
+    "|": operator.or_,
+}
+
+UNARY_OPERATORS = {
+    "+": operator.pos,
+    "-": operator.neg,
+    "~": operator.invert,
+}
+
+# Display symbols that are accepted as aliases for the Python operators
+OPERATOR_ALIASES = {"×": "*", "÷": "/"}
+
+CACHE_SIZE = 512
+
+_TOKEN_RE = re.compile(r"""
+    (?P<space>\s+)
+  | (?P<number>0[xX][0-9a-fA-F]+|0[bB][01]+|0[oO][0-7]+
+              |(?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?)
+  | (?P<name>[A-Za-z_][A-Za-z_0-9]*)
+  | (?P<op>\*\*|//|<<|>>|[-+*/%(),×÷&|^~])
+""", re.VERBOSE)
+
+
+class ExpressionError(ValueError):
+    """Raised when an expression cannot be tokenized, parsed or resolved"""
+
+
+# --------------------------------------------------------------------------
+# Tokenizer
+# --------------------------------------------------------------------------
+
+NUMBER = "number"
+NAME = "name"
+OP = "op"
+END = "end"
+
+
+def parse_number(text):
+    """Convert a number literal to an int or float"""
+    if text[:2].lower() in ("0x", "0b", "0o"):
+        return int(text, 0)
+    if "." in text or "e" in text or "E" in text:
+        return float(text)
+    return int(text)
+
+
+def _scan(expression, pos, tokens, ends):
+    """Tokenize expression from pos, appending to tokens (and their end offsets)"""
+    length = len(expression)
+    while pos < length:
+        match = _TOKEN_RE.match(expression, pos)
+        if match is None:
+            raise ExpressionError(f"Unexpected character {expression[pos]!r} at {pos}")
+        kind = match.lastgroup
+        text = match.group()
+        if kind == "number":
+            tokens.append((NUMBER, parse_number(text), pos))
+        elif kind == "name":
+            tokens.append((NAME, text, pos))
+        elif kind == "op":
+            tokens.append((OP, OPERATOR_ALIASES.get(text, text), pos))
+        pos = match.end()
+        if ends is not None and kind != "space":
+            ends.append(pos)
+
+
+def tokenize(expression):
+    """Split an expression into (kind, value, position) tokens"""
+    tokens = []
+    _scan(expression, 0, tokens, None)
+    tokens.append((END, None, len(expression)))
+    return tokens
+
+
+class IncrementalTokenizer:
+    """Tokenizer for an expression that is edited at its end
+
+    update() keeps the tokens of the unchanged prefix and re-lexes only the
+    tail, so typing one character costs one or two tokens instead of the
+    whole expression. A token is only kept if it ends at least LOOKAHEAD
+    characters before the first change, because appended text can still
+    extend it ("12" -> "123", "1e" -> "1e5", "*" -> "**").
+    """
+    LOOKAHEAD = 3
+
+    def __init__(self):
+        self.text = ""
+        self.tokens = []
+        self.ends = []
+        self.relexed = 0   # characters re-lexed by the last update
+
+    def update(self, text):
+        """Tokenize text, reusing tokens shared with the previous text
+
+        Returns the token list (with END); raises ExpressionError like
+        tokenize(), leaving the previous state in place.
+        """
+        old = self.text
+        if text.startswith(old):
+            common = len(old)
+        else:
+            common = 0
+            for a, b in zip(old, text):
+                if a != b:
+                    break
+                common += 1
+        keep = bisect.bisect_right(self.ends, common - self.LOOKAHEAD)
+        tokens = self.tokens[:keep]
+        ends = self.ends[:keep]
+        start = ends[-1] if ends else 0
+        _scan(text, start, tokens, ends)
+        self.text, self.tokens, self.ends = text, tokens, ends
+        self.relexed = len(text) - start
+        return tokens + [(END, None, len(text))]
+
+
+# --------------------------------------------------------------------------
+# AST
+# --------------------------------------------------------------------------
+
+class Num:
+    __slots__ = ("value",)
+
+    def __init__(self, value):
+        self.value = value
+
+    def __repr__(self):
+        return f"Num({self.value!r})"
+
+
+class Name:
+    __slots__ = ("id",)
+
+    def __init__(self, id):
+        self.id = id
+
+    def __repr__(self):
+        return f"Name({self.id!r})"
+
+
+class UnaryOp:
+    __slots__ = ("op", "operand")
+
+    def __init__(self, op, operand):
+        self.op = op
+        self.operand = operand
+
+    def __repr__(self):
+        return f"UnaryOp({self.op!r}, {self.operand!r})"
+
+
+class BinOp:
+    __slots__ = ("op", "left", "right")
+
+    def __init__(self, op, left, right):
+        self.op = op
+        self.left = left
+        self.right = right
+
+    def __repr__(self):
+        return f"BinOp({self.op!r}, {self.left!r}, {self.right!r})"
+
+
+class Call:
+    __slots__ = ("func", "args")
+
+    def __init__(self, func, args):
+        self.func = func
+        self.args = args
+
+    def __repr__(self):
+        return f"Call({self.func!r}, {self.args!r})"
+
+
+# --------------------------------------------------------------------------
+# Parser
+# --------------------------------------------------------------------------
+
+class Parser:
+    """Recursive descent parser using Python's operator precedence
+
+    expr    := bit_xor ("|" bit_xor)*
+    bit_xor := bit_and ("^" bit_and)*
+    bit_and := shift ("&" shift)*
+    shift   := arith (("<<" | ">>") arith)*
+    arith   := term (("+" | "-") term)*
+    term    := factor (("*" | "/" | "//" | "%") factor)*
+    factor  := ("+" | "-" | "~") factor | power
+    power  := atom ["**" factor]
+    atom   := number | name ["(" [expr ("," expr)*] ")"] | "(" expr ")"
+    """
+
+    def __init__(self, tokens):
+        self.tokens = tokens
+        self.index = 0
+
+    def peek(self):
+        return self.tokens[self.index]
+
+    def advance(self):
+        token = self.tokens[self.index]
+        self.index += 1
+        return token
+
+    def expect(self, value):
+        kind, tok_value, pos = self.advance()
+        if kind != OP or tok_value != value:
+            raise ExpressionError(f"Expected {value!r} at {pos}")
+
+    def parse(self):
+        node = self.expr()
+        kind, value, pos = self.peek()
+        if kind != END:
+            raise ExpressionError(f"Unexpected {value!r} at {pos}")
+        return node
+
+    def binary(self, operators, operand):
+        """Left-associative chain of operand separated by operators"""
+        node = operand()
+        while True:
+            kind, value, _ = self.peek()
+            if kind == OP and value in operators:
+                self.advance()
+                node = BinOp(value, node, operand())
+            else:
+                return node
+
+    def expr(self):
+        return self.binary(("|",), self.bit_xor)
+
+    def bit_xor(self):
+        return self.binary(("^",), self.bit_and)
+
+    def bit_and(self):
+        return self.binary(("&",), self.shift)
+
+    def shift(self):
+        return self.binary(("<<", ">>"), self.arith)
+
+    def arith(self):
+        return self.binary(("+", "-"), self.term)
+
+    def term(self):
+        return self.binary(("*", "/", "//", "%"), self.factor)
+
+    def factor(self):
+        kind, value, _ = self.peek()
+        if kind == OP and value in ("+", "-", "~"):
+            self.advance()
+            return UnaryOp(value, self.factor())
+        return self.power()
+
+    def power(self):
+        node = self.atom()
+        kind, value, _ = self.peek()
+        if kind == OP and value == "**":
+            self.advance()
+            # Right-associative, and binds tighter than a unary minus on its left
+            node = BinOp("**", node, self.factor())
+        return node
+
+    def atom(self):
+        kind, value, pos = self.advance()
+        if kind == NUMBER:
+            return Num(value)
+        if kind == NAME:
+            next_kind, next_value, _ = self.peek()
+            if next_kind == OP and next_value == "(":
+                self.advance()
+                return Call(value, self.arguments())
+            return Name(value)
+        if kind == OP and value == "(":
+            node = self.expr()
+            self.expect(")")
+            return node
+        if kind == END:
+            raise ExpressionError("Unexpected end of expression")
+        raise ExpressionError(f"Unexpected {value!r} at {pos}")
+
+    def arguments(self):
+        args = []
+        kind, value, _ = self.peek()
+        if kind == OP and value == ")":
+            self.advance()
+            return args
+        while True:
+            args.append(self.expr())
+            kind, value, pos = self.advance()
+            if kind == OP and value == ")":
+                return args
+            if kind != OP or value != ",":
+                raise ExpressionError(f"Expected ',' or ')' at {pos}")
+
+
+def parse(expression):
+    """Parse an expression string into an AST"""
+    return Parser(tokenize(expression)).parse()
+
+
+# --------------------------------------------------------------------------
+# Compiler
+# --------------------------------------------------------------------------
+
+def canonical(node):
+    """Canonical text form of an AST node, used as a memo key
+
+    Operands of the commutative operators (+, *, &, ^, |) are put in a
+    fixed order, so "a + b" and "b + a" share a key. Numbers keep their type
+    (2 and 2.0 differ).
+    """
+    if isinstance(node, Num):
+        return repr(node.value)
+    if isinstance(node, Name):
+        return node.id
+    if isinstance(node, UnaryOp):
+        return f"({node.op} {canonical(node.operand)})"
+    if isinstance(node, BinOp):
+        left, right = canonical(node.left), canonical(node.right)
+        if node.op in ("+", "*", "&", "^", "|") and right < left:
+            left, right = right, left
+        return f"({node.op} {left} {right})"
+    if isinstance(node, Call):
+        args = " ".join(canonical(arg) for arg in node.args)
+        return f"({node.func} {args})"
+    raise ExpressionError(f"Cannot compile {node!r}")
+
+
+def compile_node(node, functions=FUNCTIONS, memo=None):
+    """Compile an AST node into a closure taking a variables mapping
+
+    With a memo, calls and powers whose operands contain no variables are
+    cached in it by canonical form, so expensive subterms like
+    factorial(2000) are computed once across expressions.
+    """
+    return _compile(node, functions, memo)[0]
+
+
+def _compile(node, functions, memo):
+    """Return (closure, canonical key or None, variable-free?)"""
+    if isinstance(node, Num):
+        value = node.value
+        return (lambda env: value), None, True
+    if isinstance(node, Name):
+        name = node.id
+
+        def lookup(env):
+            try:
+                return env[name]
+            except (KeyError, TypeError):
+                raise ExpressionError(f"Unknown name {name!r}") from None
+        return lookup, None, False
+    if isinstance(node, UnaryOp):
+        op = UNARY_OPERATORS[node.op]
+        operand, _, pure = _compile(node.operand, functions, memo)
+        return (lambda env: op(operand(env))), None, pure
+    if isinstance(node, BinOp):
+        op = BINARY_OPERATORS[node.op]
+        left, _, left_pure = _compile(node.left, functions, memo)
+        right, _, right_pure = _compile(node.right, functions, memo)
+        fn = lambda env: op(left(env), right(env))
+        pure = left_pure and right_pure
+        if node.op == "**":
+            return _memoized(fn, node, memo, pure), None, pure
+        return fn, None, pure
+    if isinstance(node, Call):
+        try:
+            func = functions[node.func]
+        except KeyError:
+            raise ExpressionError(f"Unknown function {node.func!r}") from None
+        compiled = [_compile(arg, functions, memo) for arg in node.args]
+        args = [fn for fn, _, _ in compiled]
+        pure = all(arg_pure for _, _, arg_pure in compiled)
+        if len(args) == 1:
+            arg = args[0]
+            fn = lambda env: func(arg(env))
+        else:
+            fn = lambda env: func(*[arg(env) for arg in args])
+        return _memoized(fn, node, memo, pure), None, pure
+    raise ExpressionError(f"Cannot compile {node!r}")
+
+
+def _memoized(fn, node, memo, pure):
+    """Wrap fn with a memo lookup when the subterm is variable-free"""
+    if memo is None or not pure:
+        return fn
+    key = canonical(node)
+    get = memo.get
+    put = memo.put
+
+    def cached(env):
+        value = get(key, _MISSING)
+        if value is _MISSING:
+            value = fn(env)
+            put(key, value)
+        return value
+    return cached
+
+
+class CompiledExpression:
+    """A parsed and compiled expression, ready for repeated evaluation"""
+
+    __slots__ = ("source", "tree", "_fn")
+
+    def __init__(self, source, tree):
+        self.source = source
+        self.tree = tree
+        self._fn = compile_node(tree, FUNCTIONS, result_memo)
+
+    def evaluate(self, variables=None):
+        """Evaluate the expression, optionally with a variables mapping"""
+        return self._fn(variables)
+
+    def __repr__(self):
+        return f"CompiledExpression({self.source!r})"
+
+
+# --------------------------------------------------------------------------
+# Code generation
+# --------------------------------------------------------------------------
+
+# Python precedence of each node kind, for parenthesizing generated source
+_PRECEDENCE = {"|": 1, "^": 2, "&": 3, "<<": 4, ">>": 4, "+": 5, "-": 5,
+               "*": 6, "/": 6, "//": 6, "%": 6, "unary": 7, "**": 8}
+_ATOM = 9
+_MAX_LITERAL_BITS = 64
+
+
+class _FunctionBuilder:
+    """Turns an AST into Python source, folding variable-free subterms"""
+
+    def __init__(self, variables, functions, memo):
+        self.params = {name: f"_v{i}" for i, name in enumerate(variables)}
+        self.functions = functions
+        self.memo = memo
+        self.bindings = {}   # names closed over by the generated function
+
+    def bind(self, prefix, value):
+        name = f"{prefix}{len(self.bindings)}"
+        self.bindings[name] = value
+        return name
+
+    def constant(self, value):
+        """Source for a folded value: a literal if exact, else a bound name"""
+        if type(value) is int and value >= 0 and value.bit_length() <= _MAX_LITERAL_BITS:
+            return repr(value)
+        if type(value) is float and math.isfinite(value) and math.copysign(1.0, value) > 0:
+            return repr(value)
+        return self.bind("_c", value)
+
+    def fold(self, node, compute):
+        """Value of a variable-free subterm, or _MISSING if it raises"""
+        memoize = self.memo is not None and isinstance(node, (Call, BinOp)) and (
+            isinstance(node, Call) or node.op == "**")
+        try:
+            if not memoize:
+                return compute()
+            key = canonical(node)
+            value = self.memo.get(key, _MISSING)
+            if value is _MISSING:
+                value = compute()
+                self.memo.put(key, value)
+            return value
+        except Exception:
+            # Left in the code, so the error is raised on every call
+            return _MISSING
+
+    def build(self, node):
+        """Return (source, precedence, folded value or _MISSING)"""
+        if isinstance(node, Num):
+            return self.constant(node.value), _ATOM, node.value
+        if isinstance(node, Name):
+            try:
+                return self.params[node.id], _ATOM, _MISSING
+            except KeyError:
+                raise ExpressionError(f"Unknown name {node.id!r}") from None
+        if isinstance(node, UnaryOp):
+            source, precedence, value = self.build(node.operand)
+            if value is not _MISSING:
+                op = UNARY_OPERATORS[node.op]
+                folded = self.fold(node, lambda: op(value))
+                if folded is not _MISSING:
+                    return self.constant(folded), _ATOM, folded
+            level = _PRECEDENCE["unary"]
+            if precedence < level:
+                source = f"({source})"
+            return f"{node.op}{source}", level, _MISSING
+        if isinstance(node, BinOp):
+            left, left_precedence, left_value = self.build(node.left)
+            right, right_precedence, right_value = self.build(node.right)
+            if left_value is not _MISSING and right_value is not _MISSING:
+                op = BINARY_OPERATORS[node.op]
+                folded = self.fold(node, lambda: op(left_value, right_value))
+                if folded is not _MISSING:
+                    return self.constant(folded), _ATOM, folded
+            level = _PRECEDENCE[node.op]
+            if node.op == "**":
+                # Right-associative; a unary minus on the left needs parens
+                left_needs, right_needs = level + 1, _PRECEDENCE["unary"]
+            else:
+                left_needs, right_needs = level, level + 1
+            if left_precedence < left_needs:
+                left = f"({left})"
+            if right_precedence < right_needs:
+                right = f"({right})"
+            return f"{left} {node.op} {right}", level, _MISSING
+        if isinstance(node, Call):
+            try:
+                func = self.functions[node.func]
+            except KeyError:
+                raise ExpressionError(f"Unknown function {node.func!r}") from None
+            built = [self.build(arg) for arg in node.args]
+            values = [value for _, _, value in built]
+            if all(value is not _MISSING for value in values):
+                folded = self.fold(node, lambda: func(*values))
+                if folded is not _MISSING:
+                    return self.constant(folded), _ATOM, folded
+            name = self.bind(f"_{node.func}_", func)
+            args = ", ".join(source for source, _, _ in built)
+            return f"{name}({args})", _ATOM, _MISSING
+        raise ExpressionError(f"Cannot compile {node!r}")
+
+
+def compile_function(expression, variables=("x",), functions=FUNCTIONS):
+    """Compile an expression into a Python function of the given variables
+
+    The expression is turned into the source of one Python function and
+    compiled to a code object; variable-free subterms are folded into
+    constants first (calls and powers through the result memo). Calling
+    the result costs about as much as the same arithmetic written in
+    Python, which makes it the fast path for tables and sweeps:
+
+        f = compile_function("x ** 2 + sqrt(2)")
+        [f(x) for x in range(10)]
+
+    Errors (ZeroDivisionError, ValueError, ...) are raised by each call,
+    as evaluate() would raise them. Results are cached per expression.
+    """
+    variables = tuple(variables)
+    key = (normalize(expression), variables)
+    cacheable = functions is FUNCTIONS
+    if cacheable:
+        fn = _function_cache.get(key)
+        if fn is not None:
+            return fn
+    tree = parse(key[0])
+    builder = _FunctionBuilder(variables, functions, result_memo if cacheable else None)
+    try:
+        body, _, _ = builder.build(tree)
+    except RecursionError:
+        raise ExpressionError("Expression is nested too deeply") from None
+    bindings = list(builder.bindings)
+    params = ", ".join(builder.params[name] for name in variables)
+    source = (f"def _factory({', '.join(bindings)}):\n"
+              f"    def _compiled({params}):\n"
+              f"        return {body}\n"
+              f"    return _compiled\n")
+    try:
+        code = compile(source, "<expression>", "exec")
+    except (SyntaxError, RecursionError, MemoryError):
+        # Too deeply nested for Python's compiler: use the closure tree
+        compiled = compile_node(tree, functions, builder.memo)
+
+        def fn(*values):
+            return compiled(dict(zip(variables, values)))
+    else:
+        namespace = {}
+        exec(code, {"__builtins__": {}}, namespace)
+        fn = namespace["_factory"](*builder.bindings.values())
+    if cacheable:
+        _function_cache.put(key, fn)
+    return fn
+
+
+# --------------------------------------------------------------------------
+# Result memo
+# --------------------------------------------------------------------------
+
+_MISSING = object()
+
+MEMO_ENTRIES = 4096
+MEMO_BYTES = 64 * 1024 * 1024
+
+
+class ResultMemo:
+    """LRU memo of subexpression results, bounded by count and size
+
+    Sizes are approximated with sys.getsizeof, which tracks the digit count
+    of big ints. Values larger than the whole byte budget are not stored.
+    """
+
+    def __init__(self, max_entries=MEMO_ENTRIES, max_bytes=MEMO_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._data = OrderedDict()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, default=None):
+        try:
+            value, _ = self._data[key]
+        except KeyError:
+            self.misses += 1
+            return default
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, key, value):
+        size = sys.getsizeof(value) + sys.getsizeof(key)
+        if size > self.max_bytes:
+            return
+        old = self._data.pop(key, None)
+        if old is not None:
+            self.bytes -= old[1]
+        self._data[key] = (value, size)
+        self.bytes += size
+        while len(self._data) > self.max_entries or self.bytes > self.max_bytes:
+            _, (_, evicted) = self._data.popitem(last=False)
+            self.bytes -= evicted
+            self.evictions += 1
+
+    def clear(self):
+        self._data.clear()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def info(self):
+        """Hit/miss statistics and current size"""
+        return {"hits": self.hits, "misses": self.misses,
+                "evictions": self.evictions, "entries": len(self._data),
+                "bytes": self.bytes, "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes}
+
+    def __len__(self):
+        return len(self._data)
+
+
+result_memo = ResultMemo()
+
+
+def memo_info():
+    """Statistics of the subexpression result memo"""
+    return result_memo.info()
+
+
+# --------------------------------------------------------------------------
+# Cache
+# --------------------------------------------------------------------------
+
+class LRUCache:
+    """Small bounded least-recently-used mapping"""
+
+    def __init__(self, maxsize=CACHE_SIZE):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        try:
+            value = self._data[key]
+        except KeyError:
+            self.misses += 1
+            return None
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, key, value):
+        self._data[key] = value
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def clear(self):
+        self._data.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, key):
+        return key in self._data
+
+
+_compiled_cache = LRUCache(CACHE_SIZE)
+_function_cache = LRUCache(CACHE_SIZE)
+
+
+def normalize(expression):
+    """Normalize an expression for use as a cache key
+
+    Runs of whitespace collapse to a single space so token boundaries are
+    preserved ("1 2" stays invalid instead of becoming "12").
+    """
+    return " ".join(expression.split())
+
+
+def compile_expression(expression):
+    """Return the compiled form of an expression, using the LRU cache"""
+    key = normalize(expression)
+    compiled = _compiled_cache.get(key)
+    if compiled is None:
+        compiled = CompiledExpression(key, parse(key))
+        _compiled_cache.put(key, compiled)
+    return compiled
+
+
+def cache_info():
+    """Return (hits, misses, size, maxsize) of the compiled expression cache"""
+    return (_compiled_cache.hits, _compiled_cache.misses,
+            len(_compiled_cache), _compiled_cache.maxsize)
+
+
+def clear_cache():
+    """Drop all compiled expressions and memoized results"""
+    _compiled_cache.clear()
+    _function_cache.clear()
+    result_memo.clear()
+
+
+def evaluate(expression, variables=None):
+    """Evaluate an expression string and return the raw result"""
+    return compile_expression(expression).evaluate(variables)
+
+
+def format_result(result):
+    """Collapse integral floats to int and round the rest, like calculate()"""
+    if isinstance(result, float):
+        if result == int(result):
+            result = int(result)
+        else:
+            result = round(result, 10)
+    return result
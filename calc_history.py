@@ -0,0 +1,404 @@
+"""Append-only calculation history log.
+
+Every calculation is one JSON record on its own line. Records are written by
+a background thread which batches them and issues a single fsync per batch
+(group commit), so the UI thread only pays for a queue put. Clearing the
+history appends a marker record; compaction later rewrites the log without
+the dead records and without any torn trailing line.
+
+The legacy format (a JSON array of entry strings in calculator_history.json)
+is imported once when no log exists yet.
+"""
+import json
+import os
+import queue
+import threading
+import time
+from datetime import datetime
+
+from calc_profile import profiler
+
+LOG_FILE = "calculator_history.jsonl"
+LEGACY_FILE = "calculator_history.json"
+
+COMMIT_INTERVAL = 0.2      # seconds to gather a batch before fsync
+COMPACT_THRESHOLD = 1000   # dead records tolerated before compaction
+
+_APPEND = "append"
+_CLEAR = "clear"
+_COMPACT = "compact"
+_FLUSH = "flush"
+_STOP = "stop"
+
+
+def make_record(entry, timestamp=None, ref=None):
+    """Build a history record for an entry string
+
+    ref optionally points at the exact value in the calc_bignum value store
+    when the entry only holds a compact form of the result.
+    """
+    if timestamp is None:
+        timestamp = datetime.now().isoformat(timespec="seconds")
+    record = {"entry": entry, "time": timestamp}
+    if ref is not None:
+        record["ref"] = ref
+    return record
+
+
+def read_log(path):
+    """Read a log file, returning (live records, dead record count)"""
+    records = []
+    dead = 0
+    try:
+        # Binary, decoded per line: a torn write can end mid UTF-8 sequence
+        with open(path, "rb") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                record = _decode(line)
+                if record is None:
+                    # Torn write from a crash; compaction will drop it
+                    dead += 1
+                    continue
+                if record.get("clear"):
+                    dead += len(records) + 1
+                    records = []
+                else:
+                    records.append(record)
+    except FileNotFoundError:
+        pass
+    return records, dead
+
+
+def count_log(path):
+    """(live, dead) record counts of a log file, as read_log() would report"""
+    live = dead = 0
+    try:
+        f = open(path, "rb")
+    except FileNotFoundError:
+        return live, dead
+    with f:
+        for line in f:
+            if not line.strip():
+                continue
+            record = _decode(line)
+            if record is None:
+                dead += 1
+            elif record.get("clear"):
+                dead += live + 1
+                live = 0
+            else:
+                live += 1
+    return live, dead
+
+
+def terminate_log(path):
+    """End a log with a newline, so a torn last line is not glued to the next record"""
+    try:
+        with open(path, "rb+") as f:
+            f.seek(0, os.SEEK_END)
+            if f.tell() == 0:
+                return
+            f.seek(-1, os.SEEK_END)
+            if f.read(1) != b"\n":
+                f.write(b"\n")
+    except FileNotFoundError:
+        pass
+
+
+def iter_log(path, end=None):
+    """Yield decoded records oldest first, including clear markers
+
+    Reading stops at byte offset end if given (a snapshot of the log).
+    Torn lines are skipped.
+    """
+    try:
+        f = open(path, "rb")
+    except FileNotFoundError:
+        return
+    with f:
+        position = 0
+        for line in f:
+            position += len(line)
+            if end is not None and position > end:
+                return
+            record = _decode(line)
+            if record is not None:
+                yield record
+
+
+class ReverseLogReader:
+    """Reads a log newest-first in blocks, without loading the whole file
+
+    Only the file size at open time is considered (a snapshot), so records
+    appended later are not returned. Reading stops at the most recent clear
+    marker. Records can be re-read later by their byte offset, which lets a
+    view keep offsets instead of decoded records.
+    """
+
+    BLOCK_SIZE = 1 << 16
+
+    def __init__(self, path, block_size=BLOCK_SIZE):
+        self.block_size = block_size
+        self.done = False
+        try:
+            self._file = open(path, "rb")
+        except FileNotFoundError:
+            self._file = None
+            self.done = True
+            self._pos = 0
+        else:
+            self._file.seek(0, os.SEEK_END)
+            self._pos = self._file.tell()
+        self.end = self._pos
+        # Unconsumed bytes [self._pos, self._pos + len(self._buffer))
+        self._buffer = b""
+
+    def read(self, count):
+        """Return up to count (offset, record) pairs, newest first"""
+        items = []
+        while len(items) < count and not self.done:
+            buffer = self._buffer
+            index = buffer.rfind(b"\n", 0, len(buffer) - 1)
+            if index == -1 and self._pos > 0:
+                size = min(self.block_size, self._pos)
+                self._pos -= size
+                self._file.seek(self._pos)
+                self._buffer = self._file.read(size) + buffer
+                continue
+            line = buffer[index + 1:]
+            offset = self._pos + index + 1
+            self._buffer = buffer[:index + 1]
+            if index == -1:
+                self.done = True
+            record = _decode(line)
+            if record is None:
+                continue
+            if record.get("clear"):
+                self.done = True
+                break
+            items.append((offset, record))
+        return items
+
+    def record_at(self, offset):
+        """Re-read the record starting at a byte offset"""
+        self._file.seek(offset)
+        return _decode(self._file.readline()) or make_record("", None)
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        self.done = True
+
+
+def _decode(line):
+    line = line.strip()
+    if not line:
+        return None
+    try:
+        return json.loads(line)
+    except ValueError:
+        return None
+
+
+def read_legacy(path):
+    """Read the legacy JSON array history file as records"""
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    records = []
+    for item in data:
+        if isinstance(item, dict):
+            records.append(item)
+        else:
+            records.append({"entry": str(item), "time": None})
+    return records
+
+
+def write_log(path, records):
+    """Atomically replace a log file with the given records"""
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        for record in records:
+            f.write(json.dumps(record, ensure_ascii=False))
+            f.write("\n")
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+class HistoryStore:
+    """Append-only history log with a group-committing background writer"""
+
+    # Other processes do not write to the same log
+    shared = False
+
+    def __init__(self, path=LOG_FILE, legacy_path=LEGACY_FILE,
+                 commit_interval=COMMIT_INTERVAL,
+                 compact_threshold=COMPACT_THRESHOLD):
+        self.path = path
+        self.legacy_path = legacy_path
+        self.commit_interval = commit_interval
+        self.compact_threshold = compact_threshold
+        self.live = 0
+        self.dead = 0
+        self._counted = False      # live/dead reflect the log on disk
+        self._prepared = False     # the writer has checked the log's tail
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def open(self):
+        """Prepare the log, importing the legacy JSON file the first time"""
+        if (not os.path.exists(self.path) and self.legacy_path
+                and os.path.exists(self.legacy_path)):
+            try:
+                self.import_json(self.legacy_path)
+            except (OSError, ValueError):
+                pass
+
+    def reverse_reader(self):
+        """A newest-first reader over the records currently on disk"""
+        self.open()
+        return ReverseLogReader(self.path)
+
+    def iter_records(self, end=None):
+        """Records oldest first up to a reader's end, including clear markers"""
+        return iter_log(self.path, end)
+
+    def load(self):
+        """Load all live records, importing the legacy JSON file if needed"""
+        self.open()
+        records, dead = read_log(self.path)
+        self.live = len(records)
+        self.dead = dead
+        self._counted = True
+        if self.dead >= self.compact_threshold:
+            self.compact()
+        return records
+
+    def import_json(self, path):
+        """Import a legacy JSON array of entries, appending to the log"""
+        records = read_legacy(path)
+        existing, _ = read_log(self.path)
+        write_log(self.path, existing + records)
+        return records
+
+    def append(self, entry, timestamp=None, ref=None):
+        """Queue one entry for writing; returns the record"""
+        record = make_record(entry, timestamp, ref)
+        self._submit((_APPEND, record))
+        return record
+
+    def clear(self):
+        """Queue a clear marker; the log is compacted in the background"""
+        self._submit((_CLEAR, None))
+
+    def compact(self):
+        """Queue a compaction of the log"""
+        self._submit((_COMPACT, None))
+
+    def flush(self, timeout=None):
+        """Block until everything queued so far is on disk"""
+        if self._thread is None:
+            return True
+        done = threading.Event()
+        self._queue.put((_FLUSH, done))
+        return done.wait(timeout)
+
+    def close(self, timeout=5.0):
+        """Flush pending records and stop the writer thread"""
+        with self._lock:
+            thread = self._thread
+            self._thread = None
+        if thread is not None:
+            self._queue.put((_STOP, None))
+            thread.join(timeout)
+
+    def _submit(self, command):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name="history-writer", daemon=True)
+                self._thread.start()
+        self._queue.put(command)
+
+    def _run(self):
+        """Writer loop: gather a batch, write it, fsync once"""
+        stop = False
+        while not stop:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.commit_interval
+            while batch[-1][0] == _APPEND:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            try:
+                stop = self._apply(batch)
+            except (OSError, ValueError):
+                # Never let a disk error or a corrupt log kill the writer;
+                # records are lost the same way a failed save_history()
+                # would lose them
+                stop = any(kind == _STOP for kind, _ in batch)
+
+    def _prepare(self):
+        """Before the first write: terminate a torn tail and count the records
+
+        Runs on the writer thread, so the GUI (which reads the log with a
+        ReverseLogReader, not load()) never waits for the scan.
+        """
+        terminate_log(self.path)
+        if not self._counted:
+            live, dead = count_log(self.path)
+            self.live += live
+            self.dead += dead
+            self._counted = True
+        self._prepared = True
+
+    def _apply(self, batch):
+        if not self._prepared:
+            self._prepare()
+        lines = []
+        waiters = []
+        stop = False
+        compact = False
+        for kind, payload in batch:
+            if kind == _APPEND:
+                lines.append(json.dumps(payload, ensure_ascii=False) + "\n")
+                self.live += 1
+            elif kind == _CLEAR:
+                lines.append('{"clear": true}\n')
+                self.dead += self.live + 1
+                self.live = 0
+            elif kind == _COMPACT:
+                compact = True
+            elif kind == _FLUSH:
+                waiters.append(payload)
+            elif kind == _STOP:
+                stop = True
+        try:
+            if lines:
+                with profiler.stage("history.write"):
+                    with open(self.path, "a", encoding="utf-8") as f:
+                        f.writelines(lines)
+                        f.flush()
+                        os.fsync(f.fileno())
+            if compact or (self.dead >= self.compact_threshold
+                           and self.dead > self.live):
+                with profiler.stage("history.compact"):
+                    self._compact_now()
+        finally:
+            for waiter in waiters:
+                waiter.set()
+        return stop
+
+    def _compact_now(self):
+        records, _ = read_log(self.path)
+        write_log(self.path, records)
+        self.live = len(records)
+        self.dead = 0
+        self._counted = True
@@ -0,0 +1,358 @@
+"""SQLite history backend, shared by all calculator windows.
+
+An alternative to the JSON-lines log for running several calculators at
+once. The database lives in the user data directory (not the working
+directory) and uses WAL mode, so any number of processes can read while
+one writes. Writers wait for each other (busy timeout) instead of failing.
+Each process still batches its records into one transaction per group
+commit, on the same background writer thread as HistoryStore.
+
+Other windows learn about new rows by polling: PRAGMA data_version tells
+cheaply whether any other connection has committed, and only then are the
+rows past the last seen id read. A clear bumps a generation counter, so
+windows can tell a clear from new rows.
+
+The first time a database is opened, the legacy JSON file and the
+JSON-lines log in the working directory are imported once (each source
+is recorded, so nothing is imported twice even with several windows).
+
+Enable with CALC_HISTORY_BACKEND=sqlite.
+"""
+import os
+import shutil
+import sqlite3
+import sys
+
+from calc_history import (LEGACY_FILE, LOG_FILE, _APPEND, _CLEAR, _COMPACT, _FLUSH, _STOP,
+                          HistoryStore, make_record, read_legacy, read_log)
+from calc_profile import profiler
+
+APP_NAME = "CalculatorPro"
+DB_FILE = "history.sqlite3"
+BUSY_TIMEOUT = 10.0   # seconds a writer waits for another process's lock
+FETCH_BATCH = 1000
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS history (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    expression TEXT NOT NULL,
+    entry TEXT NOT NULL,
+    time TEXT,
+    ref TEXT,
+    origin TEXT
+);
+CREATE INDEX IF NOT EXISTS history_time ON history(time);
+CREATE INDEX IF NOT EXISTS history_expression ON history(expression);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+INSERT OR IGNORE INTO meta (key, value) VALUES ('generation', '0');
+"""
+
+
+def data_dir():
+    """Per-user data directory for the calculator (created if needed)"""
+    override = os.environ.get("CALC_DATA_DIR")
+    if override:
+        directory = override
+    elif sys.platform == "win32":
+        base = os.environ.get("LOCALAPPDATA") or os.path.expanduser("~\\AppData\\Local")
+        directory = os.path.join(base, APP_NAME)
+    elif sys.platform == "darwin":
+        directory = os.path.expanduser(f"~/Library/Application Support/{APP_NAME}")
+    else:
+        base = os.environ.get("XDG_DATA_HOME") or os.path.expanduser("~/.local/share")
+        directory = os.path.join(base, APP_NAME.lower())
+    os.makedirs(directory, exist_ok=True)
+    return directory
+
+
+def connect(path):
+    """Open the database in WAL mode, creating the schema"""
+    conn = sqlite3.connect(path, timeout=BUSY_TIMEOUT, isolation_level=None)
+    conn.execute("PRAGMA journal_mode=WAL")
+    # NORMAL is durable against application crashes in WAL mode; a power
+    # loss can only drop the last transactions, never corrupt the database
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def _row(entry, timestamp, ref, origin):
+    expression = entry.rpartition(" = ")[0] or entry
+    return (expression, entry, timestamp, ref, origin)
+
+
+def _record(entry, timestamp, ref):
+    record = {"entry": entry, "time": timestamp}
+    if ref is not None:
+        record["ref"] = ref
+    return record
+
+
+class SQLiteReverseReader:
+    """Newest-first pages of history rows, like ReverseLogReader
+
+    end is the largest id at open time; rows added later are not returned.
+    Rows are addressed by id, so a view can keep ids and re-read rows.
+    """
+
+    def __init__(self, path):
+        self._conn = connect(path)
+        self.end = self._conn.execute(
+            "SELECT COALESCE(MAX(id), 0) FROM history").fetchone()[0]
+        self.generation = self._conn.execute(
+            "SELECT value FROM meta WHERE key = 'generation'").fetchone()[0]
+        self._next = self.end
+        self.done = self.end == 0
+
+    def read(self, count):
+        """Return up to count (id, record) pairs, newest first"""
+        if self.done:
+            return []
+        rows = self._conn.execute(
+            "SELECT id, entry, time, ref FROM history WHERE id <= ? "
+            "ORDER BY id DESC LIMIT ?", (self._next, count)).fetchall()
+        if len(rows) < count:
+            self.done = True
+        if rows:
+            self._next = rows[-1][0] - 1
+        return [(row_id, _record(entry, timestamp, ref))
+                for row_id, entry, timestamp, ref in rows]
+
+    def record_at(self, row_id):
+        """Re-read a row by id"""
+        row = self._conn.execute(
+            "SELECT entry, time, ref FROM history WHERE id = ?", (row_id,)).fetchone()
+        if row is None:
+            return make_record("", None)
+        return _record(*row)
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+        self.done = True
+
+
+class SQLiteHistoryStore(HistoryStore):
+    """History in a WAL-mode SQLite database shared between processes"""
+
+    shared = True
+
+    def __init__(self, path=None, legacy_paths=(LEGACY_FILE, LOG_FILE),
+                 value_dirs=(None, None), **kwargs):
+        if path is None:
+            path = os.path.join(data_dir(), DB_FILE)
+        super().__init__(path, None, **kwargs)
+        self.legacy_paths = legacy_paths
+        self.value_dirs = value_dirs        # (old, new) exact-value directories
+        self.origin = os.urandom(8).hex()   # tells our rows from other windows'
+        self._opened = False
+        self._writer = None                 # connection of the writer thread
+        self._poller = None                 # connection of the polling thread
+        self._seen = 0
+        self._data_version = None
+        self._generation = None
+
+    def open(self):
+        """Create the database and import legacy history the first time"""
+        if self._opened:
+            return
+        conn = connect(self.path)
+        try:
+            self._migrate(conn)
+        finally:
+            conn.close()
+        self._opened = True
+
+    def _migrate(self, conn):
+        sources = [os.path.abspath(path) for path in self.legacy_paths
+                   if path and os.path.exists(path)]
+        if not sources:
+            return
+        # IMMEDIATE takes the write lock first, so two windows starting at
+        # the same time cannot both import a source
+        # HistoryStore.open() imports the legacy JSON file into the log and
+        # keeps it, so when a log exists it already holds those entries
+        has_log = any(source.endswith(".jsonl") for source in sources)
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            for source in sources:
+                key = f"imported:{source}"
+                if conn.execute("SELECT 1 FROM meta WHERE key = ?", (key,)).fetchone():
+                    continue
+                if has_log and not source.endswith(".jsonl"):
+                    conn.execute("INSERT INTO meta (key, value) VALUES (?, ?)", (key, "log"))
+                    continue
+                try:
+                    if source.endswith(".jsonl"):
+                        records, _ = read_log(source)
+                    else:
+                        records = read_legacy(source)
+                except (OSError, ValueError):
+                    continue
+                self._insert(conn, [_row(r.get("entry", ""), r.get("time"), r.get("ref"), None)
+                                    for r in records])
+                self._copy_values(records)
+                conn.execute("INSERT INTO meta (key, value) VALUES (?, ?)", (key, str(len(records))))
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    def _copy_values(self, records):
+        """Copy exact values referenced by imported records to the new value store"""
+        source, target = self.value_dirs
+        if not source or not target or os.path.abspath(source) == os.path.abspath(target):
+            return
+        for record in records:
+            ref = record.get("ref")
+            if not ref:
+                continue
+            name = f"{ref}.bin"
+            try:
+                os.makedirs(target, exist_ok=True)
+                shutil.copyfile(os.path.join(source, name), os.path.join(target, name))
+            except OSError:
+                pass
+
+    def reverse_reader(self):
+        """A newest-first reader over the rows currently stored"""
+        try:
+            self.open()
+            reader = SQLiteReverseReader(self.path)
+        except sqlite3.Error as e:
+            # Callers handle storage failures as OSError, like the log
+            raise OSError(str(e)) from e
+        # Rows after the reader's snapshot are reported by poll()
+        self._seen = max(self._seen, reader.end)
+        self._generation = reader.generation
+        return reader
+
+    def iter_records(self, end=None):
+        """Records oldest first up to id end (iterate in one thread only)"""
+        self.open()
+        conn = connect(self.path)
+        try:
+            last = 0
+            while True:
+                query = "SELECT id, entry, time, ref FROM history WHERE id > ?"
+                params = [last]
+                if end is not None:
+                    query += " AND id <= ?"
+                    params.append(end)
+                rows = conn.execute(query + " ORDER BY id LIMIT ?",
+                                    params + [FETCH_BATCH]).fetchall()
+                if not rows:
+                    return
+                for row_id, entry, timestamp, ref in rows:
+                    yield _record(entry, timestamp, ref)
+                last = rows[-1][0]
+        finally:
+            conn.close()
+
+    def load(self):
+        """Load all records, oldest first"""
+        records = list(self.iter_records())
+        self.live = len(records)
+        return records
+
+    def import_json(self, path):
+        """Import a legacy JSON array of entries"""
+        records = read_legacy(path)
+        for record in records:
+            self._submit((_APPEND, record))
+        self.flush()
+        return records
+
+    def poll(self):
+        """Changes made by other windows since the last poll
+
+        Returns (records, cleared): records added by other processes,
+        oldest first, and whether the history was cleared meanwhile (the
+        caller should then reload). Call from one thread only.
+        """
+        try:
+            return self._poll()
+        except sqlite3.Error as e:
+            raise OSError(str(e)) from e
+
+    def _poll(self):
+        self.open()
+        if self._poller is None:
+            self._poller = connect(self.path)
+        conn = self._poller
+        version = conn.execute("PRAGMA data_version").fetchone()[0]
+        if version == self._data_version:
+            return [], False
+        self._data_version = version
+        generation = conn.execute(
+            "SELECT value FROM meta WHERE key = 'generation'").fetchone()[0]
+        cleared = self._generation is not None and generation != self._generation
+        self._generation = generation
+        rows = conn.execute(
+            "SELECT id, entry, time, ref, origin FROM history WHERE id > ? ORDER BY id",
+            (self._seen,)).fetchall()
+        if rows:
+            self._seen = rows[-1][0]
+        records = [_record(entry, timestamp, ref)
+                   for _, entry, timestamp, ref, origin in rows if origin != self.origin]
+        return records, cleared
+
+    def close(self, timeout=5.0):
+        super().close(timeout)
+        if self._poller is not None:
+            self._poller.close()
+            self._poller = None
+
+    def _apply(self, batch):
+        """Write a batch of commands in one transaction (writer thread)"""
+        if self._writer is None:
+            self.open()
+            self._writer = connect(self.path)
+        conn = self._writer
+        kinds = {kind for kind, _ in batch}
+        waiters = [payload for kind, payload in batch if kind == _FLUSH]
+        stop = _STOP in kinds
+        rows = []
+        try:
+            if kinds & {_APPEND, _CLEAR}:
+                with profiler.stage("history.write"):
+                    conn.execute("BEGIN IMMEDIATE")
+                    try:
+                        for kind, payload in batch:
+                            if kind == _APPEND:
+                                rows.append(_row(payload.get("entry", ""), payload.get("time"),
+                                                 payload.get("ref"), self.origin))
+                            elif kind == _CLEAR:
+                                self._insert(conn, rows)
+                                rows = []
+                                conn.execute("DELETE FROM history")
+                                conn.execute("UPDATE meta SET value = CAST(value AS INTEGER) + 1 "
+                                             "WHERE key = 'generation'")
+                        self._insert(conn, rows)
+                        conn.execute("COMMIT")
+                    except BaseException:
+                        conn.execute("ROLLBACK")
+                        raise
+            if _COMPACT in kinds:
+                with profiler.stage("history.compact"):
+                    conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        except sqlite3.Error:
+            # Like a disk error in the log: the batch is lost, the writer lives
+            pass
+        finally:
+            for waiter in waiters:
+                waiter.set()
+            if stop:
+                conn.close()
+                self._writer = None
+        return stop
+
+    def _insert(self, conn, rows):
+        if rows:
+            conn.executemany(
+                "INSERT INTO history (expression, entry, time, ref, origin) "
+                "VALUES (?, ?, ?, ?, ?)", rows)
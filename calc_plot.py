@@ -0,0 +1,185 @@
+"""Adaptive sampling and level-of-detail reduction for function plots.
+
+sample() evaluates f(x) on a coarse uniform grid and then subdivides the
+intervals where the curve is not yet straight to within a tolerance (half a
+pixel of the current view), so samples are dense where curvature is high
+and sparse where the function is nearly linear. Points where f(x) raises or
+is not a finite real number become gaps (NaN): the intervals next to a gap
+are bisected to find the domain edge (log, sqrt), and a jump larger than the
+view at the finest level is treated as a pole (tan) and broken as well.
+
+reduce() turns any number of samples into at most four points per pixel
+column (first, min, max and last of the column), which draws exactly the
+same pixels as the full polyline.
+
+Cancellation is cooperative: pass a threading.Event and sample() returns
+None soon after it is set. This module does not import Qt.
+"""
+import bisect
+import math
+
+INITIAL_SAMPLES = 256
+MAX_DEPTH = 12            # halvings of an initial interval
+MAX_SAMPLES = 200000
+CANCEL_CHECK = 256        # evaluations between checks of the cancel event
+NAN = float("nan")
+
+
+def safe(fn):
+    """Wrap fn so it returns a float, or NaN where it fails or is not finite"""
+    def evaluate(x):
+        try:
+            y = float(fn(x))
+        except Exception:
+            return NAN
+        return y if math.isfinite(y) else NAN
+    return evaluate
+
+
+def fit_range(ys, low=0.02, high=0.98):
+    """A y range showing the bulk of the samples (poles do not stretch it)"""
+    finite = sorted(y for y in ys if y == y)
+    if not finite:
+        return -1.0, 1.0
+    last = len(finite) - 1
+    y0 = finite[int(low * last)]
+    y1 = finite[int(high * last)]
+    if y1 - y0 < 1e-12 * max(1.0, abs(y0)):
+        # A constant: center it in a unit-sized view
+        return y0 - 1.0, y0 + 1.0
+    margin = (y1 - y0) * 0.1
+    return y0 - margin, y1 + margin
+
+
+def fit_view(fn, x0, x1, count=INITIAL_SAMPLES):
+    """fit_range() of fn on a uniform grid over [x0, x1]
+
+    A uniform grid, because adaptive samples crowd near poles.
+    """
+    f = safe(fn)
+    step = (x1 - x0) / count
+    return fit_range([f(x0 + i * step) for i in range(count + 1)])
+
+
+def sample(fn, x0, x1, y_span=None, height=400, cancel=None,
+           initial=INITIAL_SAMPLES, max_depth=MAX_DEPTH, max_samples=MAX_SAMPLES):
+    """Adaptively sample fn over [x0, x1]
+
+    y_span is the height of the view in y units and height its size in
+    pixels; together they set the tolerance. Without y_span it is taken
+    from the initial grid. Returns (xs, ys), x ascending, with NaN ys at
+    gaps, or None if cancelled.
+    """
+    f = safe(fn)
+    step = (x1 - x0) / initial
+    xs = [x0 + i * step for i in range(initial)] + [x1]
+    ys = [f(x) for x in xs]
+    if y_span is None:
+        y0, y1 = fit_range(ys)
+        y_span = y1 - y0
+    tolerance = 0.5 * y_span / max(1, height)
+    evaluations = len(xs)
+
+    # Each initial interval gets an equal share of the budget, so a
+    # function that never looks smooth is sampled evenly, not left to right
+    budget = max(1, (max_samples - evaluations) // initial)
+    out_x = [xs[0]]
+    out_y = [ys[0]]
+    for i in range(initial):
+        # Depth-first over [a, b], emitting points left to right
+        stack = [(xs[i], ys[i], xs[i + 1], ys[i + 1], 0)]
+        limit = evaluations + budget
+        while stack:
+            a, fa, b, fb, depth = stack.pop()
+            m = 0.5 * (a + b)
+            if depth >= max_depth or evaluations >= limit or not a < m < b:
+                # Finest level: break the line at a jump bigger than the view
+                if fa == fa and fb == fb and abs(fb - fa) > y_span:
+                    out_x.append(m)
+                    out_y.append(NAN)
+                out_x.append(b)
+                out_y.append(fb)
+                continue
+            fm = f(m)
+            evaluations += 1
+            if cancel is not None and evaluations % CANCEL_CHECK == 0 and cancel.is_set():
+                return None
+            if fa != fa and fb != fb and fm != fm:
+                # Inside a gap
+                smooth = depth > 0
+            elif fa != fa or fb != fb or fm != fm:
+                # Near a domain edge: keep bisecting to find it
+                smooth = False
+            else:
+                smooth = abs(fm - 0.5 * (fa + fb)) <= tolerance
+            if smooth:
+                out_x.append(b)
+                out_y.append(fb)
+            else:
+                stack.append((m, fm, b, fb, depth + 1))
+                stack.append((a, fa, m, fm, depth + 1))
+    return out_x, out_y
+
+
+def reduce(xs, ys, x0, x1, width):
+    """Downsample to first/min/max/last per pixel column of [x0, x1]
+
+    xs must be ascending. Gaps (NaN ys) are kept as single NaN points.
+    Returns (xs, ys) of at most about 4 * width points plus gaps.
+    """
+    start = max(0, bisect.bisect_left(xs, x0) - 1)
+    stop = min(len(xs), bisect.bisect_right(xs, x1) + 1)
+    if stop - start <= 4 * width:
+        return xs[start:stop], ys[start:stop]
+    scale = width / (x1 - x0)
+    out_x = []
+    out_y = []
+    column = None
+    for i in range(start, stop):
+        x = xs[i]
+        y = ys[i]
+        if y != y:
+            if column is not None:
+                _flush(column, out_x, out_y)
+                column = None
+            out_x.append(x)
+            out_y.append(NAN)
+            continue
+        c = int((x - x0) * scale)
+        if column is not None and column[0] == c:
+            if y < column[4]:
+                column[3], column[4] = x, y
+            elif y > column[6]:
+                column[5], column[6] = x, y
+            column[7], column[8] = x, y
+        else:
+            if column is not None:
+                _flush(column, out_x, out_y)
+            # [column, first x, y, min x, y, max x, y, last x, y]
+            column = [c, x, y, x, y, x, y, x, y]
+    if column is not None:
+        _flush(column, out_x, out_y)
+    return out_x, out_y
+
+
+def _flush(column, out_x, out_y):
+    points = sorted({(column[1], column[2]), (column[3], column[4]),
+                     (column[5], column[6]), (column[7], column[8])})
+    for x, y in points:
+        out_x.append(x)
+        out_y.append(y)
+
+
+def ticks(lo, hi, count=6):
+    """Round-numbered tick positions covering [lo, hi]"""
+    if not hi > lo:
+        return []
+    raw = (hi - lo) / count
+    magnitude = 10 ** math.floor(math.log10(raw))
+    for factor in (1, 2, 5, 10):
+        step = factor * magnitude
+        if step >= raw:
+            break
+    first = math.ceil(lo / step)
+    last = math.floor(hi / step)
+    return [i * step for i in range(first, last + 1)]
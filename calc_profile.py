@@ -0,0 +1,174 @@
+"""Opt-in timing instrumentation.
+
+Per-stage timings of each calculation (parse, evaluate, history, display)
+and of startup are recorded when profiling is on, and summarized as
+p50/p95/p99 per stage. Turn it on with the CALC_PROFILE environment
+variable, or at runtime with Ctrl+Shift+P in the window:
+
+    CALC_PROFILE=1 python calculator.py          # stage timings
+    CALC_PROFILE=cprofile python calculator.py   # also a cProfile of the session
+
+Timings are exported to calculator_profile.json (Ctrl+Shift+E, and on exit);
+a cProfile capture is written to calculator_profile.prof when it stops.
+When profiling is off, stage() returns a shared no-op context manager, so
+instrumented code pays one method call per stage.
+
+This module does not import Qt.
+"""
+import json
+import os
+import threading
+import time
+from collections import deque
+
+PROFILE_FILE = "calculator_profile.json"
+CPROFILE_FILE = "calculator_profile.prof"
+SAMPLE_LIMIT = 10000  # most recent samples kept per stage for percentiles
+
+
+class StageStats:
+    """Count, total and recent samples of one stage"""
+    __slots__ = ("count", "total", "samples")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.samples = deque(maxlen=SAMPLE_LIMIT)
+
+    def add(self, seconds):
+        self.count += 1
+        self.total += seconds
+        self.samples.append(seconds)
+
+    def summary(self):
+        """Milliseconds: mean over all samples, percentiles over recent ones"""
+        ordered = sorted(self.samples)
+        last = len(ordered) - 1
+
+        def percentile(fraction):
+            return ordered[min(last, int(fraction * len(ordered)))] * 1000
+
+        return {
+            "count": self.count,
+            "mean_ms": self.total / self.count * 1000,
+            "p50_ms": percentile(0.50),
+            "p95_ms": percentile(0.95),
+            "p99_ms": percentile(0.99),
+            "max_ms": ordered[-1] * 1000,
+        }
+
+
+class _StageTimer:
+    __slots__ = ("profiler", "name", "start")
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.profiler.record(self.name, time.perf_counter() - self.start)
+        return False
+
+
+class _NullTimer:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+
+class Profiler:
+    """Collects stage timings; thread-safe"""
+
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.stats = {}
+        self._lock = threading.Lock()
+        self._cprofile = None
+
+    def stage(self, name):
+        """Context manager timing one stage (a no-op when disabled)"""
+        if not self.enabled:
+            return _NULL_TIMER
+        return _StageTimer(self, name)
+
+    def record(self, name, seconds):
+        """Add one timing in seconds"""
+        if not self.enabled:
+            return
+        with self._lock:
+            stats = self.stats.get(name)
+            if stats is None:
+                stats = self.stats[name] = StageStats()
+            stats.add(seconds)
+
+    def record_all(self, timings, prefix=""):
+        """Add a dict of stage -> seconds"""
+        for name, seconds in timings.items():
+            self.record(prefix + name, seconds)
+
+    def summary(self):
+        """Per-stage count, mean and percentiles, in milliseconds"""
+        with self._lock:
+            return {name: stats.summary() for name, stats in sorted(self.stats.items())}
+
+    def status_text(self, name):
+        """One-line summary of a stage for a status bar"""
+        with self._lock:
+            stats = self.stats.get(name)
+            if stats is None:
+                return ""
+            summary = stats.summary()
+        return (f"{name}: p50 {summary['p50_ms']:.2f} ms · p95 {summary['p95_ms']:.2f} ms · "
+                f"p99 {summary['p99_ms']:.2f} ms  (n={summary['count']})")
+
+    def reset(self):
+        with self._lock:
+            self.stats = {}
+
+    def export(self, path=PROFILE_FILE):
+        """Write the summary as JSON; returns the path"""
+        data = {"time": time.strftime("%Y-%m-%dT%H:%M:%S"), "stages": self.summary()}
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=2)
+        return path
+
+    # ----------------------------------------------------------------------
+    # cProfile capture
+    # ----------------------------------------------------------------------
+
+    @property
+    def cprofile_running(self):
+        return self._cprofile is not None
+
+    def start_cprofile(self):
+        """Start capturing a cProfile of this thread"""
+        if self._cprofile is None:
+            import cProfile
+            self._cprofile = cProfile.Profile()
+            self._cprofile.enable()
+
+    def stop_cprofile(self, path=CPROFILE_FILE):
+        """Stop the capture and dump it (view with python -m pstats); returns the path"""
+        capture, self._cprofile = self._cprofile, None
+        if capture is None:
+            return None
+        capture.disable()
+        capture.dump_stats(path)
+        return path
+
+
+_mode = os.environ.get("CALC_PROFILE", "").strip().lower()
+profiler = Profiler(enabled=_mode not in ("", "0", "false", "no"))
+if _mode == "cprofile":
+    profiler.start_cprofile()
@@ -0,0 +1,105 @@
+"""Exact integers for programmer mode: word widths, two's complement, radix views.
+
+Values are Python ints of any size; nothing goes through float, so integers
+above 2**53 convert exactly. With a word width, values wrap to that many
+bits: signed (two's complement) or unsigned. Negative values are shown in
+hex, octal and binary as their two's complement bit pattern within the
+word; unbounded negative values keep a minus sign.
+
+Hex, octal and binary digits are produced in linear time (power-of-two
+bases need no division). Decimal digits of huge values use the
+subquadratic conversion in calc_bignum. Views are rendered line by line
+(see digit_lines), so the UI can show multi-megabit values in chunks.
+
+This module does not import Qt.
+"""
+from calc_bignum import full_digits
+
+WORD_WIDTHS = (None, 64, 32, 16, 8)   # None: unbounded
+RADIXES = {"HEX": 16, "DEC": 10, "OCT": 8, "BIN": 2}
+PREFIXES = {16: "0x", 10: "", 8: "0o", 2: "0b"}
+GROUP_SIZES = {16: 4, 10: 3, 8: 3, 2: 4}
+LINE_DIGITS = {16: 64, 10: 60, 8: 63, 2: 64}
+
+
+def integer(value):
+    """An evaluation result as an exact int (floats are truncated)
+
+    Raises ValueError for NaN and OverflowError for infinities.
+    """
+    if isinstance(value, int):
+        return value
+    return int(value)
+
+
+def wrap(value, width, signed=True):
+    """value reduced to width bits, two's complement if signed"""
+    if width is None:
+        return value
+    value &= (1 << width) - 1
+    if signed and value >> (width - 1):
+        value -= 1 << width
+    return value
+
+
+def digits(value, base, width=None):
+    """Digits of value in base, without prefix
+
+    Negative values are written as their bit pattern when a width is
+    given (except in decimal), else with a minus sign.
+    """
+    if value < 0 and width is not None and base != 10:
+        value &= (1 << width) - 1
+    sign = "-" if value < 0 else ""
+    value = abs(value)
+    if base == 16:
+        text = format(value, "x")
+    elif base == 8:
+        text = format(value, "o")
+    elif base == 2:
+        text = format(value, "b")
+    else:
+        text = full_digits(value)
+    return sign + text
+
+
+def literal(value, base, width=None):
+    """Expression text for value in base, e.g. '0xff' or '-0b101'"""
+    text = digits(value, base, width)
+    if text.startswith("-"):
+        return "-" + PREFIXES[base] + text[1:]
+    return PREFIXES[base] + text
+
+
+def radix_views(value, width=None, signed=True):
+    """Wrapped value and its digits in every radix
+
+    Returns a dict with "value", "bits" and one entry per RADIXES name.
+    """
+    value = wrap(value, width, signed)
+    views = {"value": value, "bits": value.bit_length()}
+    for name, base in RADIXES.items():
+        views[name] = digits(value, base, width)
+    return views
+
+
+def digit_lines(text, base):
+    """Yield text as lines of LINE_DIGITS[base] digits, grouped with spaces
+
+    Lines and groups are aligned to the least significant digit, like a
+    printed bit pattern. Linear in the length of text.
+    """
+    sign = ""
+    if text.startswith("-"):
+        sign, text = "-", text[1:]
+    group = GROUP_SIZES[base]
+    per_line = LINE_DIGITS[base]
+    start, end = 0, len(text) % per_line or per_line
+    while start < len(text):
+        line = text[start:end]
+        head = len(line) % group
+        groups = [line[:head]] if head else []
+        groups.extend(line[i:i + group] for i in range(head, len(line), group))
+        yield sign + " ".join(groups)
+        sign = ""
+        start, end = end, end + per_line
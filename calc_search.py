@@ -0,0 +1,279 @@
+"""Indexed incremental search over calculation history.
+
+Expressions are indexed by trigram (a posting list of entry ids per
+three-character substring), results by value in a sorted array and
+timestamps in a sorted list, so a query only touches the smallest posting
+list or a bisected range instead of scanning every entry. The index is
+built once from the stored history in a background thread and then kept
+up to date as calculations are added.
+
+Query syntax:
+
+    sqrt(2          expression substring (case-insensitive)
+    =42             result equal to 42
+    =10..20         result in [10, 20]
+    >100  <=0.5     result comparisons
+    @2026-10-16     timestamp prefix (date, or date and time)
+"""
+import bisect
+import heapq
+import itertools
+import threading
+import time
+from array import array
+
+RESULT_LIMIT = 500
+BUILD_BATCH = 1000
+
+
+def split_entry(entry):
+    """Split 'expression = result' into its two parts"""
+    expression, sep, result = entry.rpartition(" = ")
+    if not sep:
+        return entry, ""
+    return expression, result
+
+
+def parse_value(text):
+    """Numeric value of a result string, or None"""
+    try:
+        return float(text)
+    except ValueError:
+        return None
+
+
+def trigrams(text):
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+class HistoryIndex:
+    """Search index over history records"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.entries = []        # entry text by id
+        self.times = []          # ISO timestamp (or None) by id
+        self.refs = {}           # id -> exact value reference
+        self._expressions = []   # lowercased expression by id
+        self._postings = {}      # trigram -> array of ids (ascending)
+        self._value_keys = []    # sorted result values
+        self._value_ids = array("I")
+        self._time_keys = []     # sorted timestamps
+        self._time_ids = array("I")
+        self._building = False
+        self._pending = []
+        self._generation = 0
+        self.ready = False
+
+    def __len__(self):
+        return len(self.entries)
+
+    def build(self, records, on_ready=None):
+        """Index records (oldest first, e.g. store.iter_records()) in a background thread
+
+        Records added before the first build has run, or while one runs, are
+        queued and indexed after it, so ids stay in chronological order.
+        on_ready is called from the build thread when done.
+        """
+        with self._lock:
+            self._building = True
+            generation = self._generation
+        thread = threading.Thread(target=self._build, args=(records, generation, on_ready),
+                                  name="history-index", daemon=True)
+        thread.start()
+        return thread
+
+    def _build(self, records, generation, on_ready):
+        values = []
+        records = iter(records)
+        while True:
+            batch = list(itertools.islice(records, BUILD_BATCH))
+            if not batch:
+                break
+            with self._lock:
+                if generation != self._generation:
+                    # Cleared while building: nothing from the log is live
+                    return
+                for record in batch:
+                    if record.get("clear"):
+                        self._reset()
+                        values = []
+                        continue
+                    value = self._index(record, sort=False)
+                    if value is not None:
+                        values.append((value, len(self.entries) - 1))
+            # Let the UI thread have the GIL between batches
+            time.sleep(0)
+        with self._lock:
+            if generation != self._generation:
+                return
+            # One sort instead of a sorted insert per record, merged with
+            # anything already indexed
+            values.sort()
+            merged = list(heapq.merge(zip(self._value_keys, self._value_ids), values))
+            self._value_keys = [value for value, _ in merged]
+            self._value_ids = array("I", [i for _, i in merged])
+            pending, self._pending = self._pending, []
+            for record in pending:
+                self._index(record, sort=True)
+            self._building = False
+            self.ready = True
+        if on_ready is not None:
+            on_ready()
+
+    def add(self, record):
+        """Index a new record (from calculate())"""
+        with self._lock:
+            if self._building or not self.ready:
+                self._pending.append(record)
+            else:
+                self._index(record, sort=True)
+
+    def clear(self, rebuild=False):
+        """Drop everything, abandoning a running build
+
+        With rebuild, the log is indexed again by a later build(), so new
+        records stay queued until it has run.
+        """
+        with self._lock:
+            self._reset()
+            self._pending = []
+            self._generation += 1
+            self._building = False
+            self.ready = not rebuild
+
+    def _reset(self):
+        self.entries = []
+        self.times = []
+        self.refs = {}
+        self._expressions = []
+        self._postings = {}
+        self._value_keys = []
+        self._value_ids = array("I")
+        self._time_keys = []
+        self._time_ids = array("I")
+
+    def _index(self, record, sort):
+        """Add one record; returns its numeric result value (or None)"""
+        entry_id = len(self.entries)
+        entry = record.get("entry", "")
+        timestamp = record.get("time")
+        self.entries.append(entry)
+        self.times.append(timestamp)
+        if record.get("ref"):
+            self.refs[entry_id] = record["ref"]
+
+        expression, result = split_entry(entry)
+        expression = expression.lower()
+        self._expressions.append(expression)
+        postings = self._postings
+        for gram in trigrams(expression):
+            ids = postings.get(gram)
+            if ids is None:
+                postings[gram] = array("I", (entry_id,))
+            else:
+                ids.append(entry_id)
+
+        if timestamp:
+            if not self._time_keys or timestamp >= self._time_keys[-1]:
+                self._time_keys.append(timestamp)
+                self._time_ids.append(entry_id)
+            else:
+                position = bisect.bisect_right(self._time_keys, timestamp)
+                self._time_keys.insert(position, timestamp)
+                self._time_ids.insert(position, entry_id)
+
+        value = parse_value(result)
+        if value is not None and sort:
+            position = bisect.bisect_right(self._value_keys, value)
+            self._value_keys.insert(position, value)
+            self._value_ids.insert(position, entry_id)
+        return value
+
+    # ----------------------------------------------------------------------
+    # Queries
+    # ----------------------------------------------------------------------
+
+    def search(self, query, limit=RESULT_LIMIT):
+        """Records matching a query, newest first (at most limit)"""
+        query = query.strip()
+        if not query:
+            return []
+        with self._lock:
+            if query[0] == "@":
+                ids = self._time_prefix(query[1:].strip().replace(" ", "T"))
+            elif query[0] in "=<>":
+                ids = self._value_query(query)
+            else:
+                ids = self._substring(query.lower(), limit)
+            ids = heapq.nlargest(limit, ids)
+            return [self.record(i) for i in ids]
+
+    def record(self, entry_id):
+        record = {"entry": self.entries[entry_id], "time": self.times[entry_id]}
+        if entry_id in self.refs:
+            record["ref"] = self.refs[entry_id]
+        return record
+
+    def _substring(self, text, limit):
+        expressions = self._expressions
+        if len(text) < 3:
+            # Too short for trigrams: scan newest first, stop at limit
+            ids = []
+            for entry_id in range(len(expressions) - 1, -1, -1):
+                if text in expressions[entry_id]:
+                    ids.append(entry_id)
+                    if len(ids) >= limit:
+                        break
+            return ids
+        smallest = None
+        for gram in trigrams(text):
+            ids = self._postings.get(gram)
+            if ids is None:
+                return []
+            if smallest is None or len(ids) < len(smallest):
+                smallest = ids
+        ids = []
+        for entry_id in reversed(smallest):
+            if text in expressions[entry_id]:
+                ids.append(entry_id)
+                if len(ids) >= limit:
+                    break
+        return ids
+
+    def _value_query(self, query):
+        keys = self._value_keys
+        if query.startswith((">=", "<=")):
+            op, bound = query[:2], parse_value(query[2:].strip())
+        elif query[0] in "<>":
+            op, bound = query[0], parse_value(query[1:].strip())
+        else:
+            op, bound = "=", None
+            body = query[1:].strip()
+            if ".." in body:
+                low, _, high = body.partition("..")
+                low, high = parse_value(low.strip()), parse_value(high.strip())
+                if low is None or high is None:
+                    return []
+                return self._value_ids[bisect.bisect_left(keys, low):
+                                       bisect.bisect_right(keys, high)]
+            bound = parse_value(body)
+        if bound is None:
+            return []
+        if op == "=":
+            start, stop = bisect.bisect_left(keys, bound), bisect.bisect_right(keys, bound)
+        elif op == ">":
+            start, stop = bisect.bisect_right(keys, bound), len(keys)
+        elif op == ">=":
+            start, stop = bisect.bisect_left(keys, bound), len(keys)
+        elif op == "<":
+            start, stop = 0, bisect.bisect_left(keys, bound)
+        else:
+            start, stop = 0, bisect.bisect_right(keys, bound)
+        return self._value_ids[start:stop]
+
+    def _time_prefix(self, prefix):
+        keys = self._time_keys
+        start = bisect.bisect_left(keys, prefix)
+        stop = bisect.bisect_left(keys, prefix + "\uffff")
+        return self._time_ids[start:stop]
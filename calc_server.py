@@ -0,0 +1,383 @@
+"""Local evaluation server.
+
+Lets other local tools evaluate expressions exactly like the calculator
+(same functions, result formatting and error messages) over a persistent
+connection, without starting a GUI. The protocol is JSON lines:
+
+    -> {"id": 1, "expr": "sqrt(16) + 2"}
+    <- {"id": 1, "ok": true, "result": "6"}
+    -> {"id": 2, "expr": "1/0"}
+    <- {"id": 2, "ok": false, "error": "Division by zero"}
+
+Requests may be pipelined; each connection gets its responses in request
+order. Requests from all connections are batched and evaluated by a pool of
+persistent worker processes. An expression is always routed to the same
+worker, so the workers' compiled-expression caches and result memos are
+shared by all connections without holding duplicate entries. A batch that
+runs past the timeout is killed; the expression it was stuck on fails with
+"Timed out" and the others are run again, so each slow expression costs
+one timeout whatever the batch size.
+
+    python calc_server.py serve [--port 7654 | --unix calculator.sock] [--jobs 4]
+    python calc_server.py load [--connections 8] [--requests 100000] [--spawn]
+"""
+import argparse
+import asyncio
+import collections
+import json
+import os
+import signal
+import statistics
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from calc_engine import normalize
+from calc_worker import DEFAULT_TIMEOUT, EvaluationProcess, INVALID_EXPRESSION
+
+HOST = "127.0.0.1"
+PORT = 7654
+BATCH_SIZE = 256
+MAX_IN_FLIGHT = 1024   # unanswered requests per connection
+LINE_LIMIT = 1 << 20
+
+TIMED_OUT = "Timed out"
+BAD_REQUEST = "Bad request"
+
+# Expressions sent by the load generator (one in eight is an error)
+LOAD_MIX = [
+    "15 + 25",
+    "(5 + 3) * 2",
+    "sqrt(16) + 2 ** 10",
+    "sin(0.5) * cos(0.25)",
+    "log10(1000) + log(2)",
+    "factorial(20) / 3",
+    "cbrt(27) + 1.5 ** 2",
+    "1 / 0",
+]
+
+
+# --------------------------------------------------------------------------
+# Batching worker pool
+# --------------------------------------------------------------------------
+
+class Shard:
+    """One worker process and the requests queued for it"""
+
+    def __init__(self, timeout):
+        self.timeout = timeout
+        self.process = EvaluationProcess()
+        self.pending = []
+        self.running = False
+        self.job_id = 0
+
+    def run(self, expressions):
+        """Evaluate a batch in the worker (blocking); returns (ok, text) pairs"""
+        if not expressions:
+            return []
+        self.job_id += 1
+        try:
+            conn = self.process.submit(self.job_id, expressions)
+        except (EOFError, OSError):
+            # Worker died since the last batch; start a fresh one
+            self.process.terminate()
+            conn = self.process.submit(self.job_id, expressions)
+        try:
+            if conn.poll(self.timeout):
+                _, _, replies, _ = conn.recv()
+                return replies
+        except (EOFError, OSError):
+            pass
+        # Timed out, or the worker died: the expression it had reached
+        # fails, the rest run again in a fresh worker
+        stuck = min(self.process.progress, len(expressions) - 1)
+        self.process.terminate()
+        return (self.run(expressions[:stuck]) + [(False, TIMED_OUT)]
+                + self.run(expressions[stuck + 1:]))
+
+
+class Batcher:
+    """Queues expressions per worker and evaluates them in batches"""
+
+    def __init__(self, jobs=None, timeout=DEFAULT_TIMEOUT, batch_size=BATCH_SIZE):
+        jobs = jobs or os.cpu_count() or 1
+        self.shards = [Shard(timeout or None) for _ in range(jobs)]
+        self.batch_size = batch_size
+        self.executor = ThreadPoolExecutor(jobs, thread_name_prefix="calc-shard")
+
+    def start(self):
+        for shard in self.shards:
+            shard.process.start()
+
+    def close(self):
+        for shard in self.shards:
+            shard.process.close()
+        self.executor.shutdown(wait=False)
+
+    def submit(self, expression):
+        """Queue an expression; returns a future of (ok, result or error)"""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        shard = self.shards[hash(normalize(expression)) % len(self.shards)]
+        shard.pending.append((expression, future))
+        if not shard.running:
+            shard.running = True
+            loop.create_task(self._drain(shard))
+        return future
+
+    async def _drain(self, shard):
+        """Send the shard's queued expressions to its worker, a batch at a time"""
+        loop = asyncio.get_running_loop()
+        try:
+            while shard.pending:
+                # Let requests that have already arrived join this batch
+                await asyncio.sleep(0)
+                batch = shard.pending[:self.batch_size]
+                del shard.pending[:self.batch_size]
+                expressions = [expression for expression, _ in batch]
+                try:
+                    replies = await loop.run_in_executor(self.executor, shard.run, expressions)
+                except Exception:
+                    replies = [(False, INVALID_EXPRESSION)] * len(batch)
+                for (_, future), reply in zip(batch, replies):
+                    if not future.done():
+                        future.set_result(reply)
+        finally:
+            shard.running = False
+
+
+# --------------------------------------------------------------------------
+# Server
+# --------------------------------------------------------------------------
+
+class EvaluationServer:
+    """JSON-lines protocol handler"""
+
+    def __init__(self, batcher):
+        self.batcher = batcher
+
+    def dispatch(self, line):
+        """Parse one request line; returns (id, future or ready reply)"""
+        try:
+            request = json.loads(line)
+        except ValueError:
+            return None, (False, BAD_REQUEST)
+        if not isinstance(request, dict):
+            return None, (False, BAD_REQUEST)
+        request_id = request.get("id")
+        expression = request.get("expr")
+        if not isinstance(expression, str):
+            return request_id, (False, BAD_REQUEST)
+        return request_id, self.batcher.submit(expression)
+
+    async def handle(self, reader, writer):
+        """Serve one connection: read requests, answer them in order"""
+        responses = asyncio.Queue()
+        slots = asyncio.Semaphore(MAX_IN_FLIGHT)
+        sender = asyncio.create_task(self._send(responses, writer, slots))
+        try:
+            while True:
+                try:
+                    line = await reader.readline()
+                except (ValueError, ConnectionError):
+                    # Line over LINE_LIMIT, or the client went away
+                    break
+                if not line:
+                    break
+                if not line.strip():
+                    continue
+                await slots.acquire()
+                responses.put_nowait(self.dispatch(line))
+        finally:
+            responses.put_nowait(None)
+            await sender
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
+
+    async def _send(self, responses, writer, slots):
+        connected = True
+        unflushed = 0
+        while True:
+            item = await responses.get()
+            if item is None:
+                break
+            request_id, reply = item
+            ok, value = await reply if isinstance(reply, asyncio.Future) else reply
+            slots.release()
+            if not connected:
+                continue
+            response = {"id": request_id, "ok": ok, ("result" if ok else "error"): value}
+            try:
+                writer.write((json.dumps(response) + "\n").encode())
+                unflushed += 1
+                # Flush when caught up, so pipelined responses go out together
+                if responses.empty() or unflushed >= BATCH_SIZE:
+                    await writer.drain()
+                    unflushed = 0
+            except ConnectionError:
+                connected = False
+
+
+async def serve(args):
+    batcher = Batcher(args.jobs, args.timeout)
+    batcher.start()
+    handler = EvaluationServer(batcher).handle
+    if args.unix:
+        server = await asyncio.start_unix_server(handler, path=args.unix, limit=LINE_LIMIT)
+        address = args.unix
+    else:
+        server = await asyncio.start_server(handler, args.host, args.port, limit=LINE_LIMIT)
+        address = f"{args.host}:{args.port}"
+    print(f"Listening on {address} with {len(batcher.shards)} workers", flush=True)
+    # SIGTERM (load --spawn, service managers) stops serving, so the workers
+    # are closed below instead of outliving the server
+    stopped = asyncio.Event()
+    try:
+        asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, stopped.set)
+    except (NotImplementedError, AttributeError):
+        pass  # Windows: no signal handlers in asyncio
+    try:
+        async with server:
+            await stopped.wait()
+    finally:
+        batcher.close()
+        if args.unix and os.path.exists(args.unix):
+            os.unlink(args.unix)
+
+
+# --------------------------------------------------------------------------
+# Load generator
+# --------------------------------------------------------------------------
+
+async def run_client(args, client, count, latencies):
+    """One connection sending count requests, at most args.pipeline unanswered"""
+    if args.unix:
+        reader, writer = await asyncio.open_unix_connection(args.unix, limit=LINE_LIMIT)
+    else:
+        reader, writer = await asyncio.open_connection(args.host, args.port, limit=LINE_LIMIT)
+    sent = collections.deque()
+    window = asyncio.Semaphore(args.pipeline)
+
+    async def send():
+        for i in range(count):
+            await window.acquire()
+            expression = LOAD_MIX[i % len(LOAD_MIX)]
+            if args.distinct:
+                # Defeat the caches: every expression is new
+                expression = f"{expression} + {client * count + i}"
+            sent.append(time.perf_counter())
+            writer.write((json.dumps({"id": i, "expr": expression}) + "\n").encode())
+            if window.locked():
+                await writer.drain()
+        await writer.drain()
+
+    sender = asyncio.create_task(send())
+    errors = 0
+    for _ in range(count):
+        line = await reader.readline()
+        latencies.append(time.perf_counter() - sent.popleft())
+        window.release()
+        if not json.loads(line)["ok"]:
+            errors += 1
+    await sender
+    writer.close()
+    await writer.wait_closed()
+    return errors
+
+
+async def load(args):
+    per_client = max(1, args.requests // args.connections)
+    latencies = []
+    start = time.perf_counter()
+    errors = await asyncio.gather(*(run_client(args, client, per_client, latencies)
+                                    for client in range(args.connections)))
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+
+    def percentile(fraction):
+        return latencies[min(len(latencies) - 1, int(fraction * len(latencies)))] * 1000
+
+    return {
+        "requests": len(latencies),
+        "connections": args.connections,
+        "pipeline": args.pipeline,
+        "seconds": elapsed,
+        "requests_per_sec": len(latencies) / elapsed,
+        "error_replies": sum(errors),
+        "latency_mean_ms": statistics.fmean(latencies) * 1000,
+        "latency_p50_ms": percentile(0.50),
+        "latency_p95_ms": percentile(0.95),
+        "latency_p99_ms": percentile(0.99),
+        "latency_max_ms": latencies[-1] * 1000,
+    }
+
+
+def spawn_server(args):
+    """Start a server subprocess and wait until it listens"""
+    command = [sys.executable, os.path.abspath(__file__), "serve"]
+    if args.unix:
+        command += ["--unix", args.unix]
+    else:
+        command += ["--host", args.host, "--port", str(args.port)]
+    if args.jobs:
+        command += ["--jobs", str(args.jobs)]
+    process = subprocess.Popen(command, stdout=subprocess.PIPE, text=True)
+    line = process.stdout.readline()
+    if not line.startswith("Listening"):
+        process.kill()
+        raise RuntimeError("server failed to start")
+    return process
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Local calculator evaluation server")
+    commands = parser.add_subparsers(dest="command", required=True)
+    serve_parser = commands.add_parser("serve", help="run the server")
+    load_parser = commands.add_parser("load", help="measure a running server")
+    for sub in (serve_parser, load_parser):
+        sub.add_argument("--host", default=HOST)
+        sub.add_argument("--port", type=int, default=PORT)
+        sub.add_argument("--unix", help="Unix socket path (instead of TCP)")
+        sub.add_argument("-j", "--jobs", type=int, default=None,
+                         help="worker processes (default: CPU count)")
+    serve_parser.add_argument("--timeout", type=float, default=DEFAULT_TIMEOUT,
+                              help="seconds before a batch is killed (0 = never)")
+    load_parser.add_argument("--connections", type=int, default=8)
+    load_parser.add_argument("--requests", type=int, default=100000)
+    load_parser.add_argument("--pipeline", type=int, default=64,
+                             help="unanswered requests per connection")
+    load_parser.add_argument("--distinct", action="store_true",
+                             help="make every expression unique (no cache hits)")
+    load_parser.add_argument("--spawn", action="store_true",
+                             help="start a server for the run")
+    load_parser.add_argument("--output", help="write results as JSON to this file")
+    args = parser.parse_args(argv)
+
+    if args.command == "serve":
+        try:
+            asyncio.run(serve(args))
+        except KeyboardInterrupt:
+            pass
+        return 0
+
+    server = spawn_server(args) if args.spawn else None
+    try:
+        results = asyncio.run(load(args))
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+    for key, value in results.items():
+        print(f"{key:<20} {value:>12,.2f}" if isinstance(value, float) else f"{key:<20} {value:>12,}")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
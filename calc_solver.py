@@ -0,0 +1,387 @@
+"""Roots, derivatives and definite integrals of a function of x.
+
+The solvers take a plain Python function, normally the compiled form of an
+expression (calc_engine.compile_function), which costs about as much per
+call as the same arithmetic written in Python:
+
+- find_root(f, a, b): scans [a, b] for a sign change and narrows it with
+  Brent's method (inverse quadratic interpolation, secant and bisection
+  steps). Without a sign change (a double root like x**2) Newton's method
+  starts from the scanned point nearest to zero. find_root(f, x0) runs
+  Newton from the guess and, if that fails, widens a bracket around it.
+- derivative(f, x): central differences extrapolated to step zero
+  (Ridders), with an error estimate.
+- integrate(f, a, b): globally adaptive 15-point Gauss-Kronrod quadrature;
+  the interval with the largest error estimate is halved until the total
+  error is within tolerance. Infinite bounds are mapped to finite ones.
+
+Each returns a dict with the value, an error estimate, the method, the
+number of evaluations of f and the time taken. Points where f raises or is
+not finite count as NaN. Failures raise ValueError. This module does not
+import Qt.
+"""
+import heapq
+import math
+import time
+
+MAX_EVALUATIONS = 200000
+SCAN_POINTS = 256          # grid of the sign-change scan in find_root
+NEWTON_STEPS = 60
+BRENT_STEPS = 200
+RELATIVE_TOLERANCE = 1e-12
+MAX_INTERVALS = 5000       # subintervals of one integral
+
+_EPSILON = 2.220446049250313e-16
+NAN = float("nan")
+
+# 15-point Kronrod nodes (x >= 0) and weights, with the weights of the
+# embedded 7-point Gauss rule at the odd nodes (QUADPACK's qk15)
+_KRONROD_NODES = (
+    0.991455371120812639206854697526329,
+    0.949107912342758524526189684047851,
+    0.864864423359769072789712788640926,
+    0.741531185599394439863864773280788,
+    0.586087235467691130294144845693013,
+    0.405845151377397166906606412076961,
+    0.207784955007898467600689403773245,
+    0.000000000000000000000000000000000,
+)
+_KRONROD_WEIGHTS = (
+    0.022935322010529224963732008058970,
+    0.063092092629978553290700663189204,
+    0.104790010322250183839876322541518,
+    0.140653259715525918745189590510238,
+    0.169004726639267902826583426598550,
+    0.190350578064785409913256402421014,
+    0.204432940075298892414161999234649,
+    0.209482141084727828012999174891714,
+)
+_GAUSS_WEIGHTS = (
+    0.129484966168869693270611432679082,
+    0.279705391489276667901467771423780,
+    0.381830050505118944950369775488975,
+    0.417959183673469387755102040816327,
+)
+
+
+class _Counted:
+    """f as a float-valued function that counts its calls"""
+    __slots__ = ("fn", "count")
+
+    def __init__(self, fn):
+        self.fn = fn
+        self.count = 0
+
+    def __call__(self, x):
+        self.count += 1
+        if self.count > MAX_EVALUATIONS:
+            raise ValueError(f"No result after {MAX_EVALUATIONS:,} evaluations")
+        try:
+            y = float(self.fn(x))
+        except Exception:
+            return NAN
+        return y if math.isfinite(y) else NAN
+
+
+def _result(f, start, value, error, method):
+    return {
+        "value": value,
+        "error": error,
+        "method": method,
+        "evaluations": f.count,
+        "seconds": time.perf_counter() - start,
+    }
+
+
+# --------------------------------------------------------------------------
+# Roots
+# --------------------------------------------------------------------------
+
+def _tolerance(x):
+    return RELATIVE_TOLERANCE * max(1.0, abs(x))
+
+
+def brent(f, a, b, fa, fb):
+    """A root of f in [a, b], where fa and fb differ in sign (Brent's method)"""
+    if fa == 0:
+        return a
+    if fb == 0:
+        return b
+    c, fc = a, fa
+    d = e = b - a
+    for _ in range(BRENT_STEPS):
+        if (fb > 0) == (fc > 0):
+            c, fc = a, fa
+            d = e = b - a
+        if abs(fc) < abs(fb):
+            a, b, c = b, c, b
+            fa, fb, fc = fb, fc, fb
+        tolerance = 2 * _EPSILON * abs(b) + 0.5 * _tolerance(b)
+        middle = 0.5 * (c - b)
+        if abs(middle) <= tolerance or fb == 0:
+            return b
+        if abs(e) >= tolerance and abs(fa) > abs(fb):
+            s = fb / fa
+            if a == c:
+                # Secant step
+                p = 2 * middle * s
+                q = 1 - s
+            else:
+                # Inverse quadratic interpolation
+                q = fa / fc
+                r = fb / fc
+                p = s * (2 * middle * q * (q - r) - (b - a) * (r - 1))
+                q = (q - 1) * (r - 1) * (s - 1)
+            if p > 0:
+                q = -q
+            p = abs(p)
+            if 2 * p < min(3 * middle * q - abs(tolerance * q), abs(e * q)):
+                e, d = d, p / q
+            else:
+                # Interpolation would leave the bracket: bisect
+                d = e = middle
+        else:
+            d = e = middle
+        a, fa = b, fb
+        b += d if abs(d) > tolerance else math.copysign(tolerance, middle)
+        fb = f(b)
+        if fb != fb:
+            raise ValueError(f"f(x) is undefined at x = {b:g}, inside the bracket")
+    return b
+
+
+def newton(f, x):
+    """A root of f near x by Newton's method with numerical slopes, or None"""
+    fx = f(x)
+    for _ in range(NEWTON_STEPS):
+        if fx == 0:
+            return x
+        if fx != fx:
+            return None
+        h = _EPSILON ** (1 / 3) * max(1.0, abs(x))
+        slope = (f(x + h) - f(x - h)) / (2 * h)
+        if not slope or slope != slope:
+            return None
+        step = fx / slope
+        x -= step
+        fx = f(x)
+        if abs(step) <= _tolerance(x):
+            return x if fx == fx else None
+    return None
+
+
+def scan(f, a, b, points=SCAN_POINTS):
+    """First sign change of f on a grid over [a, b]
+
+    Returns (x0, x1, f0, f1), or (x, None, fx, None) for the grid point
+    where |f| is smallest if f does not change sign.
+    """
+    step = (b - a) / points
+    x0, f0 = a, f(a)
+    best = (abs(f0) if f0 == f0 else math.inf, a, f0)
+    for i in range(1, points + 1):
+        x1 = b if i == points else a + i * step
+        f1 = f(x1)
+        if f1 == f1:
+            if f0 == f0 and (f0 <= 0 <= f1 or f1 <= 0 <= f0):
+                return x0, x1, f0, f1
+            if abs(f1) < best[0]:
+                best = (abs(f1), x1, f1)
+        x0, f0 = x1, f1
+    return best[1], None, best[2], None
+
+
+def find_root(fn, a, b=None):
+    """A root of fn in [a, b], or near the guess a when b is None"""
+    start = time.perf_counter()
+    f = _Counted(fn)
+    if b is None:
+        root = newton(f, a)
+        method = "Newton"
+        if root is None:
+            root = _widen(f, a)
+            method = "bracket + Brent"
+    else:
+        if a > b:
+            a, b = b, a
+        fa, fb = f(a), f(b)
+        if fa == fa and fb == fb and (fa <= 0 <= fb or fb <= 0 <= fa):
+            x0, x1, f0, f1 = a, b, fa, fb
+        else:
+            x0, x1, f0, f1 = scan(f, a, b)
+        if x1 is not None:
+            root = _bracketed_root(f, x0, x1, f0, f1)
+            method = "Brent"
+        else:
+            # No sign change: a double root, or none at all
+            root = newton(f, x0)
+            method = "Newton"
+            if root is None or not a <= root <= b:
+                raise ValueError(f"No sign change of f(x) in [{a:g}, {b:g}]")
+    return _result(f, start, root, _tolerance(root), method)
+
+
+def _bracketed_root(f, x0, x1, f0, f1):
+    """brent(), rejecting a sign change at a pole (tan(x) near pi/2)"""
+    root = brent(f, x0, x1, f0, f1)
+    residual = f(root)
+    if residual != residual or abs(residual) > 1e-6 * max(abs(f0), abs(f1)):
+        raise ValueError(f"f(x) changes sign at x = {root:g} but has no root there")
+    return root
+
+
+def _widen(f, x):
+    """Root by growing a bracket around x until f changes sign"""
+    width = 0.5 * max(1.0, abs(x))
+    while width < 1e9 * max(1.0, abs(x)):
+        x0, x1, f0, f1 = scan(f, x - width, x + width, 16)
+        if x1 is not None:
+            return _bracketed_root(f, x0, x1, f0, f1)
+        width *= 4
+    raise ValueError(f"No sign change of f(x) found around x = {x:g}")
+
+
+# --------------------------------------------------------------------------
+# Derivatives
+# --------------------------------------------------------------------------
+
+def derivative(fn, x, h=None):
+    """f'(x) by Ridders' extrapolation of central differences"""
+    start = time.perf_counter()
+    f = _Counted(fn)
+    # A step on the scale of x, so x - h stays inside domains like sqrt's
+    h = h or 0.1 * max(abs(x), 0.01)
+    shrink = 1.4
+    first = (f(x + h) - f(x - h)) / (2 * h)
+    while first != first and h > 1e-12 * max(1.0, abs(x)):
+        # Stepped out of the domain (log near 0): start closer
+        h /= 8
+        first = (f(x + h) - f(x - h)) / (2 * h)
+    table = [[first]]
+    best, error = table[0][0], math.inf
+    for i in range(1, 16):
+        h /= shrink
+        row = [(f(x + h) - f(x - h)) / (2 * h)]
+        factor = shrink * shrink
+        for j in range(1, i + 1):
+            row.append((row[j - 1] * factor - table[i - 1][j - 1]) / (factor - 1))
+            factor *= shrink * shrink
+            estimate = max(abs(row[j] - row[j - 1]), abs(row[j] - table[i - 1][j - 1]))
+            if estimate <= error:
+                best, error = row[j], estimate
+        table.append(row)
+        if abs(row[i] - table[i - 1][i - 1]) >= 2 * error:
+            # Higher orders only add rounding noise from here
+            break
+    if best != best:
+        raise ValueError(f"f(x) is not differentiable at x = {x:g}")
+    return _result(f, start, best, error, "Ridders")
+
+
+# --------------------------------------------------------------------------
+# Integrals
+# --------------------------------------------------------------------------
+
+def gauss_kronrod(f, a, b):
+    """(15-point Kronrod estimate, |Kronrod - 7-point Gauss|) of f over [a, b]"""
+    center = 0.5 * (a + b)
+    half = 0.5 * (b - a)
+    fc = f(center)
+    kronrod = fc * _KRONROD_WEIGHTS[7]
+    gauss = fc * _GAUSS_WEIGHTS[3]
+    for i in range(7):
+        dx = half * _KRONROD_NODES[i]
+        pair = f(center - dx) + f(center + dx)
+        kronrod += _KRONROD_WEIGHTS[i] * pair
+        if i % 2:
+            gauss += _GAUSS_WEIGHTS[i // 2] * pair
+    return kronrod * half, abs((kronrod - gauss) * half)
+
+
+def _finite_integrand(f, a, b):
+    """(g, a', b') with the integral of g over [a', b'] that of f over [a, b]"""
+    if math.isinf(a) and math.isinf(b):
+        # x = t / (1 - t**2) on (-1, 1)
+        def g(t):
+            d = 1 - t * t
+            return f(t / d) * (1 + t * t) / (d * d)
+        return g, -1.0, 1.0
+    if math.isinf(b):
+        # x = a + t / (1 - t) on [0, 1)
+        return (lambda t: f(a + t / (1 - t)) / ((1 - t) * (1 - t))), 0.0, 1.0
+    if math.isinf(a):
+        return (lambda t: f(b - t / (1 - t)) / ((1 - t) * (1 - t))), 0.0, 1.0
+    return f, a, b
+
+
+def integrate(fn, a, b, tolerance=1e-10):
+    """Definite integral of fn over [a, b] by adaptive Gauss-Kronrod quadrature
+
+    tolerance is relative to the integral (absolute when it is about 0).
+    Either bound may be infinite.
+    """
+    start = time.perf_counter()
+    f = _Counted(fn)
+    if a == b:
+        return _result(f, start, 0.0, 0.0, "Gauss-Kronrod")
+    sign = 1
+    if a > b:
+        a, b, sign = b, a, -1
+    g, lo, hi = _finite_integrand(f, a, b)
+    value, error = gauss_kronrod(g, lo, hi)
+    heap = [(-error, lo, hi, value)]
+    while True:
+        if value != value:
+            raise ValueError("f(x) is undefined or infinite in the interval")
+        if error <= max(tolerance * abs(value), 1e-14) or len(heap) >= MAX_INTERVALS:
+            break
+        worst_error, x0, x1, worst = heapq.heappop(heap)
+        middle = 0.5 * (x0 + x1)
+        if not x0 < middle < x1:
+            # Cannot be split further in floating point
+            heapq.heappush(heap, (worst_error, x0, x1, worst))
+            break
+        left, left_error = gauss_kronrod(g, x0, middle)
+        right, right_error = gauss_kronrod(g, middle, x1)
+        value += left + right - worst
+        error += left_error + right_error + worst_error
+        heapq.heappush(heap, (-left_error, x0, middle, left))
+        heapq.heappush(heap, (-right_error, middle, x1, right))
+    # Sum the pieces afresh: the running total accumulates rounding
+    value = math.fsum(piece for _, _, _, piece in heap)
+    error = math.fsum(-piece_error for piece_error, _, _, _ in heap)
+    if error > 1e-6 * max(1.0, abs(value)):
+        method = f"Gauss-Kronrod, {len(heap):,} intervals (not converged)"
+    else:
+        method = f"Gauss-Kronrod, {len(heap):,} intervals"
+    return _result(f, start, sign * value, error, method)
+
+
+SOLVERS = {
+    "root": find_root,
+    "derivative": derivative,
+    "integral": integrate,
+}
+
+# Solver kind -> (label, bounds hint, allowed numbers of bounds)
+MODES = {
+    "root": ("Root  f(x) = 0", "a, b  or  a guess, e.g. 0, 3", (1, 2)),
+    "derivative": ("Derivative  f'(x)", "x, e.g. 1.5", (1,)),
+    "integral": ("Integral  ∫ f(x) dx", "a, b  (inf allowed), e.g. 0, inf", (2,)),
+}
+
+
+def parse_bounds(text, evaluate):
+    """Numbers separated by commas; inf and -inf (or ∞) are allowed
+
+    evaluate turns each part into a number, e.g. calc_engine.evaluate, so
+    bounds can be expressions like sqrt(2).
+    """
+    bounds = []
+    for part in text.split(","):
+        part = part.strip().replace("∞", "inf")
+        if part.lstrip("+-") == "inf":
+            bounds.append(-math.inf if part.startswith("-") else math.inf)
+        elif part:
+            bounds.append(float(evaluate(part)))
+    return bounds
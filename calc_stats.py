@@ -0,0 +1,254 @@
+"""Streaming statistics of a numeric column in a CSV or plain text file.
+
+file_stats() memory-maps the file and parses it in chunks of about
+CHUNK_BYTES, each ending at a line end, so a file of any size is read in one
+pass while memory stays bounded by one chunk and the quantile sketch.
+
+The moments are numerically stable. A chunk's sum is exact (math.fsum) and
+its squared deviations are taken about the chunk's own mean; chunks are
+merged with the parallel form of Welford's update (Chan et al.), and the
+running total is Neumaier-compensated. Values with a large common offset
+(timestamps, 1e9 + noise) keep their variance.
+
+Quantiles come from a KLL-style sketch of about 1,500 items, with ranks
+off by well under 1% of the count (see QuantileSketch).
+
+Lines whose column is missing or not a number (headers, comments) are
+counted as skipped, as are NaN and infinities; blank lines are ignored.
+This module does not import Qt.
+"""
+import bisect
+import itertools
+import math
+import mmap
+import os
+import random
+
+CHUNK_BYTES = 1024 * 1024     # small enough that no single step holds the GIL for long
+SKETCH_SIZE = 512
+QUANTILES = (("p5", 0.05), ("p25", 0.25), ("median", 0.5), ("p75", 0.75), ("p95", 0.95))
+DELIMITERS = {".csv": ",", ".tsv": "\t"}   # other files split on whitespace
+NAN = float("nan")
+
+
+class RunningStats:
+    """Count, sum, mean, variance, min and max, updated a batch at a time"""
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0              # sum of squared deviations from the mean
+        self.total = 0.0
+        self.compensation = 0.0    # low-order bits lost from total
+        self.minimum = math.inf
+        self.maximum = -math.inf
+
+    def update_many(self, values):
+        """Merge a batch of floats"""
+        n = len(values)
+        if not n:
+            return
+        batch_sum = math.fsum(values)
+        batch_mean = batch_sum / n
+        batch_m2 = math.fsum([(v - batch_mean) ** 2 for v in values])
+        self._add_to_total(batch_sum)
+        count = self.count + n
+        delta = batch_mean - self.mean
+        self.mean += delta * n / count
+        self.m2 += batch_m2 + delta * delta * self.count * n / count
+        self.count = count
+        self.minimum = min(self.minimum, min(values))
+        self.maximum = max(self.maximum, max(values))
+
+    def _add_to_total(self, value):
+        # Neumaier's variant of Kahan summation
+        total = self.total + value
+        if abs(self.total) >= abs(value):
+            self.compensation += (self.total - total) + value
+        else:
+            self.compensation += (value - total) + self.total
+        self.total = total
+
+    @property
+    def sum(self):
+        return self.total + self.compensation
+
+    @property
+    def variance(self):
+        """Sample variance (n - 1 denominator), NaN below two values"""
+        if self.count < 2:
+            return NAN
+        return self.m2 / (self.count - 1)
+
+
+class QuantileSketch:
+    """Approximate quantiles of a stream in bounded memory
+
+    KLL compactors: an item on level h stands for 2**h values. A level
+    over its capacity is sorted and halved, every other item (from a
+    random offset) moving up a level. Capacities shrink by 2/3 per level
+    below the top, so the sketch holds about 3 * size items in all.
+    """
+
+    def __init__(self, size=SKETCH_SIZE, seed=0):
+        self.size = size
+        self.levels = [[]]
+        self.count = 0
+        self.random = random.Random(seed)
+
+    def capacity(self, level):
+        depth = len(self.levels) - 1 - level
+        return max(2, int(self.size * (2 / 3) ** depth))
+
+    def update_many(self, values):
+        """Add a batch of floats"""
+        self.count += len(values)
+        # A big batch skips the levels it would only pass through: sorted
+        # once, every 2**h-th value from a random offset goes to level h
+        level = 0
+        while len(values) >> (level + 1) > self.size:
+            level += 1
+        if level:
+            step = 1 << level
+            values = sorted(values)[self.random.randrange(step)::step]
+        while len(self.levels) <= level:
+            self.levels.append([])
+        self.levels[level].extend(values)
+        self._compact()
+
+    def _compact(self):
+        level = 0
+        while level < len(self.levels):
+            items = self.levels[level]
+            if len(items) > self.capacity(level):
+                if level + 1 == len(self.levels):
+                    self.levels.append([])
+                items.sort()
+                # An odd item out stays, so no weight is lost in halving
+                kept = [items.pop()] if len(items) % 2 else []
+                self.levels[level + 1].extend(items[self.random.randrange(2)::2])
+                self.levels[level] = kept
+            level += 1
+
+    def quantiles(self, qs):
+        """Approximate value at each fraction in qs, NaN if empty"""
+        weighted = sorted((v, 1 << h) for h, items in enumerate(self.levels) for v in items)
+        if not weighted:
+            return [NAN] * len(qs)
+        ranks = list(itertools.accumulate(w for _, w in weighted))
+        last = len(weighted) - 1
+        return [weighted[min(last, bisect.bisect_left(ranks, q * ranks[-1]))][0] for q in qs]
+
+
+def parse_column(chunk, column=0, delimiter=None):
+    """Finite floats in one column of the lines of a bytes chunk
+
+    Returns (values, skipped). delimiter is bytes, or None for whitespace.
+    """
+    values = []
+    append = values.append
+    skipped = 0
+    for line in chunk.splitlines():
+        try:
+            value = float(line.split(delimiter)[column])
+        except (IndexError, ValueError):
+            value = _quoted_field(line, column, delimiter)
+            if value is None:
+                if line.strip():
+                    skipped += 1
+                continue
+        # False for NaN and infinities
+        if value - value == 0.0:
+            append(value)
+        else:
+            skipped += 1
+    return values, skipped
+
+
+def _quoted_field(line, column, delimiter):
+    try:
+        return float(line.split(delimiter)[column].strip(b" \t\"'"))
+    except (IndexError, ValueError):
+        return None
+
+
+def column_index(header, column, delimiter=None):
+    """Index of the column named column in a header line (bytes)"""
+    names = [field.strip(b" \t\r\"'").decode("utf-8", "replace")
+             for field in header.split(delimiter)]
+    for index, name in enumerate(names):
+        if name == column:
+            return index
+    lowered = column.lower()
+    for index, name in enumerate(names):
+        if name.lower() == lowered:
+            return index
+    raise ValueError(f"No column named '{column}'")
+
+
+def chunks(data, size=CHUNK_BYTES):
+    """Yield (end, chunk): slices of data of about size bytes, cut after newlines"""
+    start = 0
+    length = len(data)
+    while start < length:
+        end = min(start + size, length)
+        if end < length:
+            cut = data.rfind(b"\n", start, end)
+            if cut < 0:
+                # A line longer than the chunk size
+                cut = data.find(b"\n", end)
+            end = length if cut < 0 else cut + 1
+        yield end, data[start:end]
+        start = end
+
+
+def file_stats(path, column=0, delimiter=None, cancel=None, progress=None,
+               chunk_bytes=CHUNK_BYTES):
+    """Statistics of one numeric column of a file, in a single streaming pass
+
+    column is a 0-based index or a header name. delimiter defaults to a
+    comma for .csv files, a tab for .tsv and whitespace otherwise.
+    progress(fraction) is called after each chunk. Returns a dict of
+    count, skipped, sum, mean, variance, stddev, min, max and the
+    QUANTILES, or None if cancel (a threading.Event) was set.
+    """
+    if delimiter is None:
+        delimiter = DELIMITERS.get(os.path.splitext(path)[1].lower())
+    separator = delimiter.encode() if delimiter else None
+    label = f"'{column}'" if isinstance(column, str) else column + 1
+    stats = RunningStats()
+    sketch = QuantileSketch()
+    skipped = 0
+    with open(path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        if size:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                if isinstance(column, str):
+                    newline = data.find(b"\n")
+                    column = column_index(data[:newline if newline >= 0 else size],
+                                          column, separator)
+                for end, chunk in chunks(data, chunk_bytes):
+                    if cancel is not None and cancel.is_set():
+                        return None
+                    values, bad = parse_column(chunk, column, separator)
+                    skipped += bad
+                    stats.update_many(values)
+                    sketch.update_many(values)
+                    if progress is not None:
+                        progress(end / size)
+    if not stats.count:
+        raise ValueError(f"No numbers in column {label}")
+    result = {
+        "count": stats.count,
+        "skipped": skipped,
+        "sum": stats.sum,
+        "mean": stats.sum / stats.count,
+        "variance": stats.variance,
+        "stddev": math.sqrt(stats.variance),
+        "min": stats.minimum,
+        "max": stats.maximum,
+    }
+    qs = sketch.quantiles([q for _, q in QUANTILES])
+    for (name, _), value in zip(QUANTILES, qs):
+        result[name] = value
+    return result
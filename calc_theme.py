@@ -0,0 +1,146 @@
+"""Light and dark themes as one application style sheet.
+
+Both themes and the three button styles are written out once, at import,
+into a single style sheet that the application installs before any widget
+exists, so Qt parses it exactly once. Buttons are matched by their "kind"
+property (CalcButton[kind="operator"]) instead of carrying a sheet each,
+and the window rules are scoped by the main window's "theme" property
+(QMainWindow[theme="dark"] QLineEdit). Switching themes sets that property
+and re-polishes the widgets the theme rules can match; nothing is parsed
+again and the buttons, whose colours do not depend on the theme, are left
+alone.
+
+This module does not import Qt.
+"""
+
+DARK = "dark"
+LIGHT = "light"
+
+# Colours of the window widgets in each theme
+THEMES = {
+    DARK: {
+        "window": "#1a1a1a",
+        "base": "#2a2a2a",
+        "text": "#ffffff",
+        "border": "#3a3a3a",
+        "hover": "#3a3a3a",
+    },
+    LIGHT: {
+        "window": "#f5f5f5",
+        "base": "#ffffff",
+        "text": "#1a1a1a",
+        "border": "#e0e0e0",
+        "hover": "#f0f0f0",
+    },
+}
+
+ACCENT = "#FF6B35"
+
+# Button kind -> (background, hover, pressed); the same in both themes
+BUTTONS = {
+    "operator": ("#FF6B35", "#FF5520", "#E55A2B"),
+    "function": ("#9E9E9E", "#B0B0B0", "#8C8C8C"),
+    "number": ("#424242", "#545454", "#303030"),
+}
+
+# Icon of the theme toggle button
+ICONS = {DARK: "🌙", LIGHT: "☀️"}
+
+_BUTTON_RULES = """
+CalcButton[kind="{kind}"] {{
+    background-color: {background};
+    border: none;
+    border-radius: 8px;
+    color: white;
+    font-weight: bold;
+    font-size: 16px;
+}}
+CalcButton[kind="{kind}"]:hover {{
+    background-color: {hover};
+}}
+CalcButton[kind="{kind}"]:pressed {{
+    background-color: {pressed};
+}}
+"""
+
+_WINDOW_RULES = """
+{w} {{
+    background-color: {window};
+}}
+{w} QLineEdit {{
+    background-color: {base};
+    color: {text};
+    border: 2px solid {border};
+    border-radius: 8px;
+    padding: 10px;
+    font-size: 32px;
+    font-weight: bold;
+}}
+{w} QLabel {{
+    color: {text};
+}}
+{w} QListView {{
+    background-color: {base};
+    color: {text};
+    border: 2px solid {border};
+    border-radius: 8px;
+    padding: 8px;
+}}
+{w} QListView::item {{
+    padding: 5px;
+    border-radius: 4px;
+}}
+{w} QListView::item:hover {{
+    background-color: {hover};
+}}
+{w} QListView::item:selected {{
+    background-color: {accent};
+    color: #ffffff;
+}}
+{w} QPlainTextEdit, {w} QComboBox {{
+    background-color: {base};
+    color: {text};
+    border: 2px solid {border};
+    border-radius: 6px;
+    padding: 2px 4px;
+}}
+{w} QCheckBox {{
+    color: {text};
+}}
+{w} QTabWidget::pane {{
+    border: none;
+}}
+{w} QTabBar::tab {{
+    background-color: {base};
+    color: {text};
+    border: 2px solid {border};
+    border-radius: 6px;
+    padding: 6px 14px;
+    margin-right: 4px;
+}}
+{w} QTabBar::tab:selected {{
+    background-color: {accent};
+    color: #ffffff;
+}}
+"""
+
+
+def button_rules():
+    """Style sheet rules of the button kinds"""
+    return "".join(
+        _BUTTON_RULES.format(kind=kind, background=background, hover=hover, pressed=pressed)
+        for kind, (background, hover, pressed) in BUTTONS.items())
+
+
+def window_rules(theme):
+    """Style sheet rules of one theme, scoped to a main window showing it"""
+    return _WINDOW_RULES.format(w=f'QMainWindow[theme="{theme}"]', accent=ACCENT,
+                                **THEMES[theme])
+
+
+def build_stylesheet():
+    """The application style sheet: the buttons and every theme"""
+    return button_rules() + "".join(window_rules(theme) for theme in THEMES)
+
+
+STYLESHEET = build_stylesheet()
@@ -0,0 +1,125 @@
+"""Bounded undo/redo of expression edits.
+
+Each step stores only what changed between two successive expressions: the
+position of the change and the removed and inserted text (the common prefix
+and suffix are left out). Typing a character or pressing an operator costs
+a few dozen bytes, however long the expression. Steps are evicted oldest
+first once the total size passes a byte budget; sizes are approximated with
+sys.getsizeof, like the result memo.
+
+Steps chain: each applies to the state the previous one left. So only the
+oldest end is ever dropped, and a single step larger than the whole budget
+clears the history instead of leaving a hole in it.
+"""
+import sys
+from collections import deque
+
+UNDO_BYTES = 1024 * 1024
+_STEP_OVERHEAD = 72   # the step object itself
+
+
+class UndoStep:
+    """One change: text[pos:pos + len(removed)] was replaced by inserted"""
+    __slots__ = ("pos", "removed", "inserted", "mergeable", "size")
+
+    def __init__(self, pos, removed, inserted, mergeable=False):
+        self.pos = pos
+        self.removed = removed
+        self.inserted = inserted
+        self.mergeable = mergeable
+        self.size = sys.getsizeof(removed) + sys.getsizeof(inserted) + _STEP_OVERHEAD
+
+    def undo(self, text):
+        return text[:self.pos] + self.removed + text[self.pos + len(self.inserted):]
+
+    def redo(self, text):
+        return text[:self.pos] + self.inserted + text[self.pos + len(self.removed):]
+
+
+def diff(before, after):
+    """(pos, removed, inserted) turning before into after"""
+    if after.startswith(before):
+        return len(before), "", after[len(before):]
+    if before.startswith(after):
+        return len(after), before[len(after):], ""
+    limit = min(len(before), len(after))
+    start = 0
+    while start < limit and before[start] == after[start]:
+        start += 1
+    end = 0
+    limit -= start
+    while end < limit and before[-1 - end] == after[-1 - end]:
+        end += 1
+    return start, before[start:len(before) - end], after[start:len(after) - end]
+
+
+class UndoHistory:
+    """Undo and redo stacks of deltas within a byte budget"""
+
+    def __init__(self, max_bytes=UNDO_BYTES):
+        self.max_bytes = max_bytes
+        self.undo_steps = deque()
+        self.redo_steps = []
+        self.bytes = 0
+        self.evictions = 0
+
+    def record(self, before, after, merge=False):
+        """Record a change from before to after
+
+        With merge, the change is folded into the previous step if that was
+        also a merge insertion ending where this one starts (typing a number
+        is undone as a whole).
+        """
+        if before == after:
+            return
+        self._drop_redo()
+        pos, removed, inserted = diff(before, after)
+        last = self.undo_steps[-1] if self.undo_steps else None
+        if (merge and last is not None and last.mergeable and not removed and not last.removed
+                and last.pos + len(last.inserted) == pos):
+            self.bytes -= last.size
+            self.undo_steps.pop()
+            inserted = last.inserted + inserted
+            pos = last.pos
+        step = UndoStep(pos, removed, inserted, merge)
+        self.undo_steps.append(step)
+        self.bytes += step.size
+        while self.bytes > self.max_bytes and self.undo_steps:
+            self.bytes -= self.undo_steps.popleft().size
+            self.evictions += 1
+
+    def undo(self, text):
+        """The text before the last step, or None if there is nothing to undo"""
+        if not self.undo_steps:
+            return None
+        step = self.undo_steps.pop()
+        # An undone step can no longer grow
+        step.mergeable = False
+        self.redo_steps.append(step)
+        return step.undo(text)
+
+    def redo(self, text):
+        """The text after the next undone step, or None"""
+        if not self.redo_steps:
+            return None
+        step = self.redo_steps.pop()
+        self.undo_steps.append(step)
+        return step.redo(text)
+
+    def clear(self):
+        self.undo_steps.clear()
+        self.redo_steps = []
+        self.bytes = 0
+
+    def _drop_redo(self):
+        for step in self.redo_steps:
+            self.bytes -= step.size
+        self.redo_steps = []
+
+    def info(self):
+        return {"undo": len(self.undo_steps), "redo": len(self.redo_steps),
+                "bytes": self.bytes, "max_bytes": self.max_bytes,
+                "evictions": self.evictions}
+
+    def __len__(self):
+        return len(self.undo_steps)
@@ -0,0 +1,295 @@
+"""Named variables and registers, recomputed incrementally like a spreadsheet.
+
+A variable is either a register holding a value (memory is the register
+``M``) or a formula over other variables (``b = a**2 + 1``). The table keeps
+the dependency graph in both directions. Changing a variable marks only the
+formulas downstream of it stale; plan() lists those in dependency order
+together with the cached values of everything else they read, so nothing
+upstream or unrelated is evaluated again. The evaluation itself runs
+elsewhere (calc_worker.evaluate_definitions, usually in the evaluation
+process) and apply() takes the results back. A variable changed while its
+plan was running stays stale for the next round.
+
+Variables are saved to a small JSON file next to the history, cached values
+included, so loading them evaluates nothing. Huge ints are stored as base64
+of their bytes (linear time, no decimal conversion).
+
+This module does not import Qt.
+"""
+import base64
+import json
+import os
+import re
+
+from calc_engine import FUNCTIONS, BinOp, Call, ExpressionError, Name, UnaryOp, parse
+
+VARIABLES_FILE = "calculator_variables.json"
+MEMORY = "M"
+RESERVED = {"x"}        # the free variable of f(x), tables and plots
+_INLINE_BITS = 8192     # larger ints are saved as bytes (json stops at 4300 digits)
+
+_NAME_RE = re.compile(r"[A-Za-z_][A-Za-z_0-9]*\Z")
+_ASSIGNMENT_RE = re.compile(r"\s*([A-Za-z_][A-Za-z_0-9]*)\s*=(?!=)(.*)\Z", re.DOTALL)
+
+
+def parse_assignment(text):
+    """(name, formula) of "name = formula", or None if text is not one"""
+    match = _ASSIGNMENT_RE.match(text)
+    if match is None:
+        return None
+    return match.group(1), match.group(2).strip()
+
+
+def names(node):
+    """Names of the variables used in a parsed expression"""
+    found = set()
+    stack = [node]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, Name):
+            found.add(node.id)
+        elif isinstance(node, UnaryOp):
+            stack.append(node.operand)
+        elif isinstance(node, BinOp):
+            stack.append(node.left)
+            stack.append(node.right)
+        elif isinstance(node, Call):
+            stack.extend(node.args)
+    return found
+
+
+class Variable:
+    """A register (formula is None) or a formula with its cached value"""
+    __slots__ = ("formula", "depends", "value", "error", "stale")
+
+    def __init__(self, formula=None, depends=frozenset(), value=None):
+        self.formula = formula
+        self.depends = depends
+        self.value = value
+        self.error = None
+        self.stale = 0          # change number when marked stale, 0 if fresh
+
+
+class VariableTable:
+    """Variables with a dependency graph and stale tracking"""
+
+    def __init__(self):
+        self.variables = {}
+        self.dependents = {}    # name -> names of formulas that read it
+        self.changes = 0        # counts changes; stale marks are change numbers
+
+    def __contains__(self, name):
+        return name in self.variables
+
+    def __len__(self):
+        return len(self.variables)
+
+    def get(self, name):
+        return self.variables.get(name)
+
+    def value(self, name, default=None):
+        """The current value of name, or default if it has none"""
+        variable = self.variables.get(name)
+        if variable is None or variable.value is None:
+            return default
+        return variable.value
+
+    def values(self, wanted=None):
+        """{name: value} of fresh variables (all, or those in wanted)"""
+        if wanted is None:
+            wanted = self.variables
+        values = {}
+        for name in wanted:
+            variable = self.variables.get(name)
+            if variable is not None and variable.value is not None and not variable.stale:
+                values[name] = variable.value
+        return values
+
+    def stale(self):
+        """Names of the formulas waiting to be recomputed"""
+        return [name for name, variable in self.variables.items() if variable.stale]
+
+    def define(self, name, formula):
+        """Make name a formula over other variables and mark it stale"""
+        self._check_name(name)
+        depends = frozenset(names(parse(formula)))
+        if name in depends or self._reaches(depends, name):
+            raise ExpressionError(f"Circular definition of {name}")
+        self._replace(name, Variable(formula, depends))
+        self._mark(name, include_self=True)
+
+    def set_value(self, name, value):
+        """Make name a register holding value; formulas reading it go stale"""
+        self._check_name(name)
+        self._replace(name, Variable(value=value))
+        self._mark(name)
+
+    def remove(self, name):
+        """Delete a variable; formulas reading it go stale (and then fail)"""
+        if name in self.variables:
+            self._replace(name, None)
+            self._mark(name)
+
+    def _check_name(self, name):
+        if not _NAME_RE.match(name):
+            raise ExpressionError(f"Invalid name {name!r}")
+        if name in FUNCTIONS or name in RESERVED:
+            raise ExpressionError(f"{name} is reserved")
+
+    def _reaches(self, start, target):
+        """True if target is among start or the variables they depend on"""
+        seen = set()
+        stack = list(start)
+        while stack:
+            name = stack.pop()
+            if name == target:
+                return True
+            if name not in seen:
+                seen.add(name)
+                variable = self.variables.get(name)
+                if variable is not None:
+                    stack.extend(variable.depends)
+        return False
+
+    def _replace(self, name, variable):
+        old = self.variables.pop(name, None)
+        if old is not None:
+            for dependency in old.depends:
+                self.dependents.get(dependency, set()).discard(name)
+        if variable is not None:
+            self.variables[name] = variable
+            for dependency in variable.depends:
+                self.dependents.setdefault(dependency, set()).add(name)
+
+    def _mark(self, name, include_self=False):
+        """Mark the formulas downstream of name (and name itself) stale"""
+        self.changes += 1
+        marked = [name] if include_self else []
+        stack = [name]
+        seen = {name}
+        while stack:
+            for dependent in self.dependents.get(stack.pop(), ()):
+                if dependent not in seen:
+                    seen.add(dependent)
+                    marked.append(dependent)
+                    stack.append(dependent)
+        for marked_name in marked:
+            variable = self.variables.get(marked_name)
+            if variable is not None and variable.formula is not None:
+                variable.stale = self.changes
+
+    def plan(self):
+        """The stale formulas and what they need, for evaluate_definitions()
+
+        Returns (steps, inputs, change): steps are (name, formula) pairs in
+        dependency order, inputs the cached values of the other variables
+        they read, and change identifies this plan for apply().
+        """
+        stale = {name for name, variable in self.variables.items() if variable.stale}
+        waiting = {name: len(self.variables[name].depends & stale) for name in stale}
+        ready = sorted((name for name, count in waiting.items() if not count), reverse=True)
+        steps = []
+        inputs = {}
+        while ready:
+            name = ready.pop()
+            variable = self.variables[name]
+            steps.append((name, variable.formula))
+            inputs.update(self.values(variable.depends - stale))
+            for dependent in sorted(self.dependents.get(name, ()), reverse=True):
+                if dependent in waiting:
+                    waiting[dependent] -= 1
+                    if not waiting[dependent]:
+                        ready.append(dependent)
+        return steps, inputs, self.changes
+
+    def apply(self, steps, results, change):
+        """Store results of a plan made at change; returns the names updated
+
+        results maps names to (ok, value or error message). A formula that
+        was redefined since the plan was made is left for the next plan,
+        and so is one that went stale again.
+        """
+        updated = []
+        for name, formula in steps:
+            variable = self.variables.get(name)
+            if variable is None or variable.formula != formula or name not in results:
+                continue
+            ok, value = results[name]
+            if ok:
+                variable.value, variable.error = value, None
+            else:
+                missing = sorted(d for d in variable.depends if self.value(d) is None)
+                variable.value = None
+                variable.error = f"Needs {', '.join(missing)}" if missing else value
+            if variable.stale <= change:
+                variable.stale = 0
+            updated.append(name)
+        return updated
+
+    # ----------------------------------------------------------------------
+    # Persistence
+    # ----------------------------------------------------------------------
+
+    def to_json(self):
+        """A JSON-ready list of the variables, cached values included"""
+        entries = []
+        for name, variable in self.variables.items():
+            entry = {"name": name}
+            if variable.formula is not None:
+                entry["formula"] = variable.formula
+            if variable.error is not None:
+                entry["error"] = variable.error
+            elif isinstance(variable.value, (int, float)):
+                entry.update(_encode_value(variable.value))
+            elif variable.formula is not None:
+                # Not saveable (a complex result): recomputed after loading
+                entry["stale"] = True
+            if variable.stale:
+                entry["stale"] = True
+            entries.append(entry)
+        return entries
+
+    @classmethod
+    def from_json(cls, entries):
+        table = cls()
+        for entry in entries:
+            formula = entry.get("formula")
+            depends = frozenset(names(parse(formula))) if formula is not None else frozenset()
+            variable = Variable(formula, depends, _decode_value(entry))
+            variable.error = entry.get("error")
+            table._replace(entry["name"], variable)
+        table.changes = 1
+        for name in [entry["name"] for entry in entries if entry.get("stale")]:
+            table.variables[name].stale = 1
+        return table
+
+    def save(self, path):
+        """Write the table to path atomically"""
+        temporary = path + ".tmp"
+        with open(temporary, "w", encoding="utf-8") as f:
+            json.dump({"version": 1, "variables": self.to_json()}, f, separators=(",", ":"))
+        os.replace(temporary, path)
+
+    @classmethod
+    def load(cls, path):
+        """Read a table saved with save(); an empty table if there is none"""
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            return cls.from_json(data.get("variables", []))
+        except (OSError, ValueError, KeyError, TypeError):
+            return cls()
+
+
+def _encode_value(value):
+    if isinstance(value, int) and value.bit_length() > _INLINE_BITS:
+        length = (value.bit_length() + 8) // 8
+        data = value.to_bytes(length, "little", signed=True)
+        return {"int": base64.b64encode(data).decode("ascii")}
+    return {"value": value}
+
+
+def _decode_value(entry):
+    if "int" in entry:
+        return int.from_bytes(base64.b64decode(entry["int"]), "little", signed=True)
+    return entry.get("value")
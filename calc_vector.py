@@ -0,0 +1,189 @@
+"""NumPy-vectorized evaluation of an expression over a variable.
+
+An expression with a free variable (``x`` by default) is parsed once by
+calc_engine and compiled against NumPy ufuncs, so a whole array of inputs is
+evaluated in one vectorized pass instead of a Python loop over single values.
+
+Functions without a natural ufunc use these defined fallbacks:
+
+- ``factorial(x)``: exact table lookup for integral 0 <= x <= 170, ``inf``
+  above 170 (float64 overflow) and ``nan`` for negative or non-integral x.
+- ``cbrt(x)``: the real cube root (``numpy.cbrt``), so negative inputs give
+  negative results instead of the complex value of ``x ** (1/3)``.
+- ``nCr(n, r)``, ``nPr(n, r)``: exact per element (converted to float64),
+  ``0`` for r > n, ``inf`` where the result overflows float64 and ``nan``
+  for negative or non-integral arguments.
+
+Domain errors and division by zero produce ``nan``/``inf`` rather than
+raising. NumPy is optional; without it these functions raise RuntimeError.
+"""
+import math
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - optional dependency
+    np = None
+
+from calc_engine import LRUCache, compile_expression, compile_node
+
+VARIABLE = "x"
+SUMMARY_THRESHOLD = 20     # above this many points the UI shows stats only
+
+_FACTORIAL_LIMIT = 170     # 171! overflows float64
+_LOG_FLOAT_MAX = math.log(1.7976931348623157e308)
+
+_vector_cache = LRUCache(128)
+_vector_functions = None
+_factorial_values = None
+
+
+def require_numpy():
+    """Raise a helpful error when NumPy is missing"""
+    if np is None:
+        raise RuntimeError("NumPy is required for vectorized evaluation "
+                           "(pip install numpy)")
+
+
+def _factorial(x):
+    x = np.asarray(x, dtype=np.float64)
+    table = _factorial_table()
+    with np.errstate(invalid="ignore"):
+        valid = (x >= 0) & (x == np.floor(x))
+        index = np.where(valid, np.minimum(x, _FACTORIAL_LIMIT + 1), 0)
+    return np.where(valid, table[index.astype(np.intp)], np.nan)
+
+
+def _factorial_table():
+    global _factorial_values
+    if _factorial_values is None:
+        _factorial_values = np.array(
+            [math.factorial(n) for n in range(_FACTORIAL_LIMIT + 1)] + [math.inf],
+            dtype=np.float64)
+    return _factorial_values
+
+
+def _choices(n, r, ordered):
+    """nPr (ordered) or nCr of one pair of floats, as a float"""
+    if not (n >= 0 and r >= 0 and n == math.floor(n) and r == math.floor(r)):
+        return math.nan
+    n, r = int(n), int(r)
+    if r > n:
+        return 0.0
+    log = math.lgamma(n + 1) - math.lgamma(n - r + 1)
+    if not ordered:
+        log -= math.lgamma(r + 1)
+    if log > _LOG_FLOAT_MAX + 1:
+        return math.inf
+    try:
+        return float(math.perm(n, r) if ordered else math.comb(n, r))
+    except OverflowError:
+        return math.inf
+
+
+def _comb(n, r):
+    return _choices_ufunc(n, r, False)
+
+
+def _perm(n, r):
+    return _choices_ufunc(n, r, True)
+
+
+def _choices_ufunc(n, r, ordered):
+    n, r = np.broadcast_arrays(np.asarray(n, dtype=np.float64), np.asarray(r, dtype=np.float64))
+    result = np.frompyfunc(_choices, 3, 1)(n, r, ordered)
+    return np.asarray(result, dtype=np.float64)
+
+
+def vector_functions():
+    """Mapping of expression function names to their vectorized versions"""
+    global _vector_functions
+    require_numpy()
+    if _vector_functions is None:
+        _vector_functions = {
+            "sqrt": np.sqrt,
+            "sin": np.sin,
+            "cos": np.cos,
+            "tan": np.tan,
+            "log10": np.log10,
+            "log": _log,
+            "factorial": _factorial,
+            "cbrt": np.cbrt,
+            "nCr": _comb,
+            "nPr": _perm,
+        }
+    return _vector_functions
+
+
+def _log(x, base=None):
+    if base is None:
+        return np.log(x)
+    return np.log(x) / np.log(base)
+
+
+def compile_vector(expression):
+    """Compile an expression to a function of a variables mapping of arrays"""
+    require_numpy()
+    compiled = compile_expression(expression)
+    fn = _vector_cache.get(compiled.source)
+    if fn is None:
+        fn = compile_node(compiled.tree, vector_functions())
+        _vector_cache.put(compiled.source, fn)
+    return fn
+
+
+def evaluate_array(expression, values, variable=VARIABLE, variables=None):
+    """Evaluate an expression for every element of values
+
+    variables maps other names in the expression to scalar values.
+    Returns a float64 array with the same shape as values.
+    """
+    fn = compile_vector(expression)
+    values = np.asarray(values, dtype=np.float64)
+    env = dict(variables or ())
+    env[variable] = values
+    with np.errstate(all="ignore"):
+        result = fn(env)
+    result = np.asarray(result, dtype=np.float64)
+    if result.shape != values.shape:
+        # Expression without the variable: broadcast the constant
+        result = np.full(values.shape, result, dtype=np.float64)
+    return result
+
+
+def evaluate_range(expression, start, stop, count, variable=VARIABLE, variables=None):
+    """Evaluate over count evenly spaced points in [start, stop]
+
+    Returns (inputs, results).
+    """
+    require_numpy()
+    values = np.linspace(start, stop, int(count))
+    return values, evaluate_array(expression, values, variable, variables)
+
+
+def load_column(path, column=0, delimiter=None):
+    """Load one numeric column from a CSV or whitespace separated text file"""
+    require_numpy()
+    if delimiter is None and path.lower().endswith(".csv"):
+        delimiter = ","
+    return np.loadtxt(path, delimiter=delimiter, usecols=(column,),
+                      dtype=np.float64, ndmin=1)
+
+
+def report(values, results):
+    """Display lines: every value for small runs, summary statistics for large ones"""
+    if results.size <= SUMMARY_THRESHOLD:
+        return [f"{VARIABLE} = {x:g}  →  {y:g}" for x, y in zip(values, results)]
+    return [f"{name}: {value:g}" for name, value in summarize(results).items()]
+
+
+def summarize(values):
+    """Summary statistics of an array, ignoring nan/inf"""
+    require_numpy()
+    values = np.asarray(values, dtype=np.float64)
+    finite = values[np.isfinite(values)]
+    summary = {"count": int(values.size), "finite": int(finite.size)}
+    if finite.size:
+        summary.update(min=float(finite.min()), max=float(finite.max()),
+                       mean=float(finite.mean()), std=float(finite.std()),
+                       sum=float(finite.sum()))
+    return summary
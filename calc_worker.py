@@ -0,0 +1,391 @@
+"""Out-of-process expression evaluation.
+
+Evaluation runs in a persistent child process so that runaway expressions
+(``factorial(100000)``, ``9**9**9``) never block the caller and can be
+cancelled by terminating the child. Long-running big-integer operations
+hold the GIL, so a thread would not keep the UI responsive; a process does.
+
+This module does not import Qt; the GUI wires it to signals.
+"""
+import os
+import time
+
+import calc_bigint
+import calc_plot
+import calc_solver
+from calc_bignum import full_digits, result_text, write_digits
+from calc_cost import (APPROXIMATE, TooExpensive, approximate, evaluate_guarded, plan,
+                       plan_expression)
+from calc_engine import compile_expression, compile_function, format_result, parse
+from calc_programmer import integer, radix_views
+
+DEFAULT_TIMEOUT = float(os.environ.get("CALC_EVAL_TIMEOUT", "10"))
+
+DIVISION_BY_ZERO = "Division by zero"
+INVALID_EXPRESSION = "Invalid expression"
+NOT_AN_INTEGER = "Not an integer"
+
+MAX_TABLE_ROWS = 10000
+
+
+def evaluate_safely(expression, timings=None, variables=None):
+    """Evaluate an expression, returning (ok, result or error message)
+
+    variables maps names to values. Expressions too big or slow to compute
+    exactly are approximated or refused (see calc_cost). With a timings
+    dict, the parse (compile), analyze and evaluate times in seconds are
+    stored in it.
+    """
+    try:
+        if timings is None:
+            return True, format_result(evaluate_guarded(expression, variables))
+        start = time.perf_counter()
+        compiled = compile_expression(expression)
+        parsed = time.perf_counter()
+        action = plan_expression(compiled, variables)
+        analyzed = time.perf_counter()
+        if action == APPROXIMATE:
+            result = format_result(approximate(compiled.tree, variables))
+        else:
+            result = format_result(compiled.evaluate(variables))
+        timings["parse"] = parsed - start
+        timings["analyze"] = analyzed - parsed
+        timings["evaluate"] = time.perf_counter() - analyzed
+        return True, result
+    except TooExpensive as e:
+        return False, str(e)
+    except ZeroDivisionError:
+        return False, DIVISION_BY_ZERO
+    except Exception:
+        return False, INVALID_EXPRESSION
+
+
+def evaluate_value(expression, variables=None):
+    """Like evaluate_safely(), but the value is not rounded for display
+
+    For values that later formulas compute on.
+    """
+    try:
+        return True, evaluate_guarded(expression, variables)
+    except TooExpensive as e:
+        return False, str(e)
+    except ZeroDivisionError:
+        return False, DIVISION_BY_ZERO
+    except Exception:
+        return False, INVALID_EXPRESSION
+
+
+def evaluate_batch(expressions, progress=None):
+    """Evaluate several expressions, returning (ok, display text or error) pairs
+
+    progress, a shared multiprocessing value, is set to the index of the
+    expression being evaluated, so a parent that kills a stuck batch knows
+    which expression was stuck.
+    """
+    replies = []
+    for index, expression in enumerate(expressions):
+        if progress is not None:
+            progress.value = index
+        ok, value = evaluate_safely(expression)
+        replies.append((ok, result_text(value) if ok else value))
+    return replies
+
+
+def table_values(start, stop, step):
+    """start, start + step, ... up to and including stop, at most MAX_TABLE_ROWS
+
+    Values are ints when start and step are, so integer-only functions
+    like factorial work on integer ranges.
+    """
+    if not step or (stop - start) * step < 0:
+        return []
+    count = min(int((stop - start) / step + 1e-9) + 1, MAX_TABLE_ROWS)
+    return [start + i * step for i in range(count)]
+
+
+def refuse_approximate(expression, variables=None):
+    """Raise TooExpensive for an expression too big to compute exactly
+
+    Paths that evaluate over many x, where log-space approximation does not
+    apply, call this before compiling, as compiling folds constant parts.
+    """
+    if plan(parse(expression), variables) == APPROXIMATE:
+        raise TooExpensive("Result too large")
+
+
+def compile_guarded(expression, variable, variables=None):
+    """compile_function() of one variable, with other names bound to values
+
+    An expression too big to compute exactly is refused first (see
+    refuse_approximate).
+    """
+    refuse_approximate(expression, variables)
+    names = tuple(name for name in variables or () if name != variable)
+    fn = compile_function(expression, (variable,) + names)
+    if not names:
+        return fn
+    values = tuple(variables[name] for name in names)
+    return lambda x: fn(x, *values)
+
+
+def evaluate_table(expression, variable, start, stop, step, variables=None):
+    """Table of an expression over a range of one variable
+
+    The expression is compiled once to a Python function (see
+    compile_guarded); variables maps its other names to values. Returns
+    (ok, rows or error message); rows are (x, ok, display text or error).
+    """
+    try:
+        fn = compile_guarded(expression, variable, variables)
+    except TooExpensive as e:
+        return False, str(e)
+    except Exception:
+        return False, INVALID_EXPRESSION
+    rows = []
+    for x in table_values(start, stop, step):
+        try:
+            rows.append((x, True, result_text(format_result(fn(x)))))
+        except ZeroDivisionError:
+            rows.append((x, False, DIVISION_BY_ZERO))
+        except Exception:
+            rows.append((x, False, INVALID_EXPRESSION))
+    return True, rows
+
+
+def evaluate_plot(expression, x0, x1, y_span, width, height, margin=0.0, variables=None):
+    """Sample f(x) over [x0, x1] and reduce it to the pixel width (see calc_plot)
+
+    Without y_span the y range is fitted to the visible part of the range,
+    inside margin times its width on each side. Returns (ok, (points,
+    y range or None, sample count) or error message).
+    """
+    try:
+        fn = compile_guarded(expression, "x", variables)
+    except TooExpensive as e:
+        return False, str(e)
+    except Exception:
+        return False, INVALID_EXPRESSION
+    y_range = None
+    if y_span is None:
+        inset = (x1 - x0) * margin
+        y_range = calc_plot.fit_view(fn, x0 + inset, x1 - inset)
+        y_span = y_range[1] - y_range[0]
+    xs, ys = calc_plot.sample(fn, x0, x1, y_span, height)
+    return True, (calc_plot.reduce(xs, ys, x0, x1, int(width)), y_range, len(xs))
+
+
+def evaluate_vector(expression, source, variables=None):
+    """f(x) over a range or a data file column, vectorized (see calc_vector)
+
+    source is ("range", start, stop, count) or ("file", path, column).
+    Returns (ok, display lines or error message).
+    """
+    try:
+        refuse_approximate(expression, variables)
+    except TooExpensive as e:
+        return False, str(e)
+    except Exception:
+        return False, INVALID_EXPRESSION
+    try:
+        # Imported on first use: NumPy is optional and slow to import
+        import calc_vector
+        kind, *args = source
+        if kind == "file":
+            path, column = args
+            values = calc_vector.load_column(path, column)
+            results = calc_vector.evaluate_array(expression, values, variables=variables)
+        else:
+            start, stop, count = args
+            values, results = calc_vector.evaluate_range(
+                expression, start, stop, count, variables=variables)
+        return True, calc_vector.report(values, results)
+    except Exception as e:
+        return False, str(e)
+
+
+def evaluate_radix(source, width=None, signed=True):
+    """Programmer views of an expression's value, or of an exact int
+
+    Returns (ok, radix_views() dict or error message).
+    """
+    if not isinstance(source, int):
+        ok, source = evaluate_safely(source)
+        if not ok:
+            return False, source
+    try:
+        value = integer(source)
+    except (ValueError, OverflowError):
+        return False, NOT_AN_INTEGER
+    return True, radix_views(value, width, signed)
+
+
+def evaluate_definitions(steps, inputs):
+    """Recompute variable formulas in order (see calc_variables.VariableTable.plan)
+
+    inputs are the values of the other variables the formulas read. A
+    formula that fails leaves its name undefined for the later ones.
+    Values are kept unrounded; only their display is formatted. Returns
+    (True, {name: (ok, value or error message)}).
+    """
+    env = dict(inputs)
+    results = {}
+    for name, formula in steps:
+        ok, value = evaluate_value(formula, env)
+        if ok:
+            env[name] = value
+        results[name] = (ok, value)
+    return True, results
+
+
+def evaluate_digits(value, path=None):
+    """All decimal digits of an exact int (see calc_bignum.full_digits)
+
+    With a path the digits are streamed to that file and the number of
+    characters written is returned, else the digits themselves. Returns
+    (ok, result or error message).
+    """
+    try:
+        if path is None:
+            return True, full_digits(value)
+        with open(path, "w") as f:
+            return True, write_digits(value, f)
+    except OSError as e:
+        return False, str(e)
+
+
+def evaluate_solver(kind, expression, bounds, variables=None):
+    """Root, derivative or integral of an expression of x (see calc_solver)
+
+    kind is a key of calc_solver.SOLVERS and bounds its arguments, e.g.
+    (a, b) for a root or an integral. Returns (ok, result dict or error
+    message).
+    """
+    try:
+        fn = compile_guarded(expression, "x", variables)
+    except TooExpensive as e:
+        return False, str(e)
+    except Exception:
+        return False, INVALID_EXPRESSION
+    try:
+        return True, calc_solver.SOLVERS[kind](fn, *bounds)
+    except (ValueError, TypeError) as e:
+        return False, str(e)
+
+
+# Jobs other than plain expressions, sent as (kind, *args) tuples
+JOBS = {
+    "table": evaluate_table,
+    "plot": evaluate_plot,
+    "radix": evaluate_radix,
+    "vector": evaluate_vector,
+    "variables": evaluate_definitions,
+    "solve": evaluate_solver,
+    "digits": evaluate_digits,
+}
+
+
+def _worker_main(conn, workers=1, progress=None):
+    """Child process loop: receive (job_id, expression, profile, variables), send the reply
+
+    Replies are (job_id, ok, value, timings); timings is a dict of stage
+    times when profile is set, else None. If expression is a list, value
+    is the list of evaluate_batch() replies; a (kind, *args) tuple runs
+    one of JOBS. With workers > 1, big factorials, binomials and powers
+    use a pool of that many processes (see calc_bigint). progress is
+    passed to evaluate_batch().
+    """
+    calc_bigint.set_workers(workers)
+    while True:
+        try:
+            request = conn.recv()
+        except (EOFError, OSError):
+            return
+        if request is None:
+            return
+        job_id, expression, profile, variables = request
+        timings = {} if profile else None
+        if isinstance(expression, list):
+            ok, value = True, evaluate_batch(expression, progress)
+        elif isinstance(expression, tuple):
+            kind, *args = expression
+            try:
+                ok, value = JOBS[kind](*args)
+            except Exception:
+                # A job bug must not take the child process down with it
+                ok, value = False, INVALID_EXPRESSION
+        else:
+            ok, value = evaluate_safely(expression, timings, variables)
+        try:
+            conn.send((job_id, ok, value, timings))
+        except (EOFError, OSError):
+            return
+        except Exception:
+            conn.send((job_id, False, INVALID_EXPRESSION, timings))
+
+
+class EvaluationProcess:
+    """A persistent child process evaluating one expression at a time"""
+
+    def __init__(self, workers=1):
+        self.workers = workers
+        self._process = None
+        self._conn = None
+        self._progress = None
+
+    @property
+    def alive(self):
+        return self._process is not None and self._process.is_alive()
+
+    @property
+    def progress(self):
+        """Index of the expression the last list job reached (see evaluate_batch)"""
+        return self._progress.value if self._progress is not None else 0
+
+    def start(self):
+        """Start the child process if it is not running"""
+        if self.alive:
+            return
+        # Imported here: multiprocessing is slow to import and only needed
+        # once the window is already on screen
+        import multiprocessing
+        parent_conn, child_conn = multiprocessing.Pipe()
+        progress = multiprocessing.RawValue("i", 0)
+        process = multiprocessing.Process(target=_worker_main,
+                                          args=(child_conn, self.workers, progress),
+                                          name="calc-evaluator", daemon=True)
+        process.start()
+        child_conn.close()
+        self._process = process
+        self._conn = parent_conn
+        self._progress = progress
+
+    def submit(self, job_id, expression, profile=False, variables=None):
+        """Send an expression (or a list of them) to the child
+
+        variables maps names in the expression to their values. Returns
+        the connection to wait on.
+        """
+        self.start()
+        self._conn.send((job_id, expression, profile, variables))
+        return self._conn
+
+    def terminate(self):
+        """Kill the child (cancelling any running evaluation)"""
+        process, conn = self._process, self._conn
+        self._process = None
+        self._conn = None
+        if process is not None:
+            process.terminate()
+            process.join(1.0)
+        if conn is not None:
+            conn.close()
+
+    def close(self):
+        """Ask the child to exit, killing it if it does not"""
+        if self.alive:
+            try:
+                self._conn.send(None)
+                self._process.join(0.5)
+            except (EOFError, OSError):
+                pass
+        self.terminate()
@@ -1,13 +1,35 @@
 import sys
-import math
-import json
 import os
-from datetime import datetime
+import bisect
+import itertools
+import threading
+import time
+from array import array
 from PyQt5.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout, 
-                             QHBoxLayout, QPushButton, QLineEdit, QListWidget, 
-                             QListWidgetItem, QSplitter, QLabel, QMessageBox)
-from PyQt5.QtCore import Qt, QSize
-from PyQt5.QtGui import QFont
+                             QHBoxLayout, QPushButton, QLineEdit, QListView, 
+                             QSplitter, QLabel, QMessageBox,
+                             QInputDialog, QProgressBar, QFileDialog, QDialog,
+                             QTableWidget, QTableWidgetItem, QHeaderView,
+                             QTabWidget, QPlainTextEdit, QComboBox, QCheckBox,
+                             QListWidget, QListWidgetItem)
+from PyQt5.QtCore import (Qt, QSize, QObject, QTimer, pyqtSignal,
+                          QAbstractListModel, QModelIndex, QLineF, QPointF)
+from PyQt5.QtGui import QFont, QColor, QPainter, QPen, QTextCursor
+
+from calc_worker import DEFAULT_TIMEOUT, MAX_TABLE_ROWS, EvaluationProcess
+from calc_bigint import WORKERS as BIGINT_WORKERS
+from calc_bignum import result_text
+from calc_core import CalculatorCore
+from calc_cost import EXACT, HEAVY, evaluate_guarded
+from calc_engine import (ExpressionError, LRUCache, format_result,
+                         parse_number)
+import calc_plot
+import calc_stats
+from calc_programmer import RADIXES, WORD_WIDTHS, digit_lines
+from calc_profile import profiler
+import calc_solver
+import calc_theme
+from calc_variables import MEMORY
 
 class CalcButton(QPushButton):
     """Custom calculator button with proper styling"""
@@ -22,83 +44,614 @@ class CalcButton(QPushButton):
         self.apply_style()
     
     def apply_style(self):
-        """Apply button styling based on type"""
-        if self.button_type == "operator":  # Orange buttons
-            self.setStyleSheet("""
-                CalcButton {
-                    background-color: #FF6B35;
-                    border: none;
-                    border-radius: 8px;
-                    color: white;
-                    font-weight: bold;
-                    font-size: 16px;
-                }
-                CalcButton:hover {
-                    background-color: #FF5520;
-                }
-                CalcButton:pressed {
-                    background-color: #E55A2B;
-                }
-            """)
-        elif self.button_type == "function":  # Light gray buttons
-            self.setStyleSheet("""
-                CalcButton {
-                    background-color: #9E9E9E;
-                    border: none;
-                    border-radius: 8px;
-                    color: white;
-                    font-weight: bold;
-                    font-size: 16px;
-                }
-                CalcButton:hover {
-                    background-color: #B0B0B0;
-                }
-                CalcButton:pressed {
-                    background-color: #8C8C8C;
-                }
-            """)
-        else:  # Number buttons - Dark gray
-            self.setStyleSheet("""
-                CalcButton {
-                    background-color: #424242;
-                    border: none;
-                    border-radius: 8px;
-                    color: white;
-                    font-weight: bold;
-                    font-size: 16px;
-                }
-                CalcButton:hover {
-                    background-color: #545454;
-                }
-                CalcButton:pressed {
-                    background-color: #303030;
-                }
-            """)
+        """Tag the button with its type; the application style sheet styles it"""
+        self.setProperty("kind", self.button_type)
+
+
+class AsyncEvaluator(QObject):
+    """Evaluates expressions in a child process and reports back via signals"""
+    finished = pyqtSignal(object)
+    failed = pyqtSignal(str)
+    busyChanged = pyqtSignal(bool)
+    _replied = pyqtSignal(int, bool, object, object)
+    
+    def __init__(self, timeout=DEFAULT_TIMEOUT, parent=None, profiled=False, workers=1):
+        super().__init__(parent)
+        self.timeout = timeout
+        self.profiled = profiled
+        self.process = EvaluationProcess(workers)
+        self.job_id = 0
+        self.busy = False
+        self.submitted_at = 0.0
+        self.timings = {}          # stage timings of the last reply
+        self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.timeout.connect(self.on_timeout)
+        self._replied.connect(self.on_reply)
+    
+    def submit(self, expression, variables=None, timeout=None):
+        """Start evaluating an expression; the result arrives via signals
+        
+        timeout replaces the evaluator's own for this job (0: none).
+        """
+        self.job_id += 1
+        profile = self.profiled and profiler.enabled
+        self.submitted_at = time.perf_counter()
+        try:
+            conn = self.process.submit(self.job_id, expression, profile, variables)
+        except (EOFError, OSError):
+            # Child died since the last job; start a fresh one
+            self.process.terminate()
+            conn = self.process.submit(self.job_id, expression, profile, variables)
+        threading.Thread(target=self._wait, args=(conn,), daemon=True).start()
+        self.set_busy(True)
+        timeout = self.timeout if timeout is None else timeout
+        if timeout:
+            self.timer.start(int(timeout * 1000))
+    
+    def _wait(self, conn):
+        """Block on the reply in a helper thread (never the UI thread)"""
+        try:
+            job_id, ok, value, timings = conn.recv()
+        except (EOFError, OSError):
+            return
+        self._replied.emit(job_id, ok, value, timings)
+    
+    def on_reply(self, job_id, ok, value, timings):
+        """Deliver a reply from the child, ignoring stale ones"""
+        if job_id != self.job_id or not self.busy:
+            return
+        self.timer.stop()
+        self.timings = timings or {}
+        if timings is not None:
+            # Whatever the child did not spend evaluating is IPC and queuing
+            roundtrip = time.perf_counter() - self.submitted_at
+            self.timings["ipc"] = roundtrip - sum(timings.values())
+        self.set_busy(False)
+        if ok:
+            self.finished.emit(value)
+        else:
+            self.failed.emit(value)
+    
+    def cancel(self, message="Cancelled"):
+        """Abort the running evaluation by killing the child process"""
+        if not self.busy:
+            return
+        self.timer.stop()
+        self.process.terminate()
+        self.set_busy(False)
+        self.failed.emit(message)
+    
+    def on_timeout(self):
+        """Cancel an evaluation that ran past the timeout"""
+        self.cancel("Timed out")
+    
+    def set_busy(self, busy):
+        self.busy = busy
+        self.busyChanged.emit(busy)
+    
+    def shutdown(self):
+        """Stop the child process"""
+        self.timer.stop()
+        self.process.close()
+
+
+class HistoryModel(QAbstractListModel):
+    """History rows, newest first, read lazily from the history log
+    
+    Rows from earlier sessions are fetched from the end of the log in pages
+    through fetchMore(); only their byte offsets are kept, and decoded
+    records live in a small LRU cache, so memory follows the rows actually
+    shown rather than the size of the history.
+    """
+    FETCH_SIZE = 200
+    CACHE_SIZE = 1024
+    
+    def __init__(self, store, parent=None):
+        super().__init__(parent)
+        self.store = store
+        self.reader = None
+        self.new_records = []      # appended this session, oldest first
+        self.offsets = array("q")  # log offsets of fetched older rows
+        self.cache = LRUCache(self.CACHE_SIZE)
+    
+    def open(self):
+        """(Re)attach to the log; nothing is read until rows are needed"""
+        self.beginResetModel()
+        if self.reader is not None:
+            self.reader.close()
+        self.reader = self.store.reverse_reader()
+        self.new_records = []
+        self.offsets = array("q")
+        self.cache.clear()
+        self.endResetModel()
+    
+    def clear(self):
+        """Drop all rows"""
+        self.beginResetModel()
+        if self.reader is not None:
+            self.reader.close()
+        self.new_records = []
+        self.offsets = array("q")
+        self.cache.clear()
+        self.endResetModel()
+    
+    def add(self, record):
+        """Insert a new record at the top"""
+        self.beginInsertRows(QModelIndex(), 0, 0)
+        self.new_records.append(record)
+        self.endInsertRows()
+    
+    def rowCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+        return len(self.new_records) + len(self.offsets)
+    
+    def canFetchMore(self, parent):
+        return (not parent.isValid() and self.reader is not None
+                and not self.reader.done)
+    
+    def fetchMore(self, parent):
+        items = self.reader.read(self.FETCH_SIZE)
+        if not items:
+            return
+        start = self.rowCount()
+        self.beginInsertRows(QModelIndex(), start, start + len(items) - 1)
+        for offset, record in items:
+            self.offsets.append(offset)
+            self.cache.put(offset, record)
+        self.endInsertRows()
+    
+    def record(self, row):
+        """The history record shown at a row"""
+        new_count = len(self.new_records)
+        if row < new_count:
+            return self.new_records[new_count - 1 - row]
+        offset = self.offsets[row - new_count]
+        record = self.cache.get(offset)
+        if record is None:
+            record = self.reader.record_at(offset)
+            self.cache.put(offset, record)
+        return record
+    
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        if role == Qt.DisplayRole:
+            return history_text(self.record(index.row()))
+        if role == Qt.UserRole:
+            return self.record(index.row()).get("ref")
+        return None
+
+
+class SearchResultsModel(QAbstractListModel):
+    """History records matching the current search, newest first"""
+    
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.records = []
+    
+    def set_records(self, records):
+        self.beginResetModel()
+        self.records = records
+        self.endResetModel()
+    
+    def rowCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+        return len(self.records)
+    
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        if role == Qt.DisplayRole:
+            return history_text(self.records[index.row()])
+        if role == Qt.UserRole:
+            return self.records[index.row()].get("ref")
+        return None
+
+
+def history_text(record):
+    """Display text of a history record"""
+    timestamp = record.get("time")
+    if timestamp:
+        return f"[{timestamp[11:19]}] {record['entry']}"
+    return record["entry"]
+
+
+class PlotWidget(QWidget):
+    """Graph of f(x)
+    
+    Panning and zooming only re-map the cached points of the last sampling
+    (at most a few per pixel column), so they repaint at full frame rate.
+    The curve is drawn as separate line segments: Qt strokes one long
+    self-overlapping polyline in quadratic time. Shortly after the view
+    stops changing, the function is compiled and resampled for it in its
+    own evaluation process, so neither a costly expression nor the sampling
+    holds up the window; a view that changes while a sampling runs cancels
+    it and is sampled right away.
+    """
+    statusChanged = pyqtSignal(str)
+    
+    RESAMPLE_DELAY = 60      # ms after the last pan or zoom step
+    MARGIN = 0.5             # view widths sampled on each side, for panning
+    DEFAULT_RANGE = (-10.0, 10.0)
+    
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setMinimumHeight(220)
+        self.dark = True
+        self.expression = ""
+        self.variables = None    # values of the other names in the expression
+        self.view = [*self.DEFAULT_RANGE, -1.0, 1.0]   # x0, x1, y0, y1
+        self.autofit = True
+        self.points = None       # (xs, ys) of the last sampling, NaN at gaps
+        self.message = "Enter f(x) and press Plot"
+        self.evaluator = None    # own child process, created on first use
+        self.superseding = False # cancelling a sampling to start a newer one
+        self.started_at = 0.0
+        self.drag = None
+        self.resample_timer = QTimer(self)
+        self.resample_timer.setSingleShot(True)
+        self.resample_timer.timeout.connect(self.resample)
+    
+    def plot(self, expression, variables=None):
+        """Graph an expression of x over the default range"""
+        self.expression = expression
+        self.variables = variables
+        self.view[:2] = self.DEFAULT_RANGE
+        self.points = None
+        self.fit()
+    
+    def fit(self):
+        """Resample with the y range fitted to the function"""
+        self.autofit = True
+        self.resample()
+    
+    def set_dark(self, dark):
+        self.dark = dark
+        self.update()
+    
+    def schedule_resample(self):
+        """Resample once the view stops changing"""
+        self.resample_timer.start(self.RESAMPLE_DELAY)
+    
+    def resample(self):
+        """Start sampling the current view in the evaluation process"""
+        self.resample_timer.stop()
+        if not self.expression:
+            return
+        if self.evaluator is None:
+            self.evaluator = AsyncEvaluator(parent=self)
+            self.evaluator.finished.connect(self.on_sampled)
+            self.evaluator.failed.connect(self.on_sample_failed)
+        elif self.evaluator.busy:
+            # The running sampling is for an old view: stop it, not the new one
+            self.superseding = True
+            self.evaluator.cancel()
+            self.superseding = False
+        self.started_at = time.perf_counter()
+        x0, x1, y0, y1 = self.view
+        margin = (x1 - x0) * self.MARGIN
+        width = max(1, self.width()) * (1 + 2 * self.MARGIN)
+        self.evaluator.submit(("plot", self.expression, x0 - margin, x1 + margin,
+                               None if self.autofit else y1 - y0, width, max(1, self.height()),
+                               self.MARGIN / (1 + 2 * self.MARGIN), self.variables))
+    
+    def on_sample_failed(self, message):
+        """Show why the function could not be plotted"""
+        if self.superseding:
+            return
+        self.points = None
+        self.message = message
+        self.statusChanged.emit("")
+        self.update()
+    
+    def on_sampled(self, result):
+        """Take the points of the latest sampling"""
+        (xs, ys), y_range, count = result
+        if y_range is not None:
+            self.view[2:] = y_range
+            self.autofit = False
+        self.points = (xs, ys)
+        self.message = "" if count else "Nothing to plot"
+        elapsed = (time.perf_counter() - self.started_at) * 1000
+        self.statusChanged.emit(f"{len(xs):,} points from {count:,} samples in {elapsed:.0f} ms")
+        self.update()
+    
+    def cancel(self):
+        """Stop any sampling in progress (Esc)"""
+        self.resample_timer.stop()
+        if self.evaluator is not None:
+            self.evaluator.cancel()
+    
+    def shutdown(self):
+        """Stop any sampling in progress and its process"""
+        self.cancel()
+        if self.evaluator is not None:
+            self.evaluator.shutdown()
+    
+    def paintEvent(self, event):
+        """Grid, axes and the cached path, mapped to the current view"""
+        painter = QPainter(self)
+        painter.setRenderHint(QPainter.Antialiasing)
+        width, height = self.width(), self.height()
+        x0, x1, y0, y1 = self.view
+        sx = width / (x1 - x0)
+        sy = height / (y1 - y0)
+        if self.dark:
+            background, grid, axis, text = "#2a2a2a", "#3a3a3a", "#9E9E9E", "#ffffff"
+        else:
+            background, grid, axis, text = "#ffffff", "#e8e8e8", "#9E9E9E", "#1a1a1a"
+        painter.fillRect(self.rect(), QColor(background))
+        
+        painter.setFont(QFont("Segoe UI", 8))
+        for x in calc_plot.ticks(x0, x1):
+            px = (x - x0) * sx
+            painter.setPen(QPen(QColor(axis if x == 0 else grid)))
+            painter.drawLine(QPointF(px, 0), QPointF(px, height))
+            painter.setPen(QColor(text))
+            painter.drawText(QPointF(px + 3, height - 4), f"{x:g}")
+        for y in calc_plot.ticks(y0, y1):
+            py = (y1 - y) * sy
+            painter.setPen(QPen(QColor(axis if y == 0 else grid)))
+            painter.drawLine(QPointF(0, py), QPointF(width, py))
+            painter.setPen(QColor(text))
+            painter.drawText(QPointF(3, py - 3), f"{y:g}")
+        
+        if self.points is not None:
+            xs, ys = self.points
+            # Visible samples plus one on each side
+            start = max(0, bisect.bisect_left(xs, x0) - 1)
+            stop = min(len(xs), bisect.bisect_right(xs, x1) + 1)
+            lines = []
+            previous = None
+            for i in range(start, stop):
+                y = ys[i]
+                if y != y:
+                    previous = None
+                    continue
+                point = QPointF((xs[i] - x0) * sx, (y1 - y) * sy)
+                if previous is not None:
+                    lines.append(QLineF(previous, point))
+                previous = point
+            painter.setPen(QPen(QColor("#FF6B35"), 2))
+            painter.drawLines(lines)
+        if self.message:
+            painter.setPen(QColor(text))
+            painter.drawText(self.rect(), Qt.AlignCenter, self.message)
+    
+    def mousePressEvent(self, event):
+        if event.button() == Qt.LeftButton:
+            self.drag = (event.pos(), list(self.view))
+    
+    def mouseMoveEvent(self, event):
+        if self.drag is None:
+            return
+        origin, (x0, x1, y0, y1) = self.drag
+        dx = (event.pos().x() - origin.x()) * (x1 - x0) / max(1, self.width())
+        dy = (event.pos().y() - origin.y()) * (y1 - y0) / max(1, self.height())
+        self.view = [x0 - dx, x1 - dx, y0 + dy, y1 + dy]
+        self.update()
+        self.schedule_resample()
+    
+    def mouseReleaseEvent(self, event):
+        self.drag = None
+    
+    def mouseDoubleClickEvent(self, event):
+        self.fit()
+    
+    def wheelEvent(self, event):
+        """Zoom both axes around the cursor"""
+        factor = 0.85 ** (event.angleDelta().y() / 120)
+        x0, x1, y0, y1 = self.view
+        span = max(x1 - x0, y1 - y0)
+        if (factor < 1 and span < 1e-9) or (factor > 1 and span > 1e12):
+            return
+        pos = event.pos()
+        cx = x0 + pos.x() / max(1, self.width()) * (x1 - x0)
+        cy = y1 - pos.y() / max(1, self.height()) * (y1 - y0)
+        self.view = [cx - (cx - x0) * factor, cx + (x1 - cx) * factor,
+                     cy - (cy - y0) * factor, cy + (y1 - cy) * factor]
+        self.update()
+        self.schedule_resample()
+    
+    def resizeEvent(self, event):
+        super().resizeEvent(event)
+        if self.expression:
+            self.schedule_resample()
+
+
+class DigitsView(QPlainTextEdit):
+    """Read-only view of a long digit string, filled a chunk of lines per event loop pass"""
+    CHUNK_LINES = 256
+    
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setReadOnly(True)
+        self.setLineWrapMode(QPlainTextEdit.NoWrap)
+        self.setFont(QFont("Consolas", 10))
+        self.setMaximumHeight(64)
+        self.lines = None
+        self.timer = QTimer(self)
+        self.timer.timeout.connect(self.append_chunk)
+    
+    def set_digits(self, text, base):
+        """Show text as grouped lines; long texts are appended in chunks"""
+        self.timer.stop()
+        self.clear()
+        self.lines = digit_lines(text, base)
+        self.append_chunk()
+        self.moveCursor(QTextCursor.Start)
+        if self.lines is not None:
+            self.timer.start(0)
+    
+    def set_message(self, message):
+        self.timer.stop()
+        self.lines = None
+        self.setPlainText(message)
+    
+    def append_chunk(self):
+        chunk = list(itertools.islice(self.lines, self.CHUNK_LINES))
+        if chunk:
+            self.appendPlainText("\n".join(chunk))
+        if len(chunk) < self.CHUNK_LINES:
+            self.timer.stop()
+            self.lines = None
 
 
 class EnhancedCalculator(QMainWindow):
+    # Emitted (from a worker thread) when the history search index is built
+    index_ready = pyqtSignal()
+    # Emitted when deferred startup work is done
+    startup_finished = pyqtSignal()
+    # Emitted (from a helper thread) while and after a data file is read
+    stats_progress = pyqtSignal(int, float)
+    stats_finished = pyqtSignal(int, object)
+    
+    # Live preview: debounce delay (ms) and evaluation budget (s)
+    PREVIEW_DELAY = 150
+    PREVIEW_TIMEOUT = 0.1
+    # How often a shared history store is checked for other windows' rows (ms)
+    HISTORY_POLL_INTERVAL = 500
+    
     def __init__(self):
+        self.construct_start = time.perf_counter()
         super().__init__()
         self.setWindowTitle("💎 Calculator Pro")
         self.setGeometry(100, 100, 900, 750)
         self.setMinimumSize(500, 650)
         
-        # Calculator state
-        self.expression = ""
-        self.memory = 0
-        self.history_list = []
-        self.undo_stack = []
-        self.redo_stack = []
+        # Calculator state and logic (Qt-free)
+        self.core = CalculatorCore()
         self.dark_mode = True
+        self.pending_expression = ""
+        self.startup_done = False
+        
+        # Evaluation runs in a child process so the window never freezes;
+        # big factorials, binomials and powers there use a process pool
+        self.evaluator = AsyncEvaluator(parent=self, profiled=True, workers=BIGINT_WORKERS)
+        self.evaluator.finished.connect(self.on_calculation_finished)
+        self.evaluator.failed.connect(self.on_calculation_failed)
+        self.evaluator.busyChanged.connect(self.on_busy_changed)
+        
+        # Live preview uses its own child process with a short timeout, so a
+        # slow preview is killed without touching the main evaluator
+        self.preview_evaluator = AsyncEvaluator(self.PREVIEW_TIMEOUT, self)
+        self.preview_evaluator.finished.connect(self.on_preview_finished)
+        self.preview_evaluator.failed.connect(self.on_preview_failed)
+        self.preview_timer = QTimer(self)
+        self.preview_timer.setSingleShot(True)
+        self.preview_timer.timeout.connect(self.update_preview)
+        self.preview_pending = None
+        
+        # Plot panel and variables list, built with the right panel
+        self.plot_widget = None
+        self.variables_list = None
+        
+        # Programmer views and base conversions evaluate exact ints in their
+        # own child process, created on first use
+        self.radix_evaluator = None
+        self.radix_pending = None      # expression the running job is for
+        self.radix_conversion = None   # base to convert to when it finishes
+        self.radix_shown = None        # (expression, width, signed) on view
+        self.programmer_page = None
+        self.radix_timer = QTimer(self)
+        self.radix_timer.setSingleShot(True)
+        self.radix_timer.timeout.connect(self.update_radix_views)
+        
+        # Tables run in their own child process, created on first use
+        self.table_evaluator = None
+        self.table_expression = ""
+        
+        # Vectorized f(x) runs in its own child process, created on first use
+        self.vector_evaluator = None
+        self.vector_expression = ""
+        
+        # Solves run in their own child process, created on first use
+        self.solver_evaluator = None
+        self.solver_page = None
+        self.solver_value = None
+        
+        # Stale variable formulas are recomputed in their own child process,
+        # created on first use; a calculation reading them waits for it
+        self.variables_evaluator = None
+        self.variables_plan = None     # (steps, change) of the running job
+        self.calculate_pending = False
+        
+        # M+, M- and →var evaluate the expression in their own child process,
+        # created on first use, unless the display shows the last result
+        self.value_evaluator = None
+        self.value_store = None        # (title, store) waiting for the value
+        self.value_pending = None      # the same, waiting for stale variables
+        
+        # Exporting all digits of a huge int converts it in its own child
+        # process, created on first use, with no timeout (Esc cancels)
+        self.digits_evaluator = None
+        self.digits_path = None        # file being written, None for Copy
+        
+        # Statistics of a data file are streamed in a helper thread
+        self.stats_generation = 0
+        self.stats_cancel = None
+        self.stats_started = 0.0
+        self.stats_name = ""
+        self.stats_progress.connect(self.on_stats_progress)
+        self.stats_finished.connect(self.on_stats_finished)
+        
+        # History view models; the log is opened after the first frame
+        self.history_model = HistoryModel(self.core.history_store, self)
+        self.search_model = SearchResultsModel(self)
+        self.search_box = None
+        self.index_started = False
+        self.index_ready.connect(self.refresh_search)
         
-        # History file
-        self.history_file = "calculator_history.json"
-        self.load_history()
+        # Both themes are in one application style sheet, installed before
+        # any widget is polished; the window's "theme" property selects one
+        with profiler.stage("startup.theme"):
+            self.install_stylesheet()
+            self.setProperty("theme", self.theme_name())
         
-        # Initialize UI
+        # Initialize UI (the right panel is built after the first frame)
         self.init_ui()
         self.apply_theme()
         self.setup_keyboard()
+        profiler.record("startup.construct", time.perf_counter() - self.construct_start)
+    
+    @property
+    def expression(self):
+        return self.core.expression
+    
+    @expression.setter
+    def expression(self, value):
+        self.core.expression = value
+    
+    def paintEvent(self, event):
+        """Finish startup once the first frame has been painted"""
+        super().paintEvent(event)
+        if not self.startup_done:
+            self.startup_done = True
+            profiler.record("startup.first_paint", time.perf_counter() - self.construct_start)
+            QTimer.singleShot(0, self.finish_startup)
+    
+    def finish_startup(self):
+        """Deferred startup: history, right panel and evaluator process"""
+        with profiler.stage("startup.load_history"):
+            self.load_history()
+        if self.core.history_store.shared:
+            self.history_poll_timer = QTimer(self)
+            self.history_poll_timer.timeout.connect(self.poll_history)
+            self.history_poll_timer.start(self.HISTORY_POLL_INTERVAL)
+        with profiler.stage("startup.right_panel"):
+            self.splitter.addWidget(self.create_right_panel())
+            self.splitter.setStretchFactor(0, 2)
+            self.splitter.setStretchFactor(1, 1)
+        with profiler.stage("startup.evaluator"):
+            self.evaluator.process.start()
+            self.preview_evaluator.process.start()
+        profiler.record("startup.total", time.perf_counter() - self.construct_start)
+        if profiler.enabled:
+            self.show_profile_status("startup.total")
+        self.startup_finished.emit()
     
     def init_ui(self):
         """Initialize the user interface"""
@@ -124,6 +677,21 @@ class EnhancedCalculator(QMainWindow):
         self.display.setText("0")
         calc_layout.addWidget(self.display)
         
+        # Live result preview
+        self.preview_label = QLabel("")
+        self.preview_label.setAlignment(Qt.AlignRight | Qt.AlignVCenter)
+        self.preview_label.setFixedHeight(24)
+        self.preview_label.setStyleSheet("color: #9E9E9E; font-size: 16px; padding-right: 12px;")
+        calc_layout.addWidget(self.preview_label)
+        
+        # Busy indicator shown while an evaluation runs
+        self.busy_bar = QProgressBar()
+        self.busy_bar.setRange(0, 0)
+        self.busy_bar.setTextVisible(False)
+        self.busy_bar.setMaximumHeight(4)
+        self.busy_bar.hide()
+        calc_layout.addWidget(self.busy_bar)
+        
         # Button grid - exactly like the image
         grid = QVBoxLayout()
         grid.setSpacing(8)
@@ -189,17 +757,12 @@ class EnhancedCalculator(QMainWindow):
         calc_layout.addLayout(grid)
         calc_layout.addStretch()
         
-        # Right side - History and functions
-        right_widget = self.create_right_panel()
-        
-        # Splitter
-        splitter = QSplitter(Qt.Horizontal)
-        splitter.addWidget(calc_widget)
-        splitter.addWidget(right_widget)
-        splitter.setStretchFactor(0, 2)
-        splitter.setStretchFactor(1, 1)
+        # Splitter; the right side (history and functions) is added by
+        # finish_startup() so the calculator paints first
+        self.splitter = QSplitter(Qt.Horizontal)
+        self.splitter.addWidget(calc_widget)
         
-        main_layout.addWidget(splitter)
+        main_layout.addWidget(self.splitter)
     
     def create_right_panel(self):
         """Create right panel with history and advanced functions"""
@@ -208,24 +771,153 @@ class EnhancedCalculator(QMainWindow):
         layout.setSpacing(8)
         layout.setContentsMargins(10, 10, 10, 10)
         
-        # History section
-        history_label = QLabel("📊 History")
-        history_label.setFont(QFont("Segoe UI", 12, QFont.Bold))
-        history_label.setAlignment(Qt.AlignCenter)
-        layout.addWidget(history_label)
+        # History and plot tabs
+        self.side_tabs = QTabWidget()
+        self.side_tabs.setFont(QFont("Segoe UI", 11, QFont.Bold))
+        history_page = QWidget()
+        history_layout = QVBoxLayout(history_page)
+        history_layout.setSpacing(8)
+        history_layout.setContentsMargins(0, 8, 0, 0)
         
-        self.history_widget = QListWidget()
+        self.search_box = QLineEdit()
+        self.search_box.setPlaceholderText("Search: text, =42, >100, =1..10, @2026-10-16")
+        self.search_box.setClearButtonEnabled(True)
+        self.search_box.setStyleSheet("font-size: 12px; padding: 4px;")
+        self.search_box.textChanged.connect(self.on_search_changed)
+        history_layout.addWidget(self.search_box)
+        
+        self.history_widget = QListView()
         self.history_widget.setFont(QFont("Segoe UI", 9))
         self.history_widget.setSpacing(2)
-        self.history_widget.itemClicked.connect(self.load_from_history)
-        layout.addWidget(self.history_widget)
+        self.history_widget.setUniformItemSizes(True)
+        self.history_widget.setModel(self.history_model)
+        self.history_widget.clicked.connect(self.load_from_history)
+        history_layout.addWidget(self.history_widget)
         
         # History buttons
         hist_btn_layout = QHBoxLayout()
         hist_btn_layout.setSpacing(6)
         hist_btn_layout.addWidget(CalcButton("Copy", self.copy_to_clipboard, "function"))
+        hist_btn_layout.addWidget(CalcButton("Digits", self.export_digits, "function"))
         hist_btn_layout.addWidget(CalcButton("Clear", self.clear_history, "function"))
-        layout.addLayout(hist_btn_layout)
+        history_layout.addLayout(hist_btn_layout)
+        self.side_tabs.addTab(history_page, "📊 History")
+        
+        # Plot of f(x)
+        plot_page = QWidget()
+        plot_layout = QVBoxLayout(plot_page)
+        plot_layout.setSpacing(8)
+        plot_layout.setContentsMargins(0, 8, 0, 0)
+        
+        self.plot_input = QLineEdit()
+        self.plot_input.setPlaceholderText("f(x), e.g. sin(x) / x")
+        self.plot_input.setStyleSheet("font-size: 12px; padding: 4px;")
+        self.plot_input.returnPressed.connect(self.plot_function)
+        plot_layout.addWidget(self.plot_input)
+        
+        self.plot_widget = PlotWidget()
+        self.plot_widget.set_dark(self.dark_mode)
+        plot_layout.addWidget(self.plot_widget, 1)
+        
+        self.plot_status = QLabel("Drag to pan, scroll to zoom, double-click to fit")
+        self.plot_status.setStyleSheet("font-size: 10px;")
+        self.plot_widget.statusChanged.connect(self.plot_status.setText)
+        plot_layout.addWidget(self.plot_status)
+        
+        plot_btn_layout = QHBoxLayout()
+        plot_btn_layout.setSpacing(6)
+        plot_btn_layout.addWidget(CalcButton("Plot", self.plot_function, "function"))
+        plot_btn_layout.addWidget(CalcButton("Fit", self.plot_widget.fit, "function"))
+        plot_layout.addLayout(plot_btn_layout)
+        self.side_tabs.addTab(plot_page, "📈 Plot")
+        
+        # Programmer mode: word width and exact radix views
+        self.programmer_page = QWidget()
+        prog_layout = QVBoxLayout(self.programmer_page)
+        prog_layout.setSpacing(6)
+        prog_layout.setContentsMargins(0, 8, 0, 0)
+        
+        width_row = QHBoxLayout()
+        self.width_box = QComboBox()
+        for width in WORD_WIDTHS:
+            self.width_box.addItem("Unbounded" if width is None else f"{width}-bit", width)
+        self.width_box.currentIndexChanged.connect(self.on_word_width_changed)
+        self.signed_box = QCheckBox("Signed")
+        self.signed_box.setChecked(True)
+        self.signed_box.toggled.connect(self.on_word_width_changed)
+        width_row.addWidget(self.width_box, 1)
+        width_row.addWidget(self.signed_box)
+        prog_layout.addLayout(width_row)
+        
+        self.radix_views = {}
+        for name in RADIXES:
+            label = QLabel(name)
+            label.setStyleSheet("font-size: 10px; font-weight: bold;")
+            prog_layout.addWidget(label)
+            self.radix_views[name] = DigitsView()
+            prog_layout.addWidget(self.radix_views[name])
+        self.radix_status = QLabel("")
+        self.radix_status.setStyleSheet("font-size: 10px;")
+        prog_layout.addWidget(self.radix_status)
+        prog_layout.addStretch()
+        
+        bit_row1 = QHBoxLayout()
+        bit_row1.setSpacing(6)
+        bit_row1.addWidget(CalcButton("AND", lambda: self.append_operator("&"), "operator"))
+        bit_row1.addWidget(CalcButton("OR", lambda: self.append_operator("|"), "operator"))
+        bit_row1.addWidget(CalcButton("XOR", lambda: self.append_operator("^"), "operator"))
+        prog_layout.addLayout(bit_row1)
+        bit_row2 = QHBoxLayout()
+        bit_row2.setSpacing(6)
+        bit_row2.addWidget(CalcButton("NOT", lambda: self.append_value("~"), "operator"))
+        bit_row2.addWidget(CalcButton("<<", lambda: self.append_operator("<<"), "operator"))
+        bit_row2.addWidget(CalcButton(">>", lambda: self.append_operator(">>"), "operator"))
+        prog_layout.addLayout(bit_row2)
+        self.side_tabs.addTab(self.programmer_page, "🔢 Programmer")
+        
+        # Solver: roots, derivatives and integrals of f(x)
+        self.solver_page = QWidget()
+        solver_layout = QVBoxLayout(self.solver_page)
+        solver_layout.setSpacing(6)
+        solver_layout.setContentsMargins(0, 8, 0, 0)
+        
+        self.solver_input = QLineEdit()
+        self.solver_input.setPlaceholderText("f(x), e.g. x**3 - 2*x - 5")
+        self.solver_input.setStyleSheet("font-size: 12px; padding: 4px;")
+        self.solver_input.returnPressed.connect(self.solve)
+        solver_layout.addWidget(self.solver_input)
+        
+        self.solver_mode = QComboBox()
+        for kind, (label, _, _) in calc_solver.MODES.items():
+            self.solver_mode.addItem(label, kind)
+        self.solver_mode.currentIndexChanged.connect(self.on_solver_mode_changed)
+        solver_layout.addWidget(self.solver_mode)
+        
+        self.solver_bounds = QLineEdit()
+        self.solver_bounds.setStyleSheet("font-size: 12px; padding: 4px;")
+        self.solver_bounds.returnPressed.connect(self.solve)
+        solver_layout.addWidget(self.solver_bounds)
+        self.on_solver_mode_changed()
+        
+        self.solver_result = QLabel("")
+        self.solver_result.setStyleSheet("font-size: 16px; font-weight: bold;")
+        self.solver_result.setTextInteractionFlags(Qt.TextSelectableByMouse)
+        self.solver_result.setWordWrap(True)
+        solver_layout.addWidget(self.solver_result)
+        self.solver_status = QLabel("")
+        self.solver_status.setStyleSheet("font-size: 10px;")
+        self.solver_status.setWordWrap(True)
+        solver_layout.addWidget(self.solver_status)
+        solver_layout.addStretch()
+        
+        solver_btn_layout = QHBoxLayout()
+        solver_btn_layout.setSpacing(6)
+        solver_btn_layout.addWidget(CalcButton("Solve", self.solve, "operator"))
+        solver_btn_layout.addWidget(CalcButton("Use", self.use_solver_result, "function"))
+        solver_layout.addLayout(solver_btn_layout)
+        self.side_tabs.addTab(self.solver_page, "🎯 Solver")
+        self.side_tabs.currentChanged.connect(self.on_side_tab_changed)
+        layout.addWidget(self.side_tabs, 1)
         
         # Advanced functions
         adv_label = QLabel("Functions")
@@ -249,8 +941,45 @@ class EnhancedCalculator(QMainWindow):
         sci_row2.addWidget(CalcButton("!", lambda: self.append_function("fact"), "function"))
         layout.addLayout(sci_row2)
         
-        # Memory section
-        mem_label = QLabel("Memory")
+        # Scientific row 3: free variable, vectorized evaluation and tables
+        sci_row3 = QHBoxLayout()
+        sci_row3.setSpacing(6)
+        sci_row3.addWidget(CalcButton("x", lambda: self.append_value("x"), "function"))
+        sci_row3.addWidget(CalcButton("f(x)", self.evaluate_over_range, "function"))
+        sci_row3.addWidget(CalcButton("Table", self.show_table, "function"))
+        layout.addLayout(sci_row3)
+        
+        # Scientific row 4: binomials and permutations, e.g. nCr(52, 5)
+        sci_row4 = QHBoxLayout()
+        sci_row4.setSpacing(6)
+        sci_row4.addWidget(CalcButton("nCr", lambda: self.append_function("ncr"), "function"))
+        sci_row4.addWidget(CalcButton("nPr", lambda: self.append_function("npr"), "function"))
+        sci_row4.addWidget(CalcButton(",", lambda: self.append_value(", "), "function"))
+        layout.addLayout(sci_row4)
+        
+        # Statistics of a column of a data file
+        stats_label = QLabel("Statistics")
+        stats_label.setFont(QFont("Segoe UI", 12, QFont.Bold))
+        stats_label.setAlignment(Qt.AlignCenter)
+        layout.addWidget(stats_label)
+        
+        stats_row = QHBoxLayout()
+        stats_row.setSpacing(6)
+        stats_row.addWidget(CalcButton("Data", self.load_data_file, "function"))
+        stats_row.addWidget(CalcButton("Use", self.use_statistic, "function"))
+        stats_row.addWidget(CalcButton("→M", self.store_statistic, "function"))
+        layout.addLayout(stats_row)
+        
+        self.stats_box = QComboBox()
+        self.stats_box.setToolTip("Statistics of the last data file")
+        layout.addWidget(self.stats_box)
+        self.stats_status = QLabel("")
+        self.stats_status.setStyleSheet("font-size: 10px;")
+        self.stats_status.setWordWrap(True)
+        layout.addWidget(self.stats_status)
+        
+        # Memory and variables
+        mem_label = QLabel("Memory & Variables")
         mem_label.setFont(QFont("Segoe UI", 12, QFont.Bold))
         mem_label.setAlignment(Qt.AlignCenter)
         layout.addWidget(mem_label)
@@ -258,7 +987,6 @@ class EnhancedCalculator(QMainWindow):
         self.mem_display = QLineEdit()
         self.mem_display.setReadOnly(True)
         self.mem_display.setFont(QFont("Segoe UI", 10))
-        self.mem_display.setText(f"M: {self.memory}")
         layout.addWidget(self.mem_display)
         
         mem_row = QHBoxLayout()
@@ -266,8 +994,33 @@ class EnhancedCalculator(QMainWindow):
         mem_row.addWidget(CalcButton("M+", self.memory_add, "function"))
         mem_row.addWidget(CalcButton("M-", self.memory_sub, "function"))
         mem_row.addWidget(CalcButton("MR", self.memory_recall, "function"))
+        mem_row.addWidget(CalcButton("MC", self.memory_clear, "function"))
         layout.addLayout(mem_row)
         
+        self.variable_input = QLineEdit()
+        self.variable_input.setPlaceholderText("name = formula, e.g. b = a**2 + 1")
+        self.variable_input.setStyleSheet("font-size: 12px; padding: 4px;")
+        self.variable_input.returnPressed.connect(self.define_variable)
+        layout.addWidget(self.variable_input)
+        
+        self.variables_list = QListWidget()
+        self.variables_list.setFont(QFont("Segoe UI", 9))
+        self.variables_list.setMaximumHeight(110)
+        self.variables_list.setToolTip("Click to insert a variable, double-click to edit it")
+        self.variables_list.itemClicked.connect(self.insert_variable)
+        self.variables_list.itemDoubleClicked.connect(self.edit_variable)
+        layout.addWidget(self.variables_list)
+        
+        var_row = QHBoxLayout()
+        var_row.setSpacing(6)
+        var_row.addWidget(CalcButton("Set", self.define_variable, "function"))
+        var_row.addWidget(CalcButton("→var", self.store_variable, "function"))
+        var_row.addWidget(CalcButton("Del", self.remove_variable, "function"))
+        layout.addLayout(var_row)
+        self.update_variables_view()
+        if self.core.variables.stale():
+            self.recompute_variables()
+        
         # Base conversion
         base_label = QLabel("Base")
         base_label.setFont(QFont("Segoe UI", 11, QFont.Bold))
@@ -279,6 +1032,7 @@ class EnhancedCalculator(QMainWindow):
         base_row.addWidget(CalcButton("HEX", self.to_hex, "function"))
         base_row.addWidget(CalcButton("BIN", self.to_binary, "function"))
         base_row.addWidget(CalcButton("OCT", self.to_octal, "function"))
+        base_row.addWidget(CalcButton("DEC", self.to_decimal, "function"))
         layout.addLayout(base_row)
         
         layout.addStretch()
@@ -286,320 +1040,793 @@ class EnhancedCalculator(QMainWindow):
     
     def append_value(self, value):
         """Append a value to expression"""
-        if self.expression == "0":
-            self.expression = str(value)
-        else:
-            self.expression += str(value)
+        self.core.append_value(value)
         self.update_display()
     
     def append_operator(self, operator):
         """Append an operator"""
-        if self.expression and not self.expression.endswith((" + ", " - ", " * ", " / ", " ** ")):
-            if operator == "**":
-                self.expression += " ** "
-            else:
-                self.expression += f" {operator} "
+        self.core.append_operator(operator)
         self.update_display()
     
     def append_function(self, func):
         """Append a mathematical function"""
-        if func == "sqrt":
-            self.expression += "sqrt("
-        elif func == "sin":
-            self.expression += "sin("
-        elif func == "cos":
-            self.expression += "cos("
-        elif func == "tan":
-            self.expression += "tan("
-        elif func == "log":
-            self.expression += "log10("
-        elif func == "ln":
-            self.expression += "log("
-        elif func == "fact":
-            self.expression += "factorial("
-        elif func == "cbrt":
-            self.expression += "cbrt("
-        elif func == "pow2":
-            if self.expression:
-                self.expression = f"({self.expression})**2"
-        elif func == "pow3":
-            if self.expression:
-                self.expression = f"({self.expression})**3"
-        elif func == "inv":
-            if self.expression:
-                self.expression = f"1/({self.expression})"
+        self.core.append_function(func)
         self.update_display()
     
     def update_display(self):
         """Update the display"""
-        self.display.setText(self.expression if self.expression else "0")
+        self.display.setText(self.core.display_text())
+        self.preview_label.clear()
+        # Debounced: restarting the timer on every keystroke
+        self.preview_timer.start(self.PREVIEW_DELAY)
+        if self.programmer_page is not None and self.programmer_page.isVisible():
+            self.radix_timer.start(self.PREVIEW_DELAY)
+    
+    def update_preview(self):
+        """Evaluate the expression for the preview line"""
+        if self.evaluator.busy:
+            return
+        if self.preview_evaluator.busy:
+            # Let the running preview finish (or time out) first
+            self.preview_timer.start(self.PREVIEW_DELAY)
+            return
+        expression = self.core.preview_expression()
+        if expression is None:
+            return
+        self.preview_pending = expression
+        self.preview_evaluator.submit(expression, self.core.variables_for(expression))
+    
+    def on_preview_finished(self, result):
+        """Show a preview result if the expression has not changed since"""
+        if self.preview_pending == self.expression and not self.evaluator.busy:
+            self.preview_label.setText(f"= {result_text(result)}")
+    
+    def on_preview_failed(self, message):
+        """No preview for errors or slow expressions"""
+        if message == "Timed out":
+            # The child was killed; have a fresh one ready for the next edit
+            self.preview_evaluator.process.start()
     
     def clear_display(self):
         """Clear display"""
-        self.undo_stack.append(self.expression)
-        self.redo_stack.clear()
-        self.expression = ""
+        self.core.clear()
         self.update_display()
     
     def delete_last(self):
         """Delete last character"""
-        self.expression = self.expression[:-1]
+        self.core.delete_last()
         self.update_display()
     
     def calculate(self):
-        """Calculate expression"""
+        """Calculate expression in the background evaluator"""
+        if not self.expression or self.evaluator.busy:
+            return
+        if self.core.variables.stale():
+            # Stale formulas first; on_variables_finished() calls back
+            self.calculate_pending = True
+            self.recompute_variables()
+            return
+        
+        # Static cost check (microseconds): heavy expressions run without
+        # the timeout, huge ones are approximated or refused by the child
+        action, estimate = self.core.cost(self.expression)
+        self.pending_expression = self.expression
+        self.evaluator.submit(self.expression, self.core.variables_for(self.expression),
+                              0 if action == HEAVY else None)
+        if action == HEAVY:
+            self.display.setText(
+                f"Calculating… about {estimate.seconds:.0f} s  (Esc to cancel)")
+    
+    def on_calculation_finished(self, result):
+        """Show a result delivered by the evaluator"""
+        with profiler.stage("calculate.record_result"):
+            record = self.core.record_result(self.pending_expression, result)
+        with profiler.stage("calculate.history_view"):
+            self.history_model.add(record)
+        with profiler.stage("calculate.search"):
+            self.refresh_search()
+        with profiler.stage("calculate.display"):
+            self.update_display()
+        if profiler.enabled:
+            profiler.record_all(self.evaluator.timings, "calculate.")
+            profiler.record("calculate", time.perf_counter() - self.evaluator.submitted_at)
+            self.show_profile_status("calculate")
+    
+    def on_calculation_failed(self, message):
+        """Show an evaluation error, cancellation or timeout"""
+        self.display.setText(f"Error: {message}")
+        if message in ("Cancelled", "Timed out"):
+            # Keep the expression so it can be edited; recorded as an undo
+            # step, as edits made while it ran changed the text since
+            self.core.set_expression(self.pending_expression)
+        else:
+            # Undo brings the failed expression back
+            self.core.set_expression("")
+    
+    def on_busy_changed(self, busy):
+        """Toggle the busy indicator"""
+        self.busy_bar.setVisible(busy)
+        if busy:
+            self.preview_timer.stop()
+            self.preview_label.clear()
+            self.display.setText("Calculating…  (Esc to cancel)")
+    
+    def evaluate_over_range(self):
+        """Evaluate the expression over a range or a loaded column of x"""
+        if not self.expression:
+            return
+        text, ok = QInputDialog.getText(
+            self, "f(x)", "start, stop, points  —  or  file path, column",
+            text="0, 10, 1000000")
+        if not ok or not text.strip():
+            return
+        try:
+            parts = [part.strip() for part in text.split(",")]
+            if os.path.exists(parts[0]):
+                source = ("file", parts[0], int(parts[1]) if len(parts) > 1 else 0)
+            else:
+                source = ("range", float(parts[0]), float(parts[1]), int(parts[2]))
+        except (ValueError, IndexError):
+            QMessageBox.warning(self, "f(x)", "Enter start, stop, points  or  file path, column")
+            return
+        if self.vector_evaluator is None:
+            # Own child process, started on first use
+            self.vector_evaluator = AsyncEvaluator(parent=self)
+            self.vector_evaluator.finished.connect(self.on_vector_finished)
+            self.vector_evaluator.failed.connect(self.on_vector_failed)
+            self.vector_evaluator.busyChanged.connect(self.busy_bar.setVisible)
+        self.vector_expression = self.expression
+        self.vector_evaluator.submit(("vector", self.expression, source,
+                                      self.core.variables_for(self.expression)))
+    
+    def on_vector_finished(self, lines):
+        """Show the values or summary of a finished f(x) run"""
+        QMessageBox.information(self, f"f(x) = {self.vector_expression}", "\n".join(lines))
+    
+    def on_vector_failed(self, message):
+        """Report an f(x) run that could not be computed"""
+        QMessageBox.warning(self, "f(x)", f"Error: {message}")
+    
+    def on_side_tab_changed(self, index):
+        """Refresh the programmer views, or offer the expression for plotting or solving"""
+        if self.side_tabs.widget(index) is self.programmer_page:
+            self.update_radix_views()
+            return
+        if self.side_tabs.widget(index) is self.solver_page:
+            if not self.solver_input.text() and "x" in self.expression:
+                self.solver_input.setText(self.expression)
+            return
+        if self.side_tabs.widget(index) is not self.plot_widget.parentWidget():
+            return
+        if not self.plot_input.text() and "x" in self.expression:
+            self.plot_input.setText(self.expression)
+            self.plot_function()
+    
+    def plot_function(self):
+        """Graph the expression in the plot input"""
+        expression = self.plot_input.text().strip()
+        if expression:
+            self.plot_widget.plot(expression, self.core.variables_for(expression))
+    
+    def show_table(self):
+        """Tabulate the expression over a range of x"""
+        if not self.expression:
+            return
+        text, ok = QInputDialog.getText(
+            self, "Table", "start, stop, step", text="0, 10, 1")
+        if not ok or not text.strip():
+            return
+        try:
+            start, stop, step = (parse_number(part.strip()) for part in text.split(","))
+        except ValueError:
+            QMessageBox.warning(self, "Table", "Enter start, stop, step  (e.g. 0, 10, 0.5)")
+            return
+        if not step or (stop - start) * step < 0:
+            QMessageBox.warning(self, "Table", "The step does not lead from start to stop")
+            return
+        if self.table_evaluator is None:
+            # Own child process, started on first use
+            self.table_evaluator = AsyncEvaluator(parent=self)
+            self.table_evaluator.finished.connect(self.on_table_finished)
+            self.table_evaluator.failed.connect(self.on_table_failed)
+            self.table_evaluator.busyChanged.connect(self.busy_bar.setVisible)
+        self.table_expression = self.expression
+        self.table_evaluator.submit(("table", self.expression, "x", start, stop, step,
+                                     self.core.variables_for(self.expression)))
+    
+    def on_table_finished(self, rows):
+        """Show the rows of a finished table"""
+        dialog = QDialog(self)
+        dialog.setWindowTitle(f"Table: {self.table_expression}")
+        dialog.resize(420, 520)
+        layout = QVBoxLayout(dialog)
+        table = QTableWidget(len(rows), 2)
+        table.setHorizontalHeaderLabels(["x", self.table_expression])
+        table.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
+        table.verticalHeader().setVisible(False)
+        table.setEditTriggers(QTableWidget.NoEditTriggers)
+        for row, (x, ok, text) in enumerate(rows):
+            table.setItem(row, 0, QTableWidgetItem(result_text(format_result(x))))
+            table.setItem(row, 1, QTableWidgetItem(text if ok else f"Error: {text}"))
+        layout.addWidget(table)
+        if len(rows) >= MAX_TABLE_ROWS:
+            layout.addWidget(QLabel(f"Showing the first {MAX_TABLE_ROWS:,} rows"))
+        dialog.show()
+    
+    def on_table_failed(self, message):
+        """Report a table that could not be computed"""
+        QMessageBox.warning(self, "Table", f"Error: {message}")
+    
+    def on_solver_mode_changed(self):
+        """Show the bounds the selected solver takes"""
+        _, hint, _ = calc_solver.MODES[self.solver_mode.currentData()]
+        self.solver_bounds.setPlaceholderText(hint)
+    
+    def solve(self):
+        """Find a root, derivative or integral of f(x) in the background"""
+        expression = self.solver_input.text().strip()
+        if not expression:
+            return
+        kind = self.solver_mode.currentData()
+        _, hint, counts = calc_solver.MODES[kind]
         try:
-            if not self.expression:
+            bounds = calc_solver.parse_bounds(self.solver_bounds.text(), self.solver_bound)
+        except Exception:
+            bounds = None
+        if bounds is None or len(bounds) not in counts:
+            self.solver_status.setText(f"Enter {hint}")
+            return
+        if self.solver_evaluator is None:
+            # Own child process, started on first use
+            self.solver_evaluator = AsyncEvaluator(timeout=0, parent=self)
+            self.solver_evaluator.finished.connect(self.on_solver_finished)
+            self.solver_evaluator.failed.connect(self.on_solver_failed)
+            self.solver_evaluator.busyChanged.connect(self.busy_bar.setVisible)
+        self.solver_value = None
+        self.solver_result.setText("")
+        self.solver_status.setText("Solving…  (Esc to cancel)")
+        self.solver_evaluator.submit(("solve", kind, expression, bounds,
+                                      self.core.variables_for(expression)))
+    
+    def solver_bound(self, text):
+        """Value of one bound, e.g. sqrt(2) or a variable
+        
+        Bounds are evaluated on the UI thread, so only expressions the cost
+        check calls cheap are accepted.
+        """
+        action, _ = self.core.cost(text)
+        if action != EXACT:
+            raise ValueError(text)
+        return evaluate_guarded(text, self.core.variables_for(text))
+    
+    def on_solver_finished(self, result):
+        """Show a solver result with its cost"""
+        self.solver_value = format_result(result["value"])
+        self.solver_result.setText(f"{result['value']:.15g}")
+        self.solver_status.setText(
+            f"±{result['error']:.2g}  ·  {result['method']}  ·  "
+            f"{result['evaluations']:,} evaluations in {result['seconds'] * 1000:.1f} ms")
+    
+    def on_solver_failed(self, message):
+        """Report a solve that failed or was cancelled"""
+        self.solver_value = None
+        self.solver_result.setText("")
+        self.solver_status.setText(f"Error: {message}")
+    
+    def use_solver_result(self):
+        """Put the last solver result into the expression"""
+        if self.solver_value is not None:
+            self.core.insert_value(self.solver_value)
+            self.update_display()
+    
+    def load_data_file(self):
+        """Pick a data file and column, and compute its statistics in the background"""
+        path, _ = QFileDialog.getOpenFileName(
+            self, "Statistics of a column", "",
+            "Data files (*.csv *.tsv *.txt *.dat);;All files (*)")
+        if not path:
+            return
+        column, ok = QInputDialog.getText(
+            self, "Column", "Column number (from 1) or header name:", text="1")
+        column = column.strip()
+        if not ok or not column:
+            return
+        if column.isdigit():
+            if int(column) < 1:
+                self.stats_status.setText("Columns are numbered from 1")
                 return
-            
-            # Save to undo stack
-            self.undo_stack.append(self.expression)
-            self.redo_stack.clear()
-            
-            calc_expr = (self.expression
-                        .replace("×", "*")
-                        .replace("÷", "/")
-                        .replace("sqrt(", "math.sqrt(")
-                        .replace("sin(", "math.sin(")
-                        .replace("cos(", "math.cos(")
-                        .replace("tan(", "math.tan(")
-                        .replace("log10(", "math.log10(")
-                        .replace("log(", "math.log(")
-                        .replace("factorial(", "math.factorial(")
-                        .replace("cbrt(", "cbrt("))
-            
-            # Define custom functions
-            def cbrt(x):
-                return x ** (1/3)
-            
-            result = eval(calc_expr, {"__builtins__": {}}, 
-                         {"math": math, "cbrt": cbrt})
-            
-            if isinstance(result, float):
-                if result == int(result):
-                    result = int(result)
-                else:
-                    result = round(result, 10)
-            
-            # Add to history
-            timestamp = datetime.now().strftime("%H:%M:%S")
-            history_entry = f"{self.expression} = {result}"
-            self.history_list.append(history_entry)
-            
-            item = QListWidgetItem(f"[{timestamp}] {history_entry}")
-            self.history_widget.insertItem(0, item)
-            
-            # Save history to file
-            self.save_history()
-            
-            self.expression = str(result)
+            column = int(column) - 1
+        self.cancel_stats()
+        self.stats_generation += 1
+        self.stats_cancel = threading.Event()
+        self.stats_started = time.perf_counter()
+        self.stats_name = os.path.basename(path)
+        self.stats_status.setText(f"Reading {self.stats_name}…")
+        job = (self.stats_generation, path, column, self.stats_cancel)
+        threading.Thread(target=self._compute_stats, args=job, daemon=True).start()
+    
+    def _compute_stats(self, generation, path, column, cancel):
+        """Stream the file through calc_stats (runs in a helper thread)"""
+        try:
+            result = calc_stats.file_stats(
+                path, column, cancel=cancel,
+                progress=lambda fraction: self.stats_progress.emit(generation, fraction))
+        except (OSError, ValueError) as e:
+            result = str(e)
+        if result is not None:
+            self.stats_finished.emit(generation, result)
+    
+    def on_stats_progress(self, generation, fraction):
+        if generation == self.stats_generation and self.stats_cancel is not None:
+            self.stats_status.setText(f"Reading {self.stats_name}… {fraction:.0%}")
+    
+    def on_stats_finished(self, generation, result):
+        """List the statistics of the latest data file"""
+        if generation != self.stats_generation:
+            return
+        self.stats_cancel = None
+        if isinstance(result, str):
+            self.stats_status.setText(result)
+            return
+        self.stats_box.clear()
+        for name, value in result.items():
+            if value == value:
+                self.stats_box.addItem(f"{name} = {format_result(value)}", value)
+        self.stats_box.setCurrentIndex(max(0, self.stats_box.findData(result["mean"])))
+        elapsed = time.perf_counter() - self.stats_started
+        self.stats_status.setText(
+            f"{self.stats_name}: {result['count']:,} values, "
+            f"{result['skipped']:,} lines skipped, {elapsed:.1f} s")
+    
+    def cancel_stats(self):
+        """Stop reading a data file"""
+        if self.stats_cancel is not None:
+            self.stats_cancel.set()
+            self.stats_cancel = None
+            self.stats_status.setText("Cancelled")
+    
+    def use_statistic(self):
+        """Put the selected statistic into the expression"""
+        value = self.stats_box.currentData()
+        if value is not None:
+            self.core.insert_value(value)
             self.update_display()
-            
-        except ZeroDivisionError:
-            self.display.setText("Error: Division by zero")
-            self.expression = ""
-        except Exception as e:
-            self.display.setText("Error: Invalid expression")
-            self.expression = ""
+    
+    def store_statistic(self):
+        """Store the selected statistic in memory"""
+        value = self.stats_box.currentData()
+        if value is not None:
+            self.core.memory_store(value)
+            self.on_variables_changed()
     
     def memory_add(self):
         """Add current value to memory"""
-        try:
-            if self.expression:
-                self.memory += float(eval(self.expression))
-                self.mem_display.setText(f"Memory: {self.memory}")
-        except:
-            pass
+        self.store_current_value("Memory", self.core.memory_add)
     
     def memory_sub(self):
         """Subtract current value from memory"""
+        self.store_current_value("Memory", self.core.memory_sub)
+    
+    def store_current_value(self, title, store):
+        """Call store(value) with the current value, evaluated off the UI thread
+        
+        The last result is used as is while the display still shows it;
+        otherwise the expression is evaluated in the value process, after
+        any stale variables it may read are recomputed.
+        """
+        if not self.expression:
+            return
+        value = self.core.known_value()
+        if value is not None:
+            self.apply_current_value(title, store, value)
+            return
+        if self.core.variables.stale():
+            # on_variables_finished() calls back
+            self.value_pending = (title, store)
+            self.recompute_variables()
+            return
+        if self.value_evaluator is None:
+            # Own child process, started on first use
+            self.value_evaluator = AsyncEvaluator(parent=self)
+            self.value_evaluator.finished.connect(self.on_value_finished)
+            self.value_evaluator.failed.connect(self.on_value_failed)
+            self.value_evaluator.busyChanged.connect(self.busy_bar.setVisible)
+        elif self.value_evaluator.busy:
+            return
+        action, _ = self.core.cost(self.expression)
+        self.value_store = (title, store)
+        self.value_evaluator.submit(self.expression, self.core.variables_for(self.expression),
+                                    0 if action == HEAVY else None)
+    
+    def on_value_finished(self, value):
+        """Store an evaluated current value"""
+        (title, store), self.value_store = self.value_store, None
+        if not isinstance(value, (int, float)):
+            # An approximation of a result too large to compute exactly
+            QMessageBox.warning(self, title, "Error: Result too large")
+            return
+        self.apply_current_value(title, store, value)
+    
+    def on_value_failed(self, message):
+        """Report a current value that could not be evaluated"""
+        title, _ = self.value_store
+        self.value_store = None
+        QMessageBox.warning(self, title, f"Error: {message}")
+    
+    def apply_current_value(self, title, store, value):
+        """store(value), then show the changed variables"""
         try:
-            if self.expression:
-                self.memory -= float(eval(self.expression))
-                self.mem_display.setText(f"Memory: {self.memory}")
-        except:
-            pass
+            store(value)
+        except (ExpressionError, ArithmeticError) as e:
+            QMessageBox.warning(self, title, f"Error: {e}")
+            return
+        self.on_variables_changed()
     
     def memory_recall(self):
         """Recall memory value"""
-        self.expression = str(self.memory)
+        self.core.memory_recall()
         self.update_display()
     
     def memory_clear(self):
         """Clear memory"""
-        self.memory = 0
-        self.mem_display.setText(f"Memory: {self.memory}")
+        self.core.memory_clear()
+        self.on_variables_changed()
+    
+    def define_variable(self):
+        """Define the variable typed in the variable input"""
+        text = self.variable_input.text().strip()
+        if not text:
+            return
+        try:
+            self.core.define_variable(text)
+        except ExpressionError as e:
+            QMessageBox.warning(self, "Variable", f"Error: {e}")
+            return
+        self.variable_input.clear()
+        self.on_variables_changed()
+    
+    def store_variable(self):
+        """Store the current value in a register"""
+        if not self.expression:
+            return
+        name, ok = QInputDialog.getText(self, "Store", "Register name:")
+        name = name.strip()
+        if not ok or not name:
+            return
+        self.store_current_value("Variable", lambda value: self.core.set_variable(name, value))
+    
+    def remove_variable(self):
+        """Delete the selected variable"""
+        item = self.variables_list.currentItem()
+        if item is not None:
+            self.core.remove_variable(item.data(Qt.UserRole))
+            self.on_variables_changed()
+    
+    def insert_variable(self, item):
+        """Put a variable's name into the expression"""
+        self.core.insert_name(item.data(Qt.UserRole))
+        self.update_display()
+    
+    def edit_variable(self, item):
+        """Load a variable's definition into the variable input"""
+        name = item.data(Qt.UserRole)
+        variable = self.core.variables.get(name)
+        if variable is None:
+            return
+        if variable.formula is not None:
+            self.variable_input.setText(f"{name} = {variable.formula}")
+        else:
+            self.variable_input.setText(f"{name} = {result_text(variable.value)}")
+        self.variable_input.setFocus()
+    
+    def on_variables_changed(self):
+        """Show the change and recompute the formulas it made stale"""
+        self.update_variables_view()
+        if self.core.variables.stale():
+            self.recompute_variables()
+        # The preview may read a changed variable
+        self.update_display()
+    
+    def recompute_variables(self):
+        """Recompute stale formulas in the variables process"""
+        if self.variables_evaluator is None:
+            self.variables_evaluator = AsyncEvaluator(parent=self)
+            self.variables_evaluator.finished.connect(self.on_variables_finished)
+            self.variables_evaluator.failed.connect(self.on_variables_failed)
+        if self.variables_evaluator.busy:
+            # The running job finishes first; whatever it misses stays stale
+            return
+        steps, inputs, change = self.core.variables.plan()
+        if not steps:
+            return
+        self.variables_plan = (steps, change)
+        self.variables_evaluator.submit(("variables", steps, inputs))
+    
+    def on_variables_finished(self, results):
+        """Store recomputed values, then go on with what was waiting"""
+        steps, change = self.variables_plan
+        self.variables_plan = None
+        self.core.apply_variables(steps, results, change)
+        self.update_variables_view()
+        if self.core.variables.stale():
+            # Changed while the job ran
+            self.recompute_variables()
+            return
+        self.update_display()
+        if self.calculate_pending:
+            self.calculate_pending = False
+            self.calculate()
+        if self.value_pending is not None:
+            (title, store), self.value_pending = self.value_pending, None
+            self.store_current_value(title, store)
+    
+    def on_variables_failed(self, message):
+        """A recomputation was cancelled or timed out; the formulas stay stale"""
+        self.variables_plan = None
+        if self.calculate_pending:
+            self.calculate_pending = False
+            self.display.setText(f"Error: {message}")
+        if self.value_pending is not None:
+            title, _ = self.value_pending
+            self.value_pending = None
+            QMessageBox.warning(self, title, f"Error: {message}")
+    
+    def update_variables_view(self):
+        """Show memory and the variables with their values or errors"""
+        if self.variables_list is None:
+            return
+        variables = self.core.variables
+        self.mem_display.setText(f"M: {result_text(self.core.memory)}")
+        self.variables_list.clear()
+        for name in sorted(variables.variables):
+            if name == MEMORY:
+                continue
+            variable = variables.get(name)
+            if variable.stale:
+                value = "…"
+            elif variable.error is not None:
+                value = f"Error: {variable.error}"
+            else:
+                value = result_text(format_result(variable.value))
+            text = f"{name} = {value}"
+            if variable.formula is not None:
+                text = f"{name} = {variable.formula}  →  {value}"
+            item = QListWidgetItem(text)
+            item.setData(Qt.UserRole, name)
+            self.variables_list.addItem(item)
     
     def to_hex(self):
         """Convert to hexadecimal"""
-        try:
-            if self.expression:
-                val = int(float(eval(self.expression)))
-                self.expression = hex(val)
-                self.update_display()
-        except:
-            pass
+        self.convert_base(16)
     
     def to_binary(self):
         """Convert to binary"""
-        try:
-            if self.expression:
-                val = int(float(eval(self.expression)))
-                self.expression = bin(val)
-                self.update_display()
-        except:
-            pass
+        self.convert_base(2)
     
     def to_octal(self):
         """Convert to octal"""
-        try:
-            if self.expression:
-                val = int(float(eval(self.expression)))
-                self.expression = oct(val)
-                self.update_display()
-        except:
-            pass
+        self.convert_base(8)
     
     def to_decimal(self):
         """Convert to decimal"""
-        try:
-            if self.expression:
-                val = int(self.expression, 0)
-                self.expression = str(val)
-                self.update_display()
-        except:
-            pass
+        self.convert_base(10)
+    
+    def convert_base(self, base):
+        """Convert the exact integer value in the background (invalid input is ignored)"""
+        if not self.expression or self.evaluator.busy:
+            return
+        self.radix_conversion = base
+        self.submit_radix()
+    
+    def submit_radix(self):
+        """Evaluate the current value as an exact int in the radix process"""
+        if self.radix_evaluator is None:
+            self.radix_evaluator = AsyncEvaluator(parent=self)
+            self.radix_evaluator.finished.connect(self.on_radix_finished)
+            self.radix_evaluator.failed.connect(self.on_radix_failed)
+        self.radix_pending = self.expression
+        self.radix_evaluator.submit(("radix", self.core.exact_source(),
+                                     self.core.word_width, self.core.signed))
+    
+    def update_radix_views(self):
+        """Recompute the programmer views if the value or word width changed"""
+        if self.programmer_page is None:
+            return
+        key = (self.expression, self.core.word_width, self.core.signed)
+        if key == self.radix_shown:
+            return
+        if not self.expression:
+            self.radix_shown = key
+            for view in self.radix_views.values():
+                view.set_message("")
+            self.radix_status.clear()
+            return
+        self.submit_radix()
+    
+    def on_radix_finished(self, views):
+        """Apply a pending conversion and show the views"""
+        base, self.radix_conversion = self.radix_conversion, None
+        if self.radix_pending != self.expression:
+            # Edited since; the timer brings a fresh job
+            return
+        if base is not None:
+            self.core.show_in_base(views["value"], base)
+            self.update_display()
+        self.radix_shown = (self.expression, self.core.word_width, self.core.signed)
+        if self.programmer_page is None:
+            return
+        for name, view in self.radix_views.items():
+            view.set_digits(views[name], RADIXES[name])
+        self.radix_status.setText(f"{views['bits']:,} bits")
+    
+    def on_radix_failed(self, message):
+        """Show why there are no views (conversions fail silently)"""
+        self.radix_conversion = None
+        if self.radix_pending != self.expression or self.programmer_page is None:
+            return
+        self.radix_shown = (self.expression, self.core.word_width, self.core.signed)
+        for view in self.radix_views.values():
+            view.set_message("")
+        self.radix_status.setText(message)
+    
+    def on_word_width_changed(self):
+        """Apply the selected word width and signedness"""
+        self.core.word_width = self.width_box.currentData()
+        self.core.signed = self.signed_box.isChecked()
+        self.update_radix_views()
     
     def undo(self):
         """Undo last operation"""
-        if self.undo_stack:
-            self.redo_stack.append(self.expression)
-            self.expression = self.undo_stack.pop()
+        if self.core.undo():
             self.update_display()
     
     def redo(self):
         """Redo operation"""
-        if self.redo_stack:
-            self.undo_stack.append(self.expression)
-            self.expression = self.redo_stack.pop()
+        if self.core.redo():
             self.update_display()
     
-    def load_from_history(self, item):
+    def load_from_history(self, index):
         """Load calculation from history"""
-        text = item.text()
+        text = index.data()
         # Extract the expression part
         if " = " in text:
             expr = text.split(" = ")[0]
             # Remove timestamp
             if "] " in expr:
                 expr = expr.split("] ", 1)[1]
-            self.expression = expr
+            self.core.set_expression(expr)
             self.update_display()
     
     def copy_to_clipboard(self):
         """Copy current value to clipboard"""
-        if self.history_widget.currentItem():
-            text = self.history_widget.currentItem().text()
+        if self.history_widget.currentIndex().isValid():
+            text = self.history_widget.currentIndex().data()
             clipboard = QApplication.clipboard()
             clipboard.setText(text)
             QMessageBox.information(self, "Copied", "Copied to clipboard!")
     
+    def export_digits(self):
+        """Copy or save all digits of the selected (or last) result"""
+        value = self.core.last_value
+        ref = self.history_widget.currentIndex().data(Qt.UserRole)
+        if ref:
+            try:
+                value = self.core.value_store.load(ref)
+            except OSError:
+                QMessageBox.warning(self, "Digits", "Exact value is no longer available")
+                return
+        if not isinstance(value, int):
+            QMessageBox.information(self, "Digits", "No integer result to export")
+            return
+        
+        box = QMessageBox(self)
+        box.setWindowTitle("Digits")
+        box.setText(f"{result_text(value)}\n\nExport all digits:")
+        copy_btn = box.addButton("Copy", QMessageBox.AcceptRole)
+        save_btn = box.addButton("Save…", QMessageBox.ActionRole)
+        box.addButton(QMessageBox.Cancel)
+        box.exec_()
+        
+        if box.clickedButton() is copy_btn:
+            self.submit_digits(value, None)
+        elif box.clickedButton() is save_btn:
+            path, _ = QFileDialog.getSaveFileName(self, "Save digits", "result.txt",
+                                                  "Text files (*.txt)")
+            if path:
+                self.submit_digits(value, path)
+    
+    def submit_digits(self, value, path):
+        """Convert an int to decimal in the digits process: copied, or streamed to path"""
+        if self.digits_evaluator is None:
+            self.digits_evaluator = AsyncEvaluator(timeout=0, parent=self)
+            self.digits_evaluator.finished.connect(self.on_digits_finished)
+            self.digits_evaluator.failed.connect(self.on_digits_failed)
+            self.digits_evaluator.busyChanged.connect(self.busy_bar.setVisible)
+        elif self.digits_evaluator.busy:
+            QMessageBox.information(self, "Digits", "Still exporting the previous result")
+            return
+        self.digits_path = path
+        self.digits_evaluator.submit(("digits", value, path))
+    
+    def on_digits_finished(self, result):
+        """Put copied digits on the clipboard (a saved file is already written)"""
+        if self.digits_path is None:
+            QApplication.clipboard().setText(result)
+    
+    def on_digits_failed(self, message):
+        """Report an export that failed or was cancelled"""
+        QMessageBox.warning(self, "Digits", f"Error: {message}")
+    
     def clear_history(self):
         """Clear history"""
-        self.history_widget.clear()
-        self.history_list = []
-        self.save_history()
+        self.history_model.clear()
+        self.core.clear_history()
+        self.index_started = True  # nothing left in the log to index
+        self.refresh_search()
+    
+    def on_search_changed(self, text):
+        """Filter history as the search text changes"""
+        if text.strip() and not self.index_started:
+            self.index_started = True
+            reader = self.history_model.reader
+            records = self.core.history_store.iter_records(
+                reader.end if reader is not None else 0)
+            self.core.history_index.build(records, self.index_ready.emit)
+        self.refresh_search()
+    
+    def refresh_search(self):
+        """Show search results, or the full history for an empty query"""
+        if self.search_box is None:
+            return
+        query = self.search_box.text()
+        if not query.strip():
+            if self.history_widget.model() is not self.history_model:
+                self.history_widget.setModel(self.history_model)
+            return
+        self.search_model.set_records(self.core.history_index.search(query))
+        if self.history_widget.model() is not self.search_model:
+            self.history_widget.setModel(self.search_model)
     
     def toggle_theme(self):
         """Toggle between dark and light theme"""
-        self.dark_mode = not self.dark_mode
-        # Update button icon based on theme
-        if self.dark_mode:
-            self.theme_toggle_btn.setText("🌙")
-        else:
-            self.theme_toggle_btn.setText("☀️")
-        self.apply_theme()
+        with profiler.stage("theme.toggle"):
+            self.dark_mode = not self.dark_mode
+            self.apply_theme()
+        if profiler.enabled:
+            self.show_profile_status("theme.toggle")
     
     def on_theme_changed(self, theme_name):
         """Change theme by selection"""
         pass
     
+    def theme_name(self):
+        return calc_theme.DARK if self.dark_mode else calc_theme.LIGHT
+    
+    def install_stylesheet(self):
+        """Install the shared style sheet on the application (parsed once)"""
+        app = QApplication.instance()
+        if app.styleSheet() != calc_theme.STYLESHEET:
+            app.setStyleSheet(calc_theme.STYLESHEET)
+    
     def apply_theme(self):
-        """Apply dark or light theme to calculator"""
-        if self.dark_mode:
-            # Dark theme
-            self.setStyleSheet("""
-                QMainWindow {
-                    background-color: #1a1a1a;
-                }
-                QLineEdit {
-                    background-color: #2a2a2a;
-                    color: #ffffff;
-                    border: 2px solid #3a3a3a;
-                    border-radius: 8px;
-                    padding: 10px;
-                    font-size: 32px;
-                    font-weight: bold;
-                }
-                QLabel {
-                    color: #ffffff;
-                }
-                QListWidget {
-                    background-color: #2a2a2a;
-                    color: #ffffff;
-                    border: 2px solid #3a3a3a;
-                    border-radius: 8px;
-                    padding: 8px;
-                }
-                QListWidget::item {
-                    padding: 5px;
-                    border-radius: 4px;
-                }
-                QListWidget::item:hover {
-                    background-color: #3a3a3a;
-                }
-                QListWidget::item:selected {
-                    background-color: #FF6B35;
-                    color: #ffffff;
-                }
-            """)
-        else:
-            # Light theme
-            self.setStyleSheet("""
-                QMainWindow {
-                    background-color: #f5f5f5;
-                }
-                QLineEdit {
-                    background-color: #ffffff;
-                    color: #1a1a1a;
-                    border: 2px solid #e0e0e0;
-                    border-radius: 8px;
-                    padding: 10px;
-                    font-size: 32px;
-                    font-weight: bold;
-                }
-                QLabel {
-                    color: #1a1a1a;
-                }
-                QListWidget {
-                    background-color: #ffffff;
-                    color: #1a1a1a;
-                    border: 2px solid #e0e0e0;
-                    border-radius: 8px;
-                    padding: 8px;
-                }
-                QListWidget::item {
-                    padding: 5px;
-                    border-radius: 4px;
-                }
-                QListWidget::item:hover {
-                    background-color: #f0f0f0;
-                }
-                QListWidget::item:selected {
-                    background-color: #FF6B35;
-                    color: #ffffff;
-                }
-            """)
+        """Apply dark or light theme to calculator
+        
+        Only the theme property changes; the widgets the theme rules can
+        match are re-polished against the already parsed style sheet.
+        """
+        theme = self.theme_name()
+        self.theme_toggle_btn.setText(calc_theme.ICONS[theme])
+        if self.plot_widget is not None:
+            self.plot_widget.set_dark(self.dark_mode)
+        if self.property("theme") == theme:
+            return
+        self.setProperty("theme", theme)
+        for widget in [self] + self.findChildren(QWidget):
+            # Button colours are the same in both themes
+            if not isinstance(widget, CalcButton):
+                widget.style().unpolish(widget)
+                widget.style().polish(widget)
+        self.update()
     
     def setup_keyboard(self):
         """Setup keyboard event handling"""
@@ -623,36 +1850,160 @@ class EnhancedCalculator(QMainWindow):
             self.append_operator("/")
         elif key == "(" or key == ")":
             self.append_value(key)
+        elif key == ",":
+            self.append_value(", ")
+        elif key == "x":
+            self.append_value("x")
+        elif key in ("&", "|", "^"):
+            self.append_operator(key)
+        elif key == "~":
+            self.append_value("~")
+        elif key == "<" or key == ">":
+            self.append_operator(key * 2)
         elif event.key() == Qt.Key_Return or event.key() == Qt.Key_Enter:
             self.calculate()
         elif event.key() == Qt.Key_Backspace:
             self.delete_last()
         elif event.key() == Qt.Key_Escape:
-            self.clear_display()
+            if self.evaluator.busy:
+                self.evaluator.cancel()
+            elif self.table_evaluator is not None and self.table_evaluator.busy:
+                self.table_evaluator.cancel()
+            elif self.vector_evaluator is not None and self.vector_evaluator.busy:
+                self.vector_evaluator.cancel()
+            elif self.radix_evaluator is not None and self.radix_evaluator.busy:
+                self.radix_evaluator.cancel()
+            elif self.variables_evaluator is not None and self.variables_evaluator.busy:
+                self.variables_evaluator.cancel()
+            elif self.value_evaluator is not None and self.value_evaluator.busy:
+                self.value_evaluator.cancel()
+            elif self.solver_evaluator is not None and self.solver_evaluator.busy:
+                self.solver_evaluator.cancel()
+            elif self.digits_evaluator is not None and self.digits_evaluator.busy:
+                self.digits_evaluator.cancel()
+            elif (self.plot_widget is not None and self.plot_widget.evaluator is not None
+                  and self.plot_widget.evaluator.busy):
+                self.plot_widget.cancel()
+            elif self.stats_cancel is not None:
+                self.cancel_stats()
+            else:
+                self.clear_display()
+        elif event.modifiers() == Qt.ControlModifier | Qt.ShiftModifier:
+            # Hidden profiling controls
+            if event.key() == Qt.Key_P:
+                self.toggle_profiling()
+            elif event.key() == Qt.Key_E:
+                self.export_profile()
+            elif event.key() == Qt.Key_C:
+                self.toggle_cprofile()
         elif event.key() == Qt.Key_Z and event.modifiers() == Qt.ControlModifier:
             self.undo()
         elif event.key() == Qt.Key_Y and event.modifiers() == Qt.ControlModifier:
             self.redo()
     
-    def save_history(self):
-        """Save history to JSON file"""
+    def show_profile_status(self, stage):
+        """Show a stage's percentiles in the status bar"""
+        self.statusBar().showMessage(profiler.status_text(stage))
+    
+    def toggle_profiling(self):
+        """Turn stage timing on or off"""
+        profiler.enabled = not profiler.enabled
+        if profiler.enabled:
+            self.statusBar().show()
+            self.statusBar().showMessage("Profiling on (Ctrl+Shift+E to export)")
+        else:
+            self.statusBar().clearMessage()
+            self.statusBar().hide()
+    
+    def export_profile(self):
+        """Write the stage timings to a JSON file"""
         try:
-            with open(self.history_file, 'w') as f:
-                json.dump(self.history_list, f)
-        except:
-            pass
+            path = profiler.export()
+        except OSError as e:
+            self.statusBar().showMessage(f"Profile export failed: {e}")
+            return
+        self.statusBar().showMessage(f"Profile written to {os.path.abspath(path)}")
+    
+    def toggle_cprofile(self):
+        """Start or stop a cProfile capture of the session"""
+        if profiler.cprofile_running:
+            path = profiler.stop_cprofile()
+            self.statusBar().showMessage(f"cProfile written to {os.path.abspath(path)}")
+        else:
+            profiler.start_cprofile()
+            self.statusBar().showMessage("cProfile capture running (Ctrl+Shift+C to stop)")
+    
+    def save_history(self):
+        """Wait for queued history records to reach disk"""
+        self.core.history_store.flush()
     
     def load_history(self):
-        """Load history from JSON file"""
+        """Attach the history view to the log (rows are fetched lazily)"""
         try:
-            if os.path.exists(self.history_file):
-                with open(self.history_file, 'r') as f:
-                    self.history_list = json.load(f)
-        except:
-            self.history_list = []
+            self.history_model.open()
+        except OSError:
+            self.history_model.clear()
+    
+    def poll_history(self):
+        """Show rows added, or a clear made, by other calculator windows"""
+        try:
+            records, cleared = self.core.history_store.poll()
+        except OSError:
+            return
+        if cleared:
+            # Reload everything after the clear, including our own new rows
+            self.save_history()
+            self.core.history_index.clear(rebuild=True)
+            self.index_started = False
+            self.load_history()
+        elif records:
+            for record in records:
+                self.history_model.add(record)
+                self.core.history_index.add(record)
+        else:
+            return
+        self.refresh_search()
+    
+    def closeEvent(self, event):
+        """Flush history before the window closes"""
+        self.evaluator.shutdown()
+        self.preview_evaluator.shutdown()
+        if self.table_evaluator is not None:
+            self.table_evaluator.shutdown()
+        if self.vector_evaluator is not None:
+            self.vector_evaluator.shutdown()
+        if self.radix_evaluator is not None:
+            self.radix_evaluator.shutdown()
+        if self.variables_evaluator is not None:
+            self.variables_evaluator.shutdown()
+        if self.value_evaluator is not None:
+            self.value_evaluator.shutdown()
+        if self.solver_evaluator is not None:
+            self.solver_evaluator.shutdown()
+        if self.digits_evaluator is not None:
+            self.digits_evaluator.shutdown()
+        if self.plot_widget is not None:
+            self.plot_widget.shutdown()
+        if self.stats_cancel is not None:
+            self.stats_cancel.set()
+        self.core.close()
+        if profiler.cprofile_running:
+            profiler.stop_cprofile()
+        if profiler.enabled:
+            try:
+                profiler.export()
+            except OSError:
+                pass
+        super().closeEvent(event)
 
 
 def main():
+    if "--batch" in sys.argv[1:]:
+        # Headless mode: no QApplication, no display needed
+        from calc_batch import main as batch_main
+        args = [arg for arg in sys.argv[1:] if arg != "--batch"]
+        sys.exit(batch_main(args))
+    
     app = QApplication(sys.argv)
     calculator = EnhancedCalculator()
     calculator.show()